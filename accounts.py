@@ -0,0 +1,82 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from eth_account import Account
+
+# С какого количества ключей вывод адресов распределяется по процессам
+PARALLEL_THRESHOLD = 64
+# Сколько ключей передается процессу за раз
+DERIVE_CHUNK_SIZE = 256
+
+_accounts = {}  # нормализованный приватный ключ -> LocalAccount
+_accounts_lock = threading.Lock()
+
+
+def normalize_key(private_key):
+    """Приводит приватный ключ к виду без префикса 0x в нижнем регистре."""
+    if isinstance(private_key, (bytes, bytearray)):
+        return bytes(private_key).hex()
+    private_key = str(private_key).strip().lower()
+    return private_key[2:] if private_key.startswith('0x') else private_key
+
+
+def _derive(private_keys):
+    # Выполняется в дочернем процессе; LocalAccount передается обратно вместе с открытым ключом.
+    # Ошибка одного ключа не прерывает вычисление остальных
+    derived = []
+    for private_key in private_keys:
+        try:
+            derived.append((Account.from_key(private_key), None))
+        except Exception as e:
+            derived.append((None, str(e)))
+    return derived
+
+
+def get_account(private_key):
+    """
+    Возвращает аккаунт приватного ключа из общего кэша, вычисляя его при первом обращении.
+
+    :param private_key: Приватный ключ (hex-строка с префиксом 0x или без, либо bytes)
+    :return: LocalAccount
+    """
+    key = normalize_key(private_key)
+    with _accounts_lock:
+        account = _accounts.get(key)
+    if account is None:
+        account = Account.from_key(key)
+        with _accounts_lock:
+            account = _accounts.setdefault(key, account)
+    return account
+
+
+def derive_accounts(private_keys, processes=None):
+    """
+    Вычисляет аккаунты всех ключей один раз и кладет их в общий кэш.
+    Для больших списков вычисление распределяется по пулу процессов.
+
+    :param private_keys: Список приватных ключей
+    :param processes: Количество процессов (по умолчанию число ядер)
+    :return: Кортеж (список LocalAccount в порядке ключей, None для неверных ключей;
+             список (позиция ключа, ошибка))
+    """
+    keys = [normalize_key(private_key) for private_key in private_keys]
+    with _accounts_lock:
+        missing = list(dict.fromkeys(key for key in keys if key not in _accounts))
+
+    if len(missing) >= PARALLEL_THRESHOLD and processes != 1:
+        chunks = [missing[i:i + DERIVE_CHUNK_SIZE] for i in range(0, len(missing), DERIVE_CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            derived = [result for results in executor.map(_derive, chunks) for result in results]
+    else:
+        derived = _derive(missing)
+
+    failed = {}
+    with _accounts_lock:
+        for key, (account, error) in zip(missing, derived):
+            if error is None:
+                _accounts.setdefault(key, account)
+            else:
+                failed[key] = error
+        accounts = [_accounts.get(key) for key in keys]
+    errors = [(position, failed[key]) for position, key in enumerate(keys) if key in failed]
+    return accounts, errors
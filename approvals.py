@@ -0,0 +1,85 @@
+import csv
+import threading
+
+from events import get_event_log
+
+# Политики approve
+APPROVAL_EXACT = 'exact'  # ровно сумма перевода (как раньше)
+APPROVAL_MAX = 'max'  # бесконечное разрешение, повторные запуски обходятся без approve
+APPROVAL_CAP = 'cap'  # не меньше заданного лимита на запуск
+APPROVAL_POLICIES = (APPROVAL_EXACT, APPROVAL_MAX, APPROVAL_CAP)
+
+MAX_UINT256 = 2**256 - 1
+
+
+class ApprovalPolicy:
+    def __init__(self, mode=APPROVAL_EXACT, cap=None):
+        """
+        :param mode: 'exact', 'max' или 'cap'
+        :param cap: Лимит разрешения для 'cap' (в минимальных единицах токена)
+        """
+        if mode not in APPROVAL_POLICIES:
+            raise ValueError(f"Неизвестная политика approve: {mode}")
+        if mode == APPROVAL_CAP and not cap:
+            raise ValueError("Для политики 'cap' нужен лимит разрешения")
+        self.mode = mode
+        self.cap = cap
+
+    def amount(self, required):
+        """Сумма, на которую выдается разрешение, если текущего недостаточно для required."""
+        if self.mode == APPROVAL_MAX:
+            return MAX_UINT256
+        if self.mode == APPROVAL_CAP:
+            return max(required, self.cap)
+        return required
+
+    def needs_approval(self, allowance, required):
+        return allowance is None or allowance < required
+
+
+_policy = ApprovalPolicy()
+_policy_lock = threading.Lock()
+
+
+def get_approval_policy():
+    """Возвращает политику approve текущего запуска."""
+    with _policy_lock:
+        return _policy
+
+
+def set_approval_policy(mode=APPROVAL_EXACT, cap=None):
+    """Задает политику approve для всех модулей."""
+    global _policy
+    policy = ApprovalPolicy(mode, cap)
+    with _policy_lock:
+        _policy = policy
+    return policy
+
+
+def approval_report(contexts, path=None):
+    """
+    Отчет о кошельках, которым перед свапом нужен approve (по данным предварительного сканирования).
+
+    :param contexts: Контексты кошельков с полями 'balance_lz_usdc' и 'allowance'
+    :param path: CSV-файл для сохранения отчета (необязательно)
+    :return: Список контекстов, которым нужен approve
+    """
+    policy = get_approval_policy()
+    pending = [
+        ctx for ctx in contexts
+        if ctx.get('balance_lz_usdc') and policy.needs_approval(ctx.get('allowance'), ctx['balance_lz_usdc'])
+    ]
+    get_event_log().info(f"🔐 Approve нужен {len(pending)} из {len(contexts)} кошельков", policy=policy.mode)
+
+    if path:
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['index', 'address', 'network', 'balance', 'allowance', 'approve_amount'])
+            for ctx in pending:
+                wallet = ctx['wallet']
+                writer.writerow([
+                    wallet.index + 1, wallet.address, wallet.network, ctx['balance_lz_usdc'],
+                    ctx.get('allowance'), policy.amount(ctx['balance_lz_usdc']),
+                ])
+        get_event_log().info("📝 Отчет об approve сохранен", path=path)
+    return pending
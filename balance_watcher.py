@@ -0,0 +1,101 @@
+import itertools
+import threading
+import time
+
+from block_poller import get_block_poller
+from metrics import KIND_WAIT, get_metrics
+from multicall import aggregate3, balance_of_call, eth_balance_call
+from providers import get_web3
+
+
+class _Waiter:
+    def __init__(self, address, threshold, token):
+        self.address = address
+        self.threshold = threshold
+        self.token = token
+        self.balance = None
+        self.event = threading.Event()
+
+
+class BalanceWatcher:
+    def __init__(self, chain):
+        """
+        Следит за балансами всех ожидающих кошельков сети: на каждый новый блок
+        балансы читаются одним Multicall3-запросом, и каждый ожидающий просыпается,
+        как только его баланс достигает порога.
+
+        :param chain: Название сети
+        """
+        self.chain = chain
+        self.web3 = get_web3(chain)
+        self.poller = get_block_poller(chain)
+        self._waiters = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def _read_balances(self, waiters, block_identifier='latest'):
+        calls = [
+            balance_of_call(w.token, w.address) if w.token else eth_balance_call(w.address)
+            for w in waiters
+        ]
+        return aggregate3(self.web3, calls, block_identifier=block_identifier)
+
+    def _on_block(self, block_number):
+        with self._lock:
+            waiters = list(self._waiters.values())
+        if not waiters:
+            return
+        for waiter, balance in zip(waiters, self._read_balances(waiters, block_number)):
+            if balance is None:
+                continue
+            waiter.balance = balance
+            if balance >= waiter.threshold:
+                waiter.event.set()
+
+    def wait_for_balance(self, address, threshold=1, timeout=600, token=None):
+        """
+        Ждет, пока баланс адреса достигнет порога.
+
+        :param address: Адрес кошелька
+        :param threshold: Минимальный баланс в wei (или в единицах токена)
+        :param timeout: Максимальное время ожидания в секундах
+        :param token: Адрес ERC20-токена; None для нативной монеты
+        :return: Баланс, достигший порога, или None, если время вышло
+        """
+        waiter = _Waiter(address, threshold, token)
+
+        # Быстрый путь: средства уже на месте
+        (balance,) = self._read_balances([waiter])
+        if balance is not None and balance >= threshold:
+            return balance
+
+        waiter_id = next(self._ids)
+        with self._lock:
+            self._waiters[waiter_id] = waiter
+        self.poller.subscribe(self._on_block)
+        started_at = time.monotonic()
+        arrived = False
+        try:
+            deadline = started_at + timeout
+            arrived = waiter.event.wait(max(0, deadline - time.monotonic()))
+            return waiter.balance if arrived else None
+        finally:
+            get_metrics().observe(KIND_WAIT, 'balance', time.monotonic() - started_at, self.chain,
+                                  None if arrived else 'TimeoutError')
+            with self._lock:
+                del self._waiters[waiter_id]
+                if not self._waiters:
+                    self.poller.unsubscribe(self._on_block)
+
+
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+
+def get_balance_watcher(chain):
+    """Возвращает общий BalanceWatcher сети."""
+    with _watchers_lock:
+        watcher = _watchers.get(chain)
+        if watcher is None:
+            watcher = _watchers[chain] = BalanceWatcher(chain)
+        return watcher
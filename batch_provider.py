@@ -0,0 +1,183 @@
+import contextvars
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from web3 import Web3
+
+from rate_limiter import DEFAULT_CONCURRENCY, OUTCOME_ERROR, OUTCOME_OK, OUTCOME_THROTTLED, get_rate_limiter, parse_retry_after
+
+# Методы только для чтения, которые можно объединять в один JSON-RPC batch
+BATCHABLE_METHODS = frozenset({
+    'eth_blockNumber',
+    'eth_call',
+    'eth_chainId',
+    'eth_estimateGas',
+    'eth_feeHistory',
+    'eth_gasPrice',
+    'eth_getBalance',
+    'eth_getBlockByNumber',
+    'eth_getCode',
+    'eth_getTransactionByHash',
+    'eth_getTransactionCount',
+    'eth_getTransactionReceipt',
+    'eth_maxPriorityFeePerGas',
+})
+
+# Методы, меняющие состояние: такие запросы не дублируются на несколько узлов
+WRITE_METHODS = frozenset({'eth_sendRawTransaction', 'eth_sendTransaction'})
+
+# Сколько раз повторять запрос после 429
+THROTTLE_RETRIES = 3
+
+# Методы, ответ на которые не меняется за время жизни провайдера
+CACHEABLE_METHODS = frozenset({'eth_chainId', 'net_version'})
+
+DEFAULT_MAX_BATCH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL = 0.01  # секунды
+# Сколько batch одного провайдера могут выполняться одновременно (не больше лимита ограничителя узла)
+DEFAULT_MAX_IN_FLIGHT = DEFAULT_CONCURRENCY
+
+# Пул для параллельного запуска независимых чтений, чтобы они попали в один batch
+_gather_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='rpc-gather')
+
+
+def gather(*calls):
+    """
+    Запускает независимые вызовы одновременно и возвращает их результаты по порядку.
+
+    :param calls: Функции без аргументов, например lambda: w3.eth.gas_price
+    :return: Список результатов; первое исключение пробрасывается вызывающему
+    """
+    # Вызовы выполняются в контексте вызывающего (кошелек и этап для метрик)
+    futures = [_gather_executor.submit(contextvars.copy_context().run, call) for call in calls]
+    return [future.result() for future in futures]
+
+
+class BatchingHTTPProvider(Web3.HTTPProvider):
+    def __init__(self, endpoint_uri, max_batch_size=DEFAULT_MAX_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL, pool=None,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT, **kwargs):
+        """
+        HTTP-провайдер, который собирает независимые запросы на чтение из разных
+        потоков в один JSON-RPC batch. Каждый вызывающий получает свой результат
+        или свою ошибку.
+
+        :param endpoint_uri: URL RPC
+        :param max_batch_size: Максимальное количество запросов в одном batch
+        :param flush_interval: Сколько секунд ждать накопления запросов перед отправкой
+        :param pool: EndpointPool нескольких узлов; если задан, запросы идут через него, а не на endpoint_uri
+        :param max_in_flight: Сколько batch могут выполняться одновременно: медленный batch не задерживает следующие
+        """
+        super().__init__(endpoint_uri, **kwargs)
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.pool = pool
+        self._pending = []
+        self._cond = threading.Condition()
+        self._worker = None
+        self._cached_responses = {}
+        # Пока все слоты заняты, запросы копятся в _pending и уходят следующим, более крупным batch
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='rpc-batch-send')
+
+    def make_request(self, method, params):
+        if method in CACHEABLE_METHODS:
+            cached = self._cached_responses.get(method)
+            if cached is None:
+                cached = self._request(method, params)
+                if 'result' in cached:
+                    self._cached_responses[method] = cached
+            return dict(cached)
+        return self._request(method, params)
+
+    def _request(self, method, params):
+        if method not in BATCHABLE_METHODS or self.max_batch_size <= 1:
+            request_data = self.encode_rpc_request(method, params)
+            return self.decode_rpc_response(self._post(request_data, read_only=method not in WRITE_METHODS))
+        future = Future()
+        with self._cond:
+            self._ensure_worker()
+            request_data = self.encode_rpc_request(method, params)
+            self._pending.append((request_data, json.loads(request_data)['id'], future))
+            self._cond.notify()
+        return future.result()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._flush_loop, name='rpc-batch', daemon=True)
+            self._worker.start()
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            self._slots.acquire()
+            with self._cond:
+                # Даем время накопиться другим запросам
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._pending) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch_size]
+                del self._pending[:self.max_batch_size]
+            self._executor.submit(self._send_batch, batch).add_done_callback(lambda _: self._slots.release())
+
+    def _post(self, request_data, read_only=True):
+        if self.pool is not None:
+            return self.pool.post(request_data, read_only)
+
+        # Один узел: запросы проходят через его адаптивный ограничитель
+        limiter = get_rate_limiter(self.endpoint_uri)
+        for attempt in range(THROTTLE_RETRIES + 1):
+            limiter.acquire()
+            outcome = OUTCOME_ERROR
+            retry_after = None
+            try:
+                response = self._request_session_manager.make_post_request(
+                    self.endpoint_uri, request_data, **self.get_request_kwargs()
+                )
+                outcome = OUTCOME_OK
+                return response
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != 429 or attempt == THROTTLE_RETRIES:
+                    raise
+                outcome = OUTCOME_THROTTLED
+                retry_after = parse_retry_after(e.response.headers.get('Retry-After'))
+            finally:
+                limiter.release(outcome, retry_after)
+
+    def _send_batch(self, batch):
+        if len(batch) == 1:
+            request_data, _, future = batch[0]
+            try:
+                future.set_result(self.decode_rpc_response(self._post(request_data)))
+            except Exception as e:
+                future.set_exception(e)
+            return
+
+        request_data = b'[' + b', '.join(data for data, _, _ in batch) + b']'
+        try:
+            response = self.decode_rpc_response(self._post(request_data))
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        if not isinstance(response, list):
+            # При ошибке всего batch узел возвращает один объект с ошибкой
+            for _, _, future in batch:
+                future.set_result(response)
+            return
+
+        by_id = {item.get('id'): item for item in response}
+        for _, request_id, future in batch:
+            item = by_id.get(request_id)
+            if item is None:
+                future.set_exception(ValueError(f"Нет ответа на запрос {request_id} в batch"))
+            else:
+                future.set_result(item)
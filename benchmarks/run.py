@@ -0,0 +1,353 @@
+import argparse
+import contextlib
+import csv
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Бенчмарки без реальных сетей: заглушки JSON-RPC и LI.FI запускаются в отдельном процессе,
+# каждый сценарий и размер — в отдельном процессе Python, чтобы общие кэши не переходили между прогонами.
+# Запуск из корня репозитория: python -m benchmarks.run
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINES_FILE = os.path.join(BENCHMARKS_DIR, 'baselines.json')
+
+SCENARIOS = ('process_wallets', 'bridge_arb', 'bridge_opt', 'send_to_exchange')
+DEFAULT_SIZES = (10, 100, 1000)
+# Доля кошельков без FTM (им нужно пополнение с Base) в сценарии process_wallets
+FUND_RATIO = 0.2
+DESTINATION = '0x000000000000000000000000000000000000dEaD'
+# Потоков в сценарии send_to_exchange (переводы из Arbitrum и Optimism вне конвейера)
+SEND_WORKERS = 8
+
+# Допустимое ухудшение относительно базовой линии
+THROUGHPUT_TOLERANCE = 0.2  # падение wallets/minute
+RPC_CALLS_TOLERANCE = 0.1  # рост RPC-вызовов на кошелек
+LATENCY_TOLERANCE = 0.3  # рост p95 этапа
+LATENCY_MIN_DELTA = 0.05  # секунды: меньший рост p95 считается шумом
+# Прогоны меньшего размера длятся несколько блоков заглушки, и их результат зависит от фазы блока:
+# отклонения выводятся, но не влияют на код выхода
+GATE_MIN_SIZE = 100
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(int(len(values) * q + 0.5) - 1, 0)]
+
+
+def synthetic_key(index):
+    from eth_utils import keccak
+    return keccak(f"benchmark-wallet-{index}".encode()).hex()
+
+
+def write_sheet(path, size, network=None):
+    """
+    Создает CSV с синтетическими кошельками.
+
+    :param network: 'arb', 'opt' или None (сети чередуются)
+    """
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['PrivateKey', 'Amount', 'Arb', 'Optimism', 'Destination'])
+        for index in range(size):
+            wallet_network = network or ('arb' if index % 2 == 0 else 'opt')
+            writer.writerow([synthetic_key(index), 0.001, int(wallet_network == 'arb'), int(wallet_network == 'opt'), DESTINATION])
+
+
+class StageTimer:
+    def __init__(self):
+        self.latencies = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.latencies.setdefault(stage, []).append(seconds)
+
+    def timed(self, stage, func):
+        def run(*args, **kwargs):
+            started_at = time.monotonic()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(stage, time.monotonic() - started_at)
+        return run
+
+    def summary(self):
+        return {
+            stage: {'p50': percentile(values, 0.5), 'p95': percentile(values, 0.95), 'count': len(values)}
+            for stage, values in self.latencies.items()
+        }
+
+
+def _map_wallets(func, wallets, workers):
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bench') as executor:
+        return list(executor.map(func, wallets))
+
+
+def scenario_process_wallets(path, wallets, timer):
+    import main
+    from pipeline import Stage
+
+    stages = main.WALLET_STAGES
+    main.WALLET_STAGES = [Stage(stage.name, stage.chain, timer.timed(stage.name, stage.func)) for stage in stages]
+    try:
+        results = main.process_wallets(path, journal_file=':memory:')
+    finally:
+        main.WALLET_STAGES = stages
+    return sum(ctx['status'] == 'done' for ctx in results or [])
+
+
+def scenario_bridge(network):
+    def run(path, wallets, timer):
+        from pipeline import DEFAULT_CHAIN_WORKERS
+        if network == 'arb':
+            from function_bridge_usdc_to_arb import swap_max_usdc_fantom_to_arbitrum as swap
+        else:
+            from function_bridge_usdc_to_opt import swap_max_usdc_fantom_to_optimism as swap
+        swap = timer.timed(swap.__name__, swap)
+        results = _map_wallets(lambda wallet: swap(wallet.private_key), wallets, DEFAULT_CHAIN_WORKERS['fantom'])
+        return sum(bool(result) for result in results)
+    return run
+
+
+def scenario_send_to_exchange(path, wallets, timer):
+    from send_to_ex import send_to_exchange_wallet
+
+    send = timer.timed('send_to_exchange_wallet', send_to_exchange_wallet)
+    results = _map_wallets(lambda wallet: send(wallet.private_key, wallet.network, wallet.destination), wallets, SEND_WORKERS)
+    return sum(bool(result) for result in results)
+
+
+SCENARIO_FUNCS = {
+    'process_wallets': scenario_process_wallets,
+    'bridge_arb': scenario_bridge('arb'),
+    'bridge_opt': scenario_bridge('opt'),
+    'send_to_exchange': scenario_send_to_exchange,
+}
+SCENARIO_NETWORKS = {'bridge_arb': 'arb', 'bridge_opt': 'opt'}
+
+
+def _stub_stats(urls, lifi_url):
+    import requests
+
+    calls = {}
+    for chain, chain_urls in urls.items():
+        response = requests.post(chain_urls[0], json={'jsonrpc': '2.0', 'id': 1, 'method': 'stub_stats', 'params': []}, timeout=10)
+        calls[chain] = response.json()['result']
+    lifi = requests.get(lifi_url.rsplit('/v1', 1)[0] + '/stats', timeout=10).json()
+    return calls, lifi
+
+
+def run_one(scenario, size, config):
+    """
+    Выполняет один сценарий на синтетических кошельках в текущем процессе.
+
+    :return: Словарь с метриками прогона
+    """
+    from wallet_loader import load_wallet_records
+
+    with tempfile.TemporaryDirectory(prefix='lz-bench-') as workdir:
+        path = os.path.join(workdir, 'wallets.csv')
+        write_sheet(path, size, SCENARIO_NETWORKS.get(scenario))
+        wallets = list(load_wallet_records(path))
+        return _run_scenario(scenario, path, wallets, config)
+
+
+def _run_scenario(scenario, path, wallets, config):
+    from accounts import derive_accounts
+    from benchmarks.stubs import serve_stubs
+
+    size = len(wallets)
+    derive_accounts([wallet.private_key for wallet in wallets])
+    funding = int(size * FUND_RATIO) if scenario == 'process_wallets' else 0
+    unfunded = [wallet.address for wallet in wallets[:funding]]
+
+    # Заглушки в отдельном процессе, чтобы их работа не конкурировала за GIL с измеряемым кодом
+    context = multiprocessing.get_context('spawn')
+    parent_connection, child_connection = context.Pipe()
+    stubs = context.Process(target=serve_stubs, args=(config, unfunded, child_connection), daemon=True)
+    stubs.start()
+    try:
+        urls, lifi_url = parent_connection.recv()
+
+        import providers
+        from lifi_client import LifiClient, set_lifi_client
+        from quote_race import BridgeStats, set_bridge_stats
+        for chain, chain_urls in urls.items():
+            providers.configure_endpoints(chain, chain_urls)
+        set_lifi_client(LifiClient(base_url=lifi_url))
+        set_bridge_stats(BridgeStats(path=None))
+
+        timer = StageTimer()
+        started_at = time.monotonic()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            succeeded = SCENARIO_FUNCS[scenario](path, wallets, timer)
+        elapsed = time.monotonic() - started_at
+        calls, lifi = _stub_stats(urls, lifi_url)
+    finally:
+        stubs.terminate()
+
+    methods = {}
+    for chain, chain_calls in calls.items():
+        for method, count in chain_calls.items():
+            if method not in ('http_requests', 'throttled'):
+                methods[f"{chain}:{method}"] = count / size
+    return {
+        'scenario': scenario,
+        'size': size,
+        'succeeded': succeeded,
+        'elapsed': elapsed,
+        'wallets_per_minute': size / elapsed * 60,
+        'rpc_calls_per_wallet': sum(methods.values()),
+        'rpc_http_requests_per_wallet': sum(chain_calls.get('http_requests', 0) for chain_calls in calls.values()) / size,
+        'rpc_throttled': sum(chain_calls.get('throttled', 0) for chain_calls in calls.values()),
+        'rpc_calls_by_method': dict(sorted(methods.items())),
+        'lifi_requests_per_wallet': lifi.get('http_requests', 0) / size,
+        'latency': timer.summary(),
+    }
+
+
+def run_isolated(scenario, size, config, timeout=None):
+    """Выполняет сценарий в отдельном процессе Python и возвращает его метрики."""
+    with tempfile.TemporaryDirectory(prefix='lz-bench-') as workdir:
+        output = os.path.join(workdir, 'result.json')
+        command = [sys.executable, '-m', 'benchmarks.run', '--child', scenario, str(size),
+                   '--config', json.dumps(config), '--json', output]
+        completed = subprocess.run(command, cwd=os.path.dirname(BENCHMARKS_DIR), capture_output=True, text=True, timeout=timeout)
+        if completed.returncode != 0 or not os.path.exists(output):
+            raise RuntimeError(f"{scenario}/{size}: {completed.stderr.strip()[-2000:]}")
+        with open(output) as f:
+            return json.load(f)
+
+
+def load_baselines(path=BASELINES_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baselines(results, path=BASELINES_FILE):
+    baselines = load_baselines(path)
+    for result in results:
+        baselines[f"{result['scenario']}/{result['size']}"] = {
+            'wallets_per_minute': round(result['wallets_per_minute'], 1),
+            'rpc_calls_per_wallet': round(result['rpc_calls_per_wallet'], 2),
+            'rpc_calls_by_method': {method: round(count, 2) for method, count in result['rpc_calls_by_method'].items()},
+            'latency_p95': {stage: round(values['p95'], 3) for stage, values in result['latency'].items()},
+        }
+    with open(path, 'w') as f:
+        json.dump(dict(sorted(baselines.items())), f, indent=2)
+        f.write('\n')
+    print(f"📝 Базовые линии сохранены в {path}")
+
+
+def compare(result, baseline):
+    """
+    Сравнивает прогон с базовой линией.
+
+    :return: Список описаний регрессий (пустой, если их нет)
+    """
+    regressions = []
+    if result['wallets_per_minute'] < baseline['wallets_per_minute'] * (1 - THROUGHPUT_TOLERANCE):
+        regressions.append(f"wallets/minute {result['wallets_per_minute']:.1f} < {baseline['wallets_per_minute']:.1f}")
+    if result['rpc_calls_per_wallet'] > baseline['rpc_calls_per_wallet'] * (1 + RPC_CALLS_TOLERANCE):
+        regressions.append(f"RPC-вызовов на кошелек {result['rpc_calls_per_wallet']:.2f} > {baseline['rpc_calls_per_wallet']:.2f}")
+    for stage, p95 in baseline.get('latency_p95', {}).items():
+        current = result['latency'].get(stage, {}).get('p95')
+        if current is not None and current > p95 * (1 + LATENCY_TOLERANCE) and current - p95 > LATENCY_MIN_DELTA:
+            regressions.append(f"p95 {stage} {current:.3f} с > {p95:.3f} с")
+    return regressions
+
+
+def print_result(result):
+    print(f"\n=== {result['scenario']} / {result['size']} кошельков ===")
+    print(f"Успешно: {result['succeeded']} из {result['size']} за {result['elapsed']:.1f} с, "
+          f"{result['wallets_per_minute']:.1f} кошельков/мин")
+    print(f"RPC: {result['rpc_calls_per_wallet']:.2f} вызовов и {result['rpc_http_requests_per_wallet']:.2f} HTTP-запросов на кошелек, "
+          f"429: {result['rpc_throttled']}; LI.FI: {result['lifi_requests_per_wallet']:.2f} запросов на кошелек")
+    for method, count in result['rpc_calls_by_method'].items():
+        print(f"  {method}: {count:.2f}")
+    for stage, values in result['latency'].items():
+        print(f"  этап {stage}: p50 {values['p50']:.3f} с, p95 {values['p95']:.3f} с ({values['count']})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description='Бенчмарки на локальных заглушках JSON-RPC и LI.FI.')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"Сценарии через запятую ({', '.join(SCENARIOS)})")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='Количество кошельков через запятую (от 10 до 10000)')
+    parser.add_argument('--latency', type=float, help='Задержка ответа RPC, секунды')
+    parser.add_argument('--block-time', type=float, help='Время блока во всех сетях, секунды')
+    parser.add_argument('--throttle-rate', type=float, help='Доля ответов RPC с кодом 429')
+    parser.add_argument('--retry-after', type=float, help='Значение Retry-After в ответах 429, секунды')
+    parser.add_argument('--lifi-latency', type=float, help='Задержка ответа LI.FI, секунды')
+    parser.add_argument('--endpoints', type=int, help='Количество RPC-узлов на сеть')
+    parser.add_argument('--save-baseline', action='store_true', help='Сохранить результаты как базовые линии')
+    parser.add_argument('--json', metavar='FILE', help='Сохранить результаты в JSON')
+    parser.add_argument('--child', nargs=2, metavar=('SCENARIO', 'SIZE'), help=argparse.SUPPRESS)
+    parser.add_argument('--config', default='{}', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        result = run_one(args.child[0], int(args.child[1]), json.loads(args.config))
+        with open(args.json, 'w') as f:
+            json.dump(result, f)
+        return 0
+
+    from benchmarks.stubs import DEFAULT_CONFIG
+
+    config = {}
+    for key in ('latency', 'throttle_rate', 'retry_after', 'lifi_latency', 'endpoints'):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+    if args.block_time is not None:
+        config['block_time'] = {chain: args.block_time for chain in DEFAULT_CONFIG['block_time']}
+
+    scenarios = [scenario.strip() for scenario in args.scenarios.split(',') if scenario.strip()]
+    unknown = [scenario for scenario in scenarios if scenario not in SCENARIOS]
+    if unknown:
+        parser.error(f"Неизвестные сценарии: {', '.join(unknown)}")
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+
+    baselines = load_baselines()
+    results = []
+    failed = False
+    for scenario in scenarios:
+        for size in sizes:
+            try:
+                result = run_isolated(scenario, size, config)
+            except (RuntimeError, subprocess.TimeoutExpired) as e:
+                print(f"❌ {str(e)}")
+                failed = True
+                continue
+            results.append(result)
+            print_result(result)
+            baseline = baselines.get(f"{scenario}/{size}")
+            if baseline and not args.save_baseline:
+                regressions = compare(result, baseline)
+                gated = size >= GATE_MIN_SIZE
+                for regression in regressions:
+                    if gated:
+                        print(f"❌ Регрессия {scenario}/{size}: {regression}")
+                    else:
+                        print(f"⚠️ Отклонение {scenario}/{size} (меньше {GATE_MIN_SIZE} кошельков, не проверяется): {regression}")
+                failed = failed or (gated and bool(regressions))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline and results:
+        save_baselines(results)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,476 @@
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import rlp
+from eth_abi import decode, encode
+from eth_account import Account
+from eth_utils import function_signature_to_4byte_selector, keccak, to_checksum_address
+
+# Идентификаторы сетей
+CHAIN_IDS = {'fantom': 250, 'base': 8453, 'arbitrum': 42161, 'optimism': 10}
+
+# Начальные балансы для любого адреса
+NATIVE_BALANCES = {'fantom': 5 * 10**18, 'base': 10**18, 'arbitrum': 10**16, 'optimism': 10**16}
+TOKEN_BALANCE = 100 * 10**6  # 100 USDC на каждом токене
+
+GAS_PRICE = 10**9
+PRIORITY_FEE = 10**8
+LZ_FEE = 5 * 10**17  # комиссия quoteLayerZeroFee, wei
+FUND_CREDIT = 3 * 10**18  # сколько FTM приходит после пополнения с Base
+
+LIFI_DIAMOND = to_checksum_address('0x1231DEB6f5749EF6cE6943a275A1D3E7486F4EaE')
+LZ_USDC = to_checksum_address('0x28a92dde19D9989F39A49905d7C9C2FAc7799bDf')
+
+SELECTORS = {
+    function_signature_to_4byte_selector(signature): name
+    for name, signature in {
+        'aggregate3': 'aggregate3((address,bool,bytes)[])',
+        'getEthBalance': 'getEthBalance(address)',
+        'balanceOf': 'balanceOf(address)',
+        'allowance': 'allowance(address,address)',
+        'approve': 'approve(address,uint256)',
+        'transfer': 'transfer(address,uint256)',
+        'quoteLayerZeroFee': 'quoteLayerZeroFee(uint16,uint8,bytes,bytes,(uint256,uint256,bytes))',
+        'swap': 'swap(uint16,uint256,uint256,address,uint256,uint256,(uint256,uint256,bytes),bytes,bytes)',
+    }.items()
+}
+SWAP_ARGS = ['uint16', 'uint256', 'uint256', 'address', 'uint256', 'uint256', '(uint256,uint256,bytes)', 'bytes', 'bytes']
+
+# Газ по видам вызовов (оценка; в квитанции — 80% от нее)
+GAS = {'approve': 46000, 'transfer': 52000, 'swap': 380000, 'fund': 250000, None: 21000}
+
+# Параметры заглушек по умолчанию
+DEFAULT_CONFIG = {
+    'latency': 0.02,  # задержка ответа RPC, секунды
+    'jitter': 0.01,  # случайная добавка к задержке, секунды
+    'block_time': {'fantom': 0.5, 'base': 0.5, 'arbitrum': 0.25, 'optimism': 0.5},
+    'throttle_rate': 0.0,  # доля ответов 429
+    'retry_after': None,  # заголовок Retry-After для 429, секунды
+    'endpoints': 2,  # узлов на сеть (для пула узлов)
+    'lifi_latency': 0.15,
+    'lifi_throttle_rate': 0.0,
+    'bridge_delay': 2.0,  # через сколько секунд после пополнения на Base приходят FTM
+}
+
+
+def _hex(value):
+    return hex(value)
+
+
+def _word(value):
+    return encode(['uint256'], [value])
+
+
+def _decode(types, data):
+    # eth_abi возвращает адреса в нижнем регистре, состояние хранится по checksum-адресам
+    return [to_checksum_address(value) if kind == 'address' else value for kind, value in zip(types, decode(types, data))]
+
+
+class ChainState:
+    def __init__(self, name, world, block_time):
+        """
+        Состояние сети-заглушки: балансы, allowance, nonce, мемпул и блоки,
+        которые майнятся каждые block_time секунд.
+        """
+        self.name = name
+        self.world = world
+        self.chain_id = CHAIN_IDS[name]
+        self.block_time = block_time
+        self.block_number = 1000
+        self.native = {}
+        self.tokens = {}
+        self.allowances = {}
+        self.nonces = {}  # смайненные nonce
+        self.pending_nonces = {}
+        self.mempool = []
+        self.transactions = {}
+        self.receipts = {}
+        self.blocks = {}
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    # Балансы
+
+    def native_balance(self, address):
+        return self.native.setdefault(address, self.world.initial_native(self.name, address))
+
+    def token_balance(self, token, address):
+        return self.tokens.setdefault((token, address), TOKEN_BALANCE)
+
+    # Чтения
+
+    def call(self, to, data):
+        to = to_checksum_address(to)
+        name = SELECTORS.get(data[:4])
+        args = data[4:]
+        if name == 'aggregate3':
+            (calls,) = decode(['(address,bool,bytes)[]'], args)
+            results = []
+            for target, _, calldata in calls:
+                try:
+                    results.append((True, self.call(target, calldata)))
+                except Exception:
+                    results.append((False, b''))
+            return encode(['(bool,bytes)[]'], [results])
+        if name == 'getEthBalance':
+            return _word(self.native_balance(_decode(['address'], args)[0]))
+        if name == 'balanceOf':
+            return _word(self.token_balance(to, _decode(['address'], args)[0]))
+        if name == 'allowance':
+            owner, spender = _decode(['address', 'address'], args)
+            return _word(self.allowances.get((to, owner, spender), 0))
+        if name == 'quoteLayerZeroFee':
+            return encode(['uint256', 'uint256'], [LZ_FEE, 0])
+        return _word(0)
+
+    def estimate_gas(self, tx):
+        data = bytes.fromhex((tx.get('data') or tx.get('input') or '0x')[2:])
+        if tx.get('to') and to_checksum_address(tx['to']) == LIFI_DIAMOND:
+            return GAS['fund']
+        return GAS.get(SELECTORS.get(data[:4]), GAS[None])
+
+    # Транзакции
+
+    def send_raw(self, raw):
+        raw = bytes.fromhex(raw[2:])
+        tx_hash = '0x' + keccak(raw).hex()
+        if raw[0] >= 0xc0:
+            nonce, gas_price, gas, to, value, data = rlp.decode(raw)[:6]
+        else:
+            fields = rlp.decode(raw[1:])
+            if raw[0] == 2:
+                _, nonce, _, gas_price, gas, to, value, data = fields[:8]
+            else:
+                _, nonce, gas_price, gas, to, value, data = fields[:7]
+        sender = Account.recover_transaction(raw)
+        tx = {
+            'hash': tx_hash, 'from': sender, 'to': to_checksum_address(to) if to else None,
+            'nonce': int.from_bytes(nonce, 'big'), 'gas': int.from_bytes(gas, 'big'),
+            'gasPrice': int.from_bytes(gas_price, 'big'), 'value': int.from_bytes(value, 'big'), 'data': data,
+        }
+        with self._lock:
+            if tx_hash in self.transactions:
+                raise ValueError('already known')
+            if tx['nonce'] < self.nonces.get(sender, 0):
+                raise ValueError('nonce too low')
+            self.transactions[tx_hash] = tx
+            self.mempool.append(tx)
+            self.pending_nonces[sender] = max(self.pending_nonces.get(sender, 0), tx['nonce'] + 1)
+        return tx_hash
+
+    def transaction_count(self, address, block):
+        with self._lock:
+            mined = self.nonces.get(address, 0)
+            if block == 'pending':
+                return max(mined, self.pending_nonces.get(address, 0))
+            return mined
+
+    def _execute(self, tx):
+        # Возвращает (успех, газ) и применяет изменения состояния
+        sender = tx['from']
+        data = tx['data']
+        name = SELECTORS.get(data[:4])
+        if tx['to'] == LIFI_DIAMOND:
+            gas = GAS['fund']
+        else:
+            gas = GAS.get(name, GAS[None])
+        gas = int(gas * 0.8)
+        cost = tx['value'] + gas * tx['gasPrice']
+        if self.native_balance(sender) < cost:
+            return False, gas
+        ok = True
+        if name == 'approve':
+            spender, amount = _decode(['address', 'uint256'], data[4:])
+            self.allowances[(tx['to'], sender, spender)] = amount
+        elif name == 'transfer':
+            recipient, amount = _decode(['address', 'uint256'], data[4:])
+            if self.token_balance(tx['to'], sender) < amount:
+                ok = False
+            else:
+                self.tokens[(tx['to'], sender)] -= amount
+                self.tokens[(tx['to'], recipient)] = self.token_balance(tx['to'], recipient) + amount
+        elif name == 'swap':
+            amount = decode(SWAP_ARGS, data[4:])[4]
+            key = (LZ_USDC, sender, tx['to'])
+            if self.allowances.get(key, 0) < amount or self.token_balance(LZ_USDC, sender) < amount:
+                ok = False
+            else:
+                self.allowances[key] -= amount
+                self.tokens[(LZ_USDC, sender)] -= amount
+        elif tx['to'] == LIFI_DIAMOND:
+            self.world.schedule_credit('fantom', sender, FUND_CREDIT)
+        self.native[sender] -= cost if ok else gas * tx['gasPrice']
+        return ok, gas
+
+    def mine(self):
+        with self._lock:
+            self.block_number += 1
+            number = self.block_number
+            block_hash = '0x' + keccak(f"{self.name}-{number}".encode()).hex()
+            mempool, self.mempool = sorted(self.mempool, key=lambda tx: (tx['from'], tx['nonce'])), []
+            receipts = []
+            for tx in mempool:
+                expected = self.nonces.get(tx['from'], 0)
+                if tx['nonce'] > expected:
+                    self.mempool.append(tx)  # пропуск nonce: ждет предыдущую транзакцию
+                    continue
+                if tx['nonce'] < expected:
+                    continue
+                self.nonces[tx['from']] = expected + 1
+                ok, gas = self._execute(tx)
+                receipt = {
+                    'transactionHash': tx['hash'], 'transactionIndex': _hex(len(receipts)),
+                    'blockHash': block_hash, 'blockNumber': _hex(number),
+                    'from': tx['from'], 'to': tx['to'], 'contractAddress': None,
+                    'cumulativeGasUsed': _hex(gas), 'gasUsed': _hex(gas), 'effectiveGasPrice': _hex(tx['gasPrice']),
+                    'logs': [], 'logsBloom': '0x' + '00' * 256, 'status': '0x1' if ok else '0x0', 'type': '0x0',
+                }
+                tx['blockNumber'] = number
+                self.receipts[tx['hash']] = receipt
+                receipts.append(receipt)
+            self.blocks[number] = receipts
+
+    def run(self):
+        while True:
+            time.sleep(self.block_time)
+            self.world.apply_credits(self.name)
+            self.mine()
+
+    # JSON-RPC
+
+    def block(self, number):
+        return {
+            'number': _hex(number), 'hash': '0x' + keccak(f"{self.name}-{number}".encode()).hex(),
+            'parentHash': '0x' + keccak(f"{self.name}-{number - 1}".encode()).hex(),
+            'timestamp': _hex(int(time.time())), 'baseFeePerGas': _hex(GAS_PRICE), 'gasLimit': _hex(30_000_000),
+            'gasUsed': '0x0', 'miner': '0x' + '00' * 20, 'difficulty': '0x0', 'extraData': '0x',
+            'logsBloom': '0x' + '00' * 256, 'nonce': '0x' + '00' * 8, 'sha3Uncles': '0x' + '00' * 32,
+            'size': '0x0', 'stateRoot': '0x' + '00' * 32, 'receiptsRoot': '0x' + '00' * 32,
+            'transactionsRoot': '0x' + '00' * 32, 'totalDifficulty': '0x0', 'transactions': [], 'uncles': [],
+        }
+
+    def _block_number(self, identifier):
+        if isinstance(identifier, str) and identifier.startswith('0x'):
+            return int(identifier, 16)
+        return self.block_number
+
+    def handle(self, method, params):
+        if method == 'eth_chainId':
+            return _hex(self.chain_id)
+        if method == 'net_version':
+            return str(self.chain_id)
+        if method == 'eth_blockNumber':
+            return _hex(self.block_number)
+        if method == 'eth_gasPrice':
+            return _hex(GAS_PRICE)
+        if method == 'eth_maxPriorityFeePerGas':
+            return _hex(PRIORITY_FEE)
+        if method == 'eth_feeHistory':
+            count = min(int(params[0], 16) if isinstance(params[0], str) else int(params[0]), 1024)
+            return {
+                'oldestBlock': _hex(self.block_number - count + 1),
+                'baseFeePerGas': [_hex(GAS_PRICE)] * (count + 1),
+                'gasUsedRatio': [0.5] * count,
+                'reward': [[_hex(PRIORITY_FEE)] for _ in range(count)],
+            }
+        if method == 'eth_getBlockByNumber':
+            return self.block(self._block_number(params[0]))
+        if method == 'eth_getBalance':
+            with self._lock:
+                return _hex(self.native_balance(to_checksum_address(params[0])))
+        if method == 'eth_getTransactionCount':
+            return _hex(self.transaction_count(to_checksum_address(params[0]), params[1] if len(params) > 1 else 'latest'))
+        if method == 'eth_getCode':
+            return '0x60'
+        if method == 'eth_call':
+            with self._lock:
+                return '0x' + self.call(params[0]['to'], bytes.fromhex(params[0].get('data', params[0].get('input', '0x'))[2:])).hex()
+        if method == 'eth_estimateGas':
+            return _hex(self.estimate_gas(params[0]))
+        if method == 'eth_sendRawTransaction':
+            return self.send_raw(params[0])
+        if method == 'eth_getTransactionReceipt':
+            return self.receipts.get(params[0].lower())
+        if method == 'eth_getBlockReceipts':
+            return self.blocks.get(self._block_number(params[0]), [])
+        if method == 'eth_getTransactionByHash':
+            tx = self.transactions.get(params[0].lower())
+            if tx is None:
+                return None
+            return {
+                'hash': tx['hash'], 'from': tx['from'], 'to': tx['to'], 'nonce': _hex(tx['nonce']),
+                'gas': _hex(tx['gas']), 'gasPrice': _hex(tx['gasPrice']), 'value': _hex(tx['value']),
+                'input': '0x' + tx['data'].hex(), 'blockNumber': _hex(tx['blockNumber']) if 'blockNumber' in tx else None,
+                'blockHash': None, 'transactionIndex': None, 'type': '0x0', 'chainId': _hex(self.chain_id),
+                'v': '0x0', 'r': '0x0', 's': '0x0',
+            }
+        raise ValueError(f"method {method} not supported")
+
+
+class World:
+    def __init__(self, config, unfunded=()):
+        """
+        Общее состояние заглушек всех сетей: пополнение на Base зачисляет FTM на Fantom
+        через bridge_delay секунд.
+
+        :param config: Параметры заглушек (см. DEFAULT_CONFIG)
+        :param unfunded: Адреса без FTM на Fantom (им нужно пополнение)
+        """
+        self.config = config
+        self.unfunded = {to_checksum_address(address) for address in unfunded}
+        self.chains = {name: ChainState(name, self, config['block_time'][name]) for name in CHAIN_IDS}
+        self.random = random.Random(0)
+        self.lifi_calls = Counter()
+        self._credits = []
+        self._lock = threading.Lock()
+
+    def initial_native(self, chain, address):
+        if chain == 'fantom' and address in self.unfunded:
+            return 0
+        return NATIVE_BALANCES[chain]
+
+    def schedule_credit(self, chain, address, amount):
+        with self._lock:
+            self._credits.append((time.monotonic() + self.config['bridge_delay'], chain, address, amount))
+
+    def apply_credits(self, chain):
+        now = time.monotonic()
+        with self._lock:
+            due = [credit for credit in self._credits if credit[1] == chain and credit[0] <= now]
+            self._credits = [credit for credit in self._credits if credit not in due]
+        state = self.chains[chain]
+        with state._lock:
+            for _, _, address, amount in due:
+                state.native[address] = state.native_balance(address) + amount
+
+    def delay(self, latency):
+        time.sleep(latency + self.random.random() * self.config['jitter'])
+
+    def throttled(self, rate):
+        return rate > 0 and self.random.random() < rate
+
+
+def _respond(handler, status, body, headers=()):
+    handler.send_response(status)
+    handler.send_header('Content-Type', 'application/json')
+    handler.send_header('Content-Length', str(len(body)))
+    for name, value in headers:
+        handler.send_header(name, value)
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def _throttle(handler, world):
+    headers = [('Retry-After', str(world.config['retry_after']))] if world.config['retry_after'] is not None else []
+    _respond(handler, 429, b'{"error": "rate limited"}', headers)
+
+
+def make_rpc_handler(state):
+    world = state.world
+
+    class RpcHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            requests = body if isinstance(body, list) else [body]
+            if requests and requests[0].get('method') == 'stub_stats':
+                _respond(self, 200, json.dumps({'jsonrpc': '2.0', 'id': requests[0]['id'], 'result': dict(state.calls)}).encode())
+                return
+            state.calls['http_requests'] += 1
+            world.delay(world.config['latency'])
+            if world.throttled(world.config['throttle_rate']):
+                state.calls['throttled'] += 1
+                _throttle(self, world)
+                return
+            responses = []
+            for request in requests:
+                state.calls[request['method']] += 1
+                try:
+                    result = state.handle(request['method'], request.get('params') or [])
+                    responses.append({'jsonrpc': '2.0', 'id': request['id'], 'result': result})
+                except Exception as e:
+                    responses.append({'jsonrpc': '2.0', 'id': request['id'], 'error': {'code': -32000, 'message': str(e)}})
+            _respond(self, 200, json.dumps(responses if isinstance(body, list) else responses[0]).encode())
+
+    return RpcHandler
+
+
+def make_lifi_handler(world):
+    class LifiHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/stats':
+                _respond(self, 200, json.dumps(dict(world.lifi_calls)).encode())
+                return
+            world.lifi_calls['http_requests'] += 1
+            world.delay(world.config['lifi_latency'])
+            if world.throttled(world.config['lifi_throttle_rate']):
+                world.lifi_calls['throttled'] += 1
+                _throttle(self, world)
+                return
+            if url.path != '/v1/quote':
+                _respond(self, 404, b'{"message": "not found"}')
+                return
+            world.lifi_calls['quote'] += 1
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            amount = int(params.get('fromAmount', '0'))
+            quote = {
+                'tool': params.get('allowBridges', 'squid'),
+                'estimate': {
+                    'fromAmount': str(amount), 'toAmount': str(FUND_CREDIT), 'toAmountMin': str(FUND_CREDIT),
+                    'executionDuration': world.config['bridge_delay'],
+                    'fromAmountUSD': '3.00', 'toAmountUSD': '2.90', 'gasCosts': [{'amountUSD': '0.01'}],
+                },
+                'transactionRequest': {
+                    'to': LIFI_DIAMOND, 'data': '0x' + keccak(self.path.encode()).hex()[:72],
+                    'value': hex(amount), 'chainId': CHAIN_IDS['base'],
+                },
+            }
+            _respond(self, 200, json.dumps(quote).encode())
+
+    return LifiHandler
+
+
+def _serve(handler):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def start_stubs(config=None, unfunded=()):
+    """
+    Запускает в текущем процессе заглушки JSON-RPC всех сетей и API LI.FI.
+
+    :param config: Параметры, дополняющие DEFAULT_CONFIG
+    :param unfunded: Адреса без FTM на Fantom
+    :return: Кортеж (World, {сеть: [URL узлов]}, URL LI.FI)
+    """
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    world = World(config, unfunded)
+    urls = {}
+    for name, state in world.chains.items():
+        urls[name] = [_serve(make_rpc_handler(state)) for _ in range(config['endpoints'])]
+        threading.Thread(target=state.run, name=f"{name}-miner", daemon=True).start()
+    return world, urls, _serve(make_lifi_handler(world)) + '/v1'
+
+
+def serve_stubs(config, unfunded, connection):
+    """Точка входа отдельного процесса заглушек: отправляет URL в connection и работает до завершения процесса."""
+    _, urls, lifi_url = start_stubs(config, unfunded)
+    connection.send((urls, lifi_url))
+    threading.Event().wait()
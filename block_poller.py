@@ -0,0 +1,79 @@
+import threading
+import time
+
+from events import get_event_log
+from providers import get_web3
+
+# Интервал опроса eth_blockNumber по умолчанию, секунды
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+class BlockPoller:
+    def __init__(self, web3, poll_interval=DEFAULT_POLL_INTERVAL, name='blocks'):
+        """
+        Один поток на сеть, который следит за новыми блоками и уведомляет подписчиков.
+
+        :param web3: Экземпляр Web3 сети
+        :param poll_interval: Интервал опроса eth_blockNumber в секундах
+        :param name: Имя потока (для отладки)
+        """
+        self.web3 = web3
+        self.poll_interval = poll_interval
+        self.name = name
+        self.last_block = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, callback):
+        """
+        :param callback: Функция callback(block_number), вызывается из потока опроса на каждый новый блок
+        """
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _run(self):
+        while True:
+            # Без подписчиков поток завершается и будет запущен снова при следующей подписке
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                block_number = self.web3.eth.block_number
+            except Exception as e:
+                get_event_log().warning("⚠️ Ошибка при получении номера блока", chain=self.name, error=str(e))
+                time.sleep(self.poll_interval)
+                continue
+            if self.last_block is None or block_number > self.last_block:
+                self.last_block = block_number
+                with self._lock:
+                    subscribers = list(self._subscribers)
+                for callback in subscribers:
+                    try:
+                        callback(block_number)
+                    except Exception as e:
+                        get_event_log().warning("⚠️ Ошибка обработчика блока", chain=self.name, block=block_number, error=str(e))
+            time.sleep(self.poll_interval)
+
+
+_pollers = {}
+_pollers_lock = threading.Lock()
+
+
+def get_block_poller(chain, poll_interval=DEFAULT_POLL_INTERVAL):
+    """Возвращает общий BlockPoller сети."""
+    with _pollers_lock:
+        poller = _pollers.get(chain)
+        if poller is None:
+            poller = _pollers[chain] = BlockPoller(get_web3(chain), poll_interval, name=f"{chain}-blocks")
+        return poller
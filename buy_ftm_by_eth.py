@@ -1,18 +1,42 @@
-import json
-import requests
+import time
 from web3 import Web3
-from eth_account import Account
+from batch_provider import gather
+from providers import RPC_URLS, get_web3, send_raw_transaction
+from receipt_tracker import wait_for_receipt
+from gas_cache import get_gas_cache
+from fee_oracle import get_fee_oracle, max_fee_per_gas
+from lifi_client import LifiError, get_lifi_client
+from quote_race import POLICY_FASTEST, get_bridge_stats, race_quotes
+from accounts import get_account
+from metrics import STAGE_FUND, staged
+from events import get_event_log
 from web3.exceptions import ContractLogicError
 
 # Конфигурация глобальных констант
-BASE_RPC = 'https://mainnet.base.org'
+BASE_RPC = RPC_URLS['base']
 ETH_ADDRESS = "0xEeeeeEeeeEeEeeEeEeEeeEEEeeeeEeeeeeeeEEeE"  # ETH
 LIFI_CONTRACT_ADDRESS = Web3.to_checksum_address('0x1231DEB6f5749EF6cE6943a275A1D3E7486F4EaE')
 BASE_CHAIN_ID = 8453  # Base
 FANTOM_CHAIN_ID = 250  # Fantom
 FTM_TOKEN_ADDRESS = "0x0000000000000000000000000000000000000000"  # FTM на Fantom
 
-def swap_eth_base_to_fantom(private_key, amount_eth, rpc_url=BASE_RPC, from_token=ETH_ADDRESS, to_chain_id=FANTOM_CHAIN_ID, to_token=FTM_TOKEN_ADDRESS, bridge="squid"):
+log = get_event_log()
+
+def build_quote_params(wallet_address, amount_eth_wei, from_token=ETH_ADDRESS, to_chain_id=FANTOM_CHAIN_ID, to_token=FTM_TOKEN_ADDRESS, bridge="squid"):
+    """Параметры запроса котировки LI.FI для перевода с Base."""
+    return {
+        "fromChain": str(BASE_CHAIN_ID),
+        "toChain": str(to_chain_id),
+        "fromToken": from_token,
+        "toToken": to_token,
+        "fromAmount": str(amount_eth_wei),
+        "fromAddress": wallet_address,
+        "toAddress": wallet_address,
+        "allowBridges": [bridge]
+    }
+
+@staged(STAGE_FUND)
+def swap_eth_base_to_fantom(private_key, amount_eth, rpc_url=BASE_RPC, from_token=ETH_ADDRESS, to_chain_id=FANTOM_CHAIN_ID, to_token=FTM_TOKEN_ADDRESS, bridge="squid", bridges=None, policy=POLICY_FASTEST, on_sent=None):
     """
     Переводит ETH с Base на Fantom через LI.FI, получая FTM.
 
@@ -23,112 +47,119 @@ def swap_eth_base_to_fantom(private_key, amount_eth, rpc_url=BASE_RPC, from_toke
     :param to_chain_id: Chain ID сети назначения (по умолчанию 250 для Fantom)
     :param to_token: Адрес токена на сети назначения (по умолчанию FTM)
     :param bridge: Используемый мост (по умолчанию "squid")
+    :param bridges: Список мостов: котировки запрашиваются параллельно, мост выбирается по policy (bridge игнорируется)
+    :param policy: Политика выбора моста: 'fastest', 'cheapest' или 'best_amount'
+    :param on_sent: Функция on_sent(kind, tx_hash, nonce), вызывается сразу после отправки транзакции
     :return: Хэш транзакции или None в случае ошибки
     """
     # Преобразование amount_eth в amount_eth_wei (1 ETH = 10^18 wei)
     try:
         amount_eth_wei = int(amount_eth * 10**18)
     except (ValueError, TypeError) as e:
-        print(f"❌ Ошибка при преобразовании суммы ETH в wei: {str(e)}")
+        log.error("❌ Ошибка при преобразовании суммы ETH в wei", chain='base', error=str(e))
         return None
-    print(f"Сумма для перевода: {amount_eth} ETH ({amount_eth_wei} wei)")
 
     # Инициализация аккаунта
     try:
-        account = Account.from_key(private_key)
+        account = get_account(private_key)
     except ValueError as e:
-        print(f"❌ Ошибка при инициализации аккаунта: {str(e)}")
+        log.error("❌ Ошибка при инициализации аккаунта", chain='base', error=str(e))
         return None
     wallet_address = account.address
-    print(f"\n▶️ Адрес кошелька: {wallet_address}")
+    log.info("▶️ Перевод ETH с Base на Fantom", chain='base', address=wallet_address, amount_eth=amount_eth)
 
-    # Подключение к Base
-    web3 = Web3(Web3.HTTPProvider(rpc_url))
-    if not web3.is_connected():
-        print(f'❌ Не удалось подключиться к Base RPC: {rpc_url}')
-        return None
-    print('✅ Успешно подключено к Base RPC')
+    # Общий клиент Base с пулом соединений
+    web3 = get_web3('base', rpc_url)
 
     # Проверка баланса ETH
     eth_balance = web3.eth.get_balance(wallet_address)
     eth_balance_in_ether = web3.from_wei(eth_balance, 'ether')
-    print(f'Баланс ETH на адресе {wallet_address}: {eth_balance_in_ether} ETH')
+    log.debug("💰 Баланс ETH", chain='base', balance_eth=eth_balance_in_ether)
     if eth_balance < amount_eth_wei:
-        print(f'❌ Недостаточно ETH! Требуется: {web3.from_wei(amount_eth_wei, "ether")} ETH, доступно: {eth_balance_in_ether}')
+        log.error("❌ Недостаточно ETH", chain='base', required_eth=web3.from_wei(amount_eth_wei, 'ether'), balance_eth=eth_balance_in_ether)
         return None
 
     # Шаг 1: Получение котировки через API LI.FI
-    url = "https://li.quest/v1/quote"
-    params = {
-        "fromChain": str(BASE_CHAIN_ID),
-        "toChain": str(to_chain_id),
-        "fromToken": from_token,
-        "toToken": to_token,
-        "fromAmount": str(amount_eth_wei),
-        "fromAddress": wallet_address,
-        "toAddress": wallet_address,
-        "allowBridges": [bridge]
-    }
-    response = requests.get(url, params=params)
-    if response.status_code != 200:
-        print(f"Статус: {response.status_code}")
-        print(f"Ответ: {response.text[:500]}")
-        print(f'❌ Ошибка API LI.FI: {response.text}')
+    params = build_quote_params(wallet_address, amount_eth_wei, from_token, to_chain_id, to_token, bridge)
+    try:
+        if bridges:
+            bridge, quote = race_quotes(params, bridges, policy)
+            log.info("🌉 Выбран мост", chain='base', bridge=bridge, policy=policy)
+        else:
+            quote = get_lifi_client().get_quote(params)
+    except LifiError as e:
+        log.error(f"❌ {str(e)}", chain='base', status_code=e.status_code)
+        log.debug("Ответ LI.FI", chain='base', payload=e.text)
         return None
-    quote = response.json()
-    print(f"Полный ответ API: {json.dumps(quote, indent=2)}")
+    log.info("🧭 Маршрут LI.FI", chain='base', tool=quote.get('tool'), duration_estimate=quote['estimate'].get('executionDuration'))
+    log.debug("Котировка LI.FI", chain='base', payload=quote)
 
     call_to = quote['transactionRequest']['to']
     call_data = quote['transactionRequest']['data']
     value = int(quote['transactionRequest']['value'], 16) if quote['transactionRequest']['value'].startswith('0x') else int(quote['transactionRequest']['value'])
     min_amount = int(quote['estimate']['toAmountMin'])
-    print(f'callTo: {call_to}')
-    print(f'callData: {call_data}')
-    print(f'value: {web3.from_wei(value, "ether")} ETH')
-    print(f'minAmount: {web3.from_wei(min_amount, "ether")} FTM')
+    log.debug("Транзакция LI.FI", chain='base', to=call_to, value_eth=web3.from_wei(value, 'ether'),
+              min_amount_ftm=web3.from_wei(min_amount, 'ether'), payload=call_data)
 
     # Шаг 2: Подготовка и отправка транзакции
-    nonce = web3.eth.get_transaction_count(wallet_address, 'pending')
-    gas_price = web3.eth.gas_price * 2
+    # Комиссии EIP-1559 из общей оценки сети (одно чтение eth_feeHistory на блок)
+    nonce, fees = gather(
+        lambda: web3.eth.get_transaction_count(wallet_address, 'pending'),
+        lambda: get_fee_oracle('base').fee_params(),
+    )
 
     tx = {
         'from': wallet_address,
         'to': call_to,
         'value': value,
-        'gasPrice': gas_price,
+        **fees,
         'nonce': nonce,
         'data': call_data,
         'chainId': BASE_CHAIN_ID
     }
 
     try:
-        estimated_gas = web3.eth.estimate_gas(tx)
-        print(f'Оценка газа успешна: {estimated_gas} единиц')
-        tx['gas'] = int(estimated_gas * 1.2)
+        tx['gas'] = get_gas_cache().estimate('base', web3, tx)
     except Exception as e:
-        print(f'Ошибка при оценке газа: {str(e)}')
+        log.warning("⚠️ Ошибка при оценке газа, используем запасной лимит", chain='base', gas=600000, error=str(e))
         tx['gas'] = 600000
 
-    estimated_gas_cost = tx['gas'] * tx['gasPrice']
-    print(f'Оценочная стоимость газа для свопа: {web3.from_wei(estimated_gas_cost, "ether")} ETH')
+    estimated_gas_cost = tx['gas'] * max_fee_per_gas(tx)
+    log.debug("⛽️ Газ свопа", chain='base', gas=tx['gas'], gas_cost_eth=web3.from_wei(estimated_gas_cost, 'ether'))
     total_eth_needed = value + estimated_gas_cost
     if total_eth_needed > eth_balance:
-        print(f'❌ Недостаточно ETH! Требуется: {web3.from_wei(total_eth_needed, "ether")} ETH (value + gas), доступно: {eth_balance_in_ether}')
+        log.error("❌ Недостаточно ETH на value и газ", chain='base',
+                  required_eth=web3.from_wei(total_eth_needed, 'ether'), balance_eth=eth_balance_in_ether)
         return None
 
+    # Баланс FTM до отправки нужен для измерения фактического времени доставки моста
+    ftm_balance_before = get_web3('fantom').eth.get_balance(wallet_address) if to_chain_id == FANTOM_CHAIN_ID else None
+
     signed_tx = account.sign_transaction(tx)
-    tx_hash = web3.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print(f'Транзакция свопа и бриджа отправлена: https://basescan.org/tx/{tx_hash.hex()}')
+    tx_hash = send_raw_transaction(web3, signed_tx.raw_transaction)
+    get_gas_cache().watch('base', tx, tx_hash)
+    sent_at = time.monotonic()
+    if on_sent:
+        on_sent('fund', tx_hash, nonce)
+    log.info("🚀 Транзакция свопа и бриджа отправлена", chain='base', tx_hash=tx_hash, nonce=nonce)
 
     try:
-        receipt = web3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+        receipt = wait_for_receipt('base', tx_hash, timeout=120)
         if receipt['status'] == 1:
-            print(f'✅ Транзакция успешно выполнена: https://basescan.org/tx/{tx_hash.hex()}')
+            log.info("✅ Транзакция выполнена", chain='base', tx_hash=tx_hash, gas_used=receipt['gasUsed'],
+                     seconds=round(time.monotonic() - sent_at, 2))
+            if ftm_balance_before is not None:
+                # Доставкой считается любой рост баланса: свап может потратить часть FTM
+                # раньше, чем наблюдатель увидит полный баланс ftm_balance_before + min_amount
+                get_bridge_stats().track_delivery(
+                    bridge, wallet_address, ftm_balance_before + 1,
+                    estimated=quote['estimate'].get('executionDuration'), started_at=sent_at,
+                )
         else:
-            print(f'❌ Транзакция провалилась: https://basescan.org/tx/{tx_hash.hex()}')
-            print(f'Логи: {receipt}')
+            log.error("❌ Транзакция провалилась", chain='base', tx_hash=tx_hash, gas_used=receipt['gasUsed'])
+            log.debug("Квитанция", chain='base', tx_hash=tx_hash, payload=dict(receipt))
     except Exception as e:
-        print(f'❌ Ошибка при проверке транзакции: {str(e)}')
+        log.error("❌ Ошибка при проверке транзакции", chain='base', tx_hash=tx_hash, error=str(e))
 
     return tx_hash
 
@@ -143,12 +174,12 @@ if __name__ == "__main__":
     amount_eth = 0.001  # Теперь вводим сумму в ETH (например, 0.001 ETH)
 
     for pk in private_keys:
-        print(f"\nОбработка кошелька с приватным ключом: {pk[:6]}...{pk[-6:]}")
         tx_hash = swap_eth_base_to_fantom(
             private_key=pk,
             amount_eth=amount_eth
         )
         if tx_hash:
-            print(f"Успешно завершено для кошелька: {tx_hash.hex()}")
+            log.info("🎉 Перевод для кошелька завершен", chain='base', tx_hash=tx_hash)
         else:
-            print("Не удалось выполнить перевод для этого кошелька")
+            log.error("❌ Не удалось выполнить перевод для этого кошелька", chain='base')
+    log.flush()
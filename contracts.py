@@ -0,0 +1,45 @@
+import json
+import os
+import threading
+
+# Каталог с ABI-файлами (рядом с модулями, не зависит от текущей директории)
+ABI_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_abi_cache = {}
+_contract_cache = {}
+_lock = threading.Lock()
+
+
+def load_abi(filename):
+    """
+    Загружает ABI из JSON-файла один раз за процесс.
+
+    :param filename: Имя файла ABI, например 'bridge_abi.json'
+    :return: Разобранный ABI (общий объект, не изменять)
+    """
+    abi = _abi_cache.get(filename)
+    if abi is None:
+        with _lock:
+            abi = _abi_cache.get(filename)
+            if abi is None:
+                with open(os.path.join(ABI_DIR, filename)) as f:
+                    abi = _abi_cache[filename] = json.load(f)
+    return abi
+
+
+def get_contract(web3, address, abi_filename):
+    """
+    Возвращает общий объект контракта для клиента web3, создавая его при первом обращении.
+
+    :param web3: Экземпляр Web3
+    :param address: Адрес контракта (checksum)
+    :param abi_filename: Имя файла ABI
+    :return: Объект контракта web3
+    """
+    key = (id(web3), address, abi_filename)
+    contract = _contract_cache.get(key)
+    if contract is None:
+        contract = web3.eth.contract(address=address, abi=load_abi(abi_filename))
+        with _lock:
+            contract = _contract_cache.setdefault(key, contract)
+    return contract
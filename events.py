@@ -0,0 +1,208 @@
+import atexit
+import json
+import queue
+import sys
+import threading
+import time
+from collections.abc import Mapping
+from decimal import Decimal
+
+from metrics import current_tags
+
+# Уровни событий
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR}
+LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+# Сколько событий может ждать записи; при переполнении новые события отбрасываются,
+# чтобы воркеры никогда не ждали вывода
+QUEUE_SIZE = 100000
+
+# Поля, которые консоль показывает в заголовке строки, а не списком key=value
+HEADER_FIELDS = ('ts', 'level', 'message', 'wallet', 'stage', 'chain')
+# Поля с большими данными (котировки, квитанции): только в JSONL, в консоли не выводятся
+PAYLOAD_FIELDS = ('payload',)
+
+
+def _plain(value):
+    # Значения событий приводятся к типам JSON: хэши — к 0x-строкам, Decimal — к строке
+    if isinstance(value, (bytes, bytearray)):
+        return '0x' + bytes(value).hex()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, Mapping):
+        return {str(key): _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+
+class ConsoleSink:
+    def __init__(self, level=INFO, stream=None):
+        """
+        Компактный вывод в консоль: время, [кошелек этап сеть], сообщение и поля key=value.
+
+        :param level: Минимальный уровень событий
+        :param stream: Поток вывода (по умолчанию текущий sys.stdout)
+        """
+        self.level = level
+        self.stream = stream
+
+    def format(self, event):
+        tags = []
+        if event.get('wallet') is not None:
+            tags.append(f"#{event['wallet'] + 1}")
+        tags.extend(event[name] for name in ('stage', 'chain') if event.get(name))
+        line = time.strftime('%H:%M:%S', time.localtime(event['ts']))
+        if tags:
+            line += f" [{' '.join(tags)}]"
+        line += f" {event['message']}"
+        fields = [f"{key}={value}" for key, value in event.items()
+                  if key not in HEADER_FIELDS and key not in PAYLOAD_FIELDS and value is not None]
+        if fields:
+            line += '  ' + ' '.join(fields)
+        return line
+
+    def write(self, event):
+        stream = self.stream or sys.stdout
+        stream.write(self.format(event) + '\n')
+        stream.flush()
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink:
+    def __init__(self, path, level=DEBUG):
+        """
+        Запись событий в файл JSON Lines (одно событие — одна строка).
+
+        :param path: Путь к файлу (дописывается)
+        :param level: Минимальный уровень событий
+        """
+        self.path = path
+        self.level = level
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, event):
+        self._file.write(json.dumps(event, ensure_ascii=False, default=str) + '\n')
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class EventLog:
+    def __init__(self, sinks=None, queue_size=QUEUE_SIZE):
+        """
+        Журнал событий: события ставятся в очередь без ожидания и записываются
+        во все приемники фоновым потоком. Кошелек и этап берутся из контекста метрик (tagged).
+
+        :param sinks: Приемники событий (по умолчанию консоль с уровнем INFO)
+        :param queue_size: Максимум событий в очереди
+        """
+        self.sinks = list(sinks) if sinks is not None else [ConsoleSink()]
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def set_sinks(self, sinks):
+        """Заменяет приемники; события, уже стоящие в очереди, записываются в старые."""
+        self.flush()
+        old, self.sinks = self.sinks, list(sinks)
+        for sink in old:
+            if sink not in self.sinks:
+                sink.close()
+
+    def enabled(self, level):
+        return any(level >= sink.level for sink in self.sinks)
+
+    def emit(self, level, message, **fields):
+        """
+        Ставит событие в очередь.
+
+        :param level: DEBUG, INFO, WARNING или ERROR
+        :param message: Текст события
+        :param fields: Поля события: chain, tx_hash, суммы, длительности, payload (большие данные)
+        """
+        # Событие ниже уровня всех приемников даже не собирается (большие payload не сериализуются)
+        if not self.enabled(level):
+            return
+        wallet, stage = current_tags()
+        event = {'ts': time.time(), 'level': LEVEL_NAMES[level], 'message': message, 'wallet': wallet, 'stage': stage}
+        event.update((key, _plain(value)) for key, value in fields.items())
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((level, event))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def debug(self, message, **fields):
+        self.emit(DEBUG, message, **fields)
+
+    def info(self, message, **fields):
+        self.emit(INFO, message, **fields)
+
+    def warning(self, message, **fields):
+        self.emit(WARNING, message, **fields)
+
+    def error(self, message, **fields):
+        self.emit(ERROR, message, **fields)
+
+    def flush(self):
+        """Ждет, пока все события из очереди будут записаны."""
+        if self._worker is not None:
+            self._queue.join()
+        for sink in self.sinks:
+            if hasattr(sink, 'flush'):
+                sink.flush()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name='event-log', daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            level, event = self._queue.get()
+            try:
+                for sink in self.sinks:
+                    if level >= sink.level:
+                        try:
+                            sink.write(event)
+                        except Exception as e:
+                            sys.stderr.write(f"⚠️ Ошибка записи события в {type(sink).__name__}: {str(e)}\n")
+            finally:
+                self._queue.task_done()
+
+
+_event_log = EventLog()
+atexit.register(_event_log.flush)
+
+
+def get_event_log():
+    """Возвращает общий для процесса журнал событий."""
+    return _event_log
+
+
+def configure_events(console_level='info', jsonl_path=None, jsonl_level='debug'):
+    """
+    Задает приемники общего журнала событий.
+
+    :param console_level: Уровень консоли: 'debug', 'info', 'warning' или 'error'
+    :param jsonl_path: Файл JSON Lines (необязательно)
+    :param jsonl_level: Уровень файла JSON Lines
+    """
+    sinks = [ConsoleSink(LEVELS[console_level])]
+    if jsonl_path:
+        sinks.append(JsonLinesSink(jsonl_path, LEVELS[jsonl_level]))
+    _event_log.set_sinks(sinks)
@@ -0,0 +1,88 @@
+import threading
+import time
+
+from events import get_event_log
+from providers import get_web3
+
+# Сети, в которых отправляются транзакции EIP-1559 (type 2)
+EIP1559_CHAINS = {'base', 'arbitrum', 'optimism'}
+# Примерное время блока, секунды: комиссии читаются не чаще одного раза за блок
+BLOCK_TIMES = {'fantom': 1.0, 'base': 2.0, 'arbitrum': 0.25, 'optimism': 2.0}
+# Сколько последних блоков учитывается в eth_feeHistory
+FEE_HISTORY_BLOCKS = 10
+# Перцентиль чаевых в блоке
+PRIORITY_FEE_PERCENTILE = 50
+# Минимальные чаевые, wei (Arbitrum чаевые не использует)
+MIN_PRIORITY_FEE = {'base': 10**6, 'optimism': 10**6, 'arbitrum': 0}
+# Запас к base fee следующего блока в maxFeePerGas
+BASE_FEE_HEADROOM = 1.5
+
+
+def max_fee_per_gas(tx):
+    """Максимальная цена газа транзакции (для проверки баланса): maxFeePerGas или gasPrice."""
+    return tx['maxFeePerGas'] if 'maxFeePerGas' in tx else tx['gasPrice']
+
+
+class FeeOracle:
+    def __init__(self, chain, ttl=None, eip1559=None):
+        """
+        Общая для всех кошельков оценка комиссий сети: eth_feeHistory (или eth_gasPrice
+        для сетей без EIP-1559) читается не чаще одного раза за блок.
+
+        :param chain: Название сети
+        :param ttl: Время жизни оценки, секунды (по умолчанию время блока сети)
+        :param eip1559: Отправлять транзакции type 2 (по умолчанию для сетей из EIP1559_CHAINS)
+        """
+        self.chain = chain
+        self.web3 = get_web3(chain)
+        self.ttl = ttl if ttl is not None else BLOCK_TIMES.get(chain, 1.0)
+        self.eip1559 = chain in EIP1559_CHAINS if eip1559 is None else eip1559
+        self._params = None
+        self._updated_at = 0
+        self._lock = threading.Lock()
+
+    def _read(self):
+        if self.eip1559:
+            try:
+                history = self.web3.eth.fee_history(FEE_HISTORY_BLOCKS, 'latest', [PRIORITY_FEE_PERCENTILE])
+            except Exception as e:
+                get_event_log().info("ℹ️ eth_feeHistory недоступен, используем gasPrice", chain=self.chain, error=str(e))
+                self.eip1559 = False
+            else:
+                # Последний элемент baseFeePerGas — base fee следующего блока
+                base_fee = history['baseFeePerGas'][-1]
+                rewards = sorted(reward[0] for reward in history.get('reward') or [] if reward)
+                priority_fee = rewards[len(rewards) // 2] if rewards else 0
+                priority_fee = max(priority_fee, MIN_PRIORITY_FEE.get(self.chain, 0))
+                return {
+                    'maxFeePerGas': int(base_fee * BASE_FEE_HEADROOM) + priority_fee,
+                    'maxPriorityFeePerGas': priority_fee,
+                }
+        return {'gasPrice': self.web3.eth.gas_price}
+
+    def fee_params(self):
+        """
+        :return: Поля комиссии для транзакции: {'maxFeePerGas', 'maxPriorityFeePerGas'} или {'gasPrice'}
+        """
+        with self._lock:
+            if self._params is None or time.monotonic() - self._updated_at >= self.ttl:
+                self._params = self._read()
+                self._updated_at = time.monotonic()
+            return dict(self._params)
+
+    def gas_price(self):
+        """Максимальная цена газа за единицу по текущей оценке."""
+        return max_fee_per_gas(self.fee_params())
+
+
+_oracles = {}
+_oracles_lock = threading.Lock()
+
+
+def get_fee_oracle(chain):
+    """Возвращает общий FeeOracle сети."""
+    with _oracles_lock:
+        oracle = _oracles.get(chain)
+        if oracle is None:
+            oracle = _oracles[chain] = FeeOracle(chain)
+        return oracle
@@ -1,17 +1,27 @@
 import json
-import requests
 from web3 import Web3
-from eth_account import Account
+from batch_provider import gather
+from providers import RPC_URLS, get_web3, send_raw_transaction
+from receipt_tracker import wait_for_receipt
+from gas_cache import get_gas_cache
+from fee_oracle import get_fee_oracle, max_fee_per_gas
+from approvals import get_approval_policy
+from lifi_client import LifiError, get_lifi_client
+from accounts import get_account
+from metrics import STAGE_FUND, staged
+from events import get_event_log
 from web3.exceptions import ContractLogicError
 
 # Конфигурация глобальных констант
-BASE_RPC = 'https://mainnet.base.org'
+BASE_RPC = RPC_URLS['base']
 USDC_ADDRESS = Web3.to_checksum_address('0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913')  # USDC на Base
 LIFI_CONTRACT_ADDRESS = Web3.to_checksum_address('0x1231DEB6f5749EF6cE6943a275A1D3E7486F4EaE')
 BASE_CHAIN_ID = 8453  # Base
 FANTOM_CHAIN_ID = 250  # Fantom
 FTM_TOKEN_ADDRESS = "0x0000000000000000000000000000000000000000"  # FTM на Fantom
 
+log = get_event_log()
+
 # ABI для ERC20
 ERC20_ABI = json.loads('''
 [
@@ -22,6 +32,7 @@ ERC20_ABI = json.loads('''
 ''')
 
 # Функция для перевода USDC с Base на FTM
+@staged(STAGE_FUND)
 def swap_usdc_base_to_fantom(private_key, amount_usdc, rpc_url=BASE_RPC, from_token=USDC_ADDRESS, to_chain_id=FANTOM_CHAIN_ID, to_token=FTM_TOKEN_ADDRESS, bridge="squid"):
     """
     Переводит USDC с Base на Fantom через LI.FI.
@@ -36,87 +47,87 @@ def swap_usdc_base_to_fantom(private_key, amount_usdc, rpc_url=BASE_RPC, from_to
     :return: Хэш транзакции или None в случае ошибки
     """
     # Инициализация аккаунта
-    account = Account.from_key(private_key)
+    account = get_account(private_key)
     wallet_address = account.address
-    print(f"\n▶️ Адрес кошелька: {wallet_address}")
+    log.info("▶️ Перевод USDC с Base на Fantom", chain='base', address=wallet_address, amount_usdc=amount_usdc / 10**6)
 
-    # Подключение к Base
-    web3 = Web3(Web3.HTTPProvider(rpc_url))
-    if not web3.is_connected():
-        print(f'❌ Не удалось подключиться к Base RPC: {rpc_url}')
-        return None
-    print('✅ Успешно подключено к Base RPC')
+    # Общий клиент Base с пулом соединений
+    web3 = get_web3('base', rpc_url)
 
     # Инициализация контракта USDC
     usdc_contract = web3.eth.contract(address=from_token, abi=ERC20_ABI)
 
     # Проверка баланса ETH
-    eth_balance = web3.eth.get_balance(wallet_address)
+    eth_balance, balance, allowance = gather(
+        lambda: web3.eth.get_balance(wallet_address),
+        lambda: usdc_contract.functions.balanceOf(wallet_address).call(),
+        lambda: usdc_contract.functions.allowance(wallet_address, LIFI_CONTRACT_ADDRESS).call(),
+    )
     eth_balance_in_ether = web3.from_wei(eth_balance, 'ether')
-    print(f'Баланс ETH на адресе {wallet_address}: {eth_balance_in_ether} ETH')
+    log.debug("💰 Баланс ETH", chain='base', balance_eth=eth_balance_in_ether)
     if eth_balance_in_ether < 0.001:
-        print(f'❌ Недостаточно ETH! Требуется минимум 0.001 ETH, доступно: {eth_balance_in_ether}')
+        log.error("❌ Недостаточно ETH, требуется минимум 0.001 ETH", chain='base', balance_eth=eth_balance_in_ether)
         return None
 
     # Проверка баланса USDC
-    balance = usdc_contract.functions.balanceOf(wallet_address).call()
     balance_in_usdc = balance / 10**6
-    print(f'Баланс USDC на адресе {wallet_address}: {balance_in_usdc} USDC')
+    log.debug("💰 Баланс USDC", chain='base', balance_usdc=balance_in_usdc)
     if balance < amount_usdc:
-        print(f'❌ Недостаточно USDC! Требуется: {amount_usdc / 10**6}, доступно: {balance_in_usdc}')
+        log.error("❌ Недостаточно USDC", chain='base', required_usdc=amount_usdc / 10**6, balance_usdc=balance_in_usdc)
         return None
 
     # Шаг 1: Проверка и выполнение approve
-    allowance = usdc_contract.functions.allowance(wallet_address, LIFI_CONTRACT_ADDRESS).call()
-    print(f'Текущий allowance для LI.FI: {allowance / 10**6} USDC')
-    if allowance < amount_usdc:
-        nonce = web3.eth.get_transaction_count(wallet_address, 'pending')
-        gas_price = web3.eth.gas_price * 2
+    log.debug("🔐 Текущий allowance для LI.FI", chain='base', allowance_usdc=allowance / 10**6)
+    approval_policy = get_approval_policy()
+    if approval_policy.needs_approval(allowance, amount_usdc):
+        nonce, fees = gather(
+            lambda: web3.eth.get_transaction_count(wallet_address, 'pending'),
+            lambda: get_fee_oracle('base').fee_params(),
+        )
 
-        approve_tx = usdc_contract.functions.approve(LIFI_CONTRACT_ADDRESS, amount_usdc).build_transaction({
+        approve_tx = usdc_contract.functions.approve(LIFI_CONTRACT_ADDRESS, approval_policy.amount(amount_usdc)).build_transaction({
             'from': wallet_address,
-            'gasPrice': gas_price,
+            **fees,
             'nonce': nonce,
             'chainId': BASE_CHAIN_ID
         })
 
         try:
-            estimated_gas = web3.eth.estimate_gas(approve_tx)
-            approve_tx['gas'] = int(estimated_gas * 1.2)
-            print(f'Оценка газа для approve: {estimated_gas} единиц')
+            approve_tx['gas'] = get_gas_cache().estimate('base', web3, approve_tx)
         except Exception as e:
-            print(f'Ошибка оценки газа для approve: {str(e)}')
+            log.warning("⚠️ Ошибка оценки газа для approve, используем запасной лимит", chain='base', gas=65000, error=str(e))
             approve_tx['gas'] = 65000
 
-        estimated_gas_cost = approve_tx['gas'] * approve_tx['gasPrice']
-        print(f'Оценочная стоимость газа для approve: {web3.from_wei(estimated_gas_cost, "ether")} ETH')
+        estimated_gas_cost = approve_tx['gas'] * max_fee_per_gas(approve_tx)
+        log.debug("⛽️ Газ approve", chain='base', gas=approve_tx['gas'], gas_cost_eth=web3.from_wei(estimated_gas_cost, 'ether'))
         if estimated_gas_cost > eth_balance:
-            print(f'❌ Недостаточно ETH для газа approve!')
+            log.error("❌ Недостаточно ETH для газа approve", chain='base', balance_eth=eth_balance_in_ether)
             return None
 
         signed_approve_tx = account.sign_transaction(approve_tx)
-        approve_tx_hash = web3.eth.send_raw_transaction(signed_approve_tx.raw_transaction)
-        print(f'Транзакция approve отправлена: https://basescan.org/tx/{approve_tx_hash.hex()}')
+        approve_tx_hash = send_raw_transaction(web3, signed_approve_tx.raw_transaction)
+        get_gas_cache().watch('base', approve_tx, approve_tx_hash)
+        log.info("🚀 Транзакция approve отправлена", chain='base', tx_hash=approve_tx_hash, nonce=nonce)
 
         try:
-            receipt = web3.eth.wait_for_transaction_receipt(approve_tx_hash, timeout=120)
+            receipt = wait_for_receipt('base', approve_tx_hash, timeout=120)
             if receipt['status'] == 1:
-                print(f'✅ Транзакция approve выполнена: https://basescan.org/tx/{approve_tx_hash.hex()}')
+                log.info("✅ Транзакция approve выполнена", chain='base', tx_hash=approve_tx_hash, gas_used=receipt['gasUsed'])
             else:
-                print(f'❌ Транзакция approve провалилась: https://basescan.org/tx/{approve_tx_hash.hex()}')
-                print(f'Gas Used: {receipt["gasUsed"]} из {receipt["gasLimit"]}')
+                reason = None
                 tx = web3.eth.get_transaction(approve_tx_hash)
                 try:
                     web3.eth.call(tx, block_identifier=receipt['blockNumber'])
                 except ContractLogicError as e:
-                    print(f'Причина ошибки: {str(e)}')
+                    reason = str(e)
+                log.error("❌ Транзакция approve провалилась", chain='base', tx_hash=approve_tx_hash,
+                          gas_used=receipt['gasUsed'], gas=tx['gas'], reason=reason)
                 return None
         except Exception as e:
-            print(f'❌ Ошибка при проверке approve: {str(e)}')
+            log.error("❌ Ошибка при проверке approve", chain='base', tx_hash=approve_tx_hash, error=str(e))
             return None
 
     # Шаг 2: Получение котировки через API LI.FI
-    url = "https://li.quest/v1/quote"
     params = {
         "fromChain": str(BASE_CHAIN_ID),
         "toChain": str(to_chain_id),
@@ -127,65 +138,65 @@ def swap_usdc_base_to_fantom(private_key, amount_usdc, rpc_url=BASE_RPC, from_to
         "toAddress": wallet_address,
         "allowBridges": [bridge]
     }
-    response = requests.get(url, params=params)
-    if response.status_code != 200:
-        print(f"Статус: {response.status_code}")
-        print(f"Ответ: {response.text[:500]}")
-        print(f'❌ Ошибка API LI.FI: {response.text}')
+    try:
+        quote = get_lifi_client().get_quote(params)
+    except LifiError as e:
+        log.error(f"❌ {str(e)}", chain='base', status_code=e.status_code)
+        log.debug("Ответ LI.FI", chain='base', payload=e.text)
         return None
-    quote = response.json()
-    print(f"Полный ответ API: {json.dumps(quote, indent=2)}")
+    log.info("🧭 Маршрут LI.FI", chain='base', tool=quote.get('tool'), duration_estimate=quote['estimate'].get('executionDuration'))
+    log.debug("Котировка LI.FI", chain='base', payload=quote)
 
     call_to = quote['transactionRequest']['to']
     call_data = quote['transactionRequest']['data']
     value = int(quote['transactionRequest']['value'], 16) if quote['transactionRequest']['value'].startswith('0x') else int(quote['transactionRequest']['value'])
     min_amount = int(quote['estimate']['toAmountMin'])
-    print(f'callTo: {call_to}')
-    print(f'callData: {call_data}')
-    print(f'value: {web3.from_wei(value, "ether")} ETH')
-    print(f'minAmount: {web3.from_wei(min_amount, "ether")} FTM')
+    log.debug("Транзакция LI.FI", chain='base', to=call_to, value_eth=web3.from_wei(value, 'ether'),
+              min_amount_ftm=web3.from_wei(min_amount, 'ether'), payload=call_data)
 
     # Шаг 3: Подготовка и отправка транзакции
-    nonce = web3.eth.get_transaction_count(wallet_address, 'pending')
-    gas_price = web3.eth.gas_price * 2
+    # Комиссии EIP-1559 из общей оценки сети (одно чтение eth_feeHistory на блок)
+    nonce, fees = gather(
+        lambda: web3.eth.get_transaction_count(wallet_address, 'pending'),
+        lambda: get_fee_oracle('base').fee_params(),
+    )
 
     tx = {
         'from': wallet_address,
         'to': call_to,
         'value': value,
-        'gasPrice': gas_price,
+        **fees,
         'nonce': nonce,
         'data': call_data,
         'chainId': BASE_CHAIN_ID
     }
 
     try:
-        estimated_gas = web3.eth.estimate_gas(tx)
-        print(f'Оценка газа успешна: {estimated_gas} единиц')
-        tx['gas'] = int(estimated_gas * 1.2)
+        tx['gas'] = get_gas_cache().estimate('base', web3, tx)
     except Exception as e:
-        print(f'Ошибка при оценке газа: {str(e)}')
+        log.warning("⚠️ Ошибка при оценке газа, используем запасной лимит", chain='base', gas=600000, error=str(e))
         tx['gas'] = 600000
 
-    estimated_gas_cost = tx['gas'] * tx['gasPrice']
-    print(f'Оценочная стоимость газа для свопа: {web3.from_wei(estimated_gas_cost, "ether")} ETH')
+    estimated_gas_cost = tx['gas'] * max_fee_per_gas(tx)
+    log.debug("⛽️ Газ свопа", chain='base', gas=tx['gas'], gas_cost_eth=web3.from_wei(estimated_gas_cost, 'ether'))
     if estimated_gas_cost > eth_balance:
-        print(f'❌ Недостаточно ETH для газа свопа!')
+        log.error("❌ Недостаточно ETH для газа свопа", chain='base', balance_eth=eth_balance_in_ether)
         return None
 
     signed_tx = account.sign_transaction(tx)
-    tx_hash = web3.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print(f'Транзакция свопа и бриджа отправлена: https://basescan.org/tx/{tx_hash.hex()}')
+    tx_hash = send_raw_transaction(web3, signed_tx.raw_transaction)
+    get_gas_cache().watch('base', tx, tx_hash)
+    log.info("🚀 Транзакция свопа и бриджа отправлена", chain='base', tx_hash=tx_hash, nonce=nonce)
 
     try:
-        receipt = web3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+        receipt = wait_for_receipt('base', tx_hash, timeout=120)
         if receipt['status'] == 1:
-            print(f'✅ Транзакция успешно выполнена: https://basescan.org/tx/{tx_hash.hex()}')
+            log.info("✅ Транзакция выполнена", chain='base', tx_hash=tx_hash, gas_used=receipt['gasUsed'])
         else:
-            print(f'❌ Транзакция провалилась: https://basescan.org/tx/{tx_hash.hex()}')
-            print(f'Логи: {receipt}')
+            log.error("❌ Транзакция провалилась", chain='base', tx_hash=tx_hash, gas_used=receipt['gasUsed'])
+            log.debug("Квитанция", chain='base', tx_hash=tx_hash, payload=dict(receipt))
     except Exception as e:
-        print(f'❌ Ошибка при проверке транзакции: {str(e)}')
+        log.error("❌ Ошибка при проверке транзакции", chain='base', tx_hash=tx_hash, error=str(e))
 
     return tx_hash
 
@@ -202,12 +213,12 @@ if __name__ == "__main__":
     amount_usdc = 1000000  # 4 USDC
 
     for pk in private_keys:
-        print(f"\nОбработка кошелька с приватным ключом: {pk[:6]}...{pk[-6:]}")
         tx_hash = swap_usdc_base_to_fantom(
             private_key=pk,
             amount_usdc=amount_usdc
         )
         if tx_hash:
-            print(f"Успешно завершено для кошелька: {tx_hash.hex()}")
+            log.info("🎉 Перевод для кошелька завершен", chain='base', tx_hash=tx_hash)
         else:
-            print("Не удалось выполнить перевод для этого кошелька")
\ No newline at end of file
+            log.error("❌ Не удалось выполнить перевод для этого кошелька", chain='base')
+    log.flush()
\ No newline at end of file
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import deque
+
+# Запас к оценке газа (как и прежний множитель 1.2 после eth_estimateGas)
+GAS_MARGIN = 1.2
+# Через сколько секунд наблюдения считаются устаревшими и нужна живая оценка
+GAS_CACHE_TTL = 600
+# Сколько последних наблюдений хранится на ключ
+GAS_SAMPLE_WINDOW = 16
+
+
+def gas_key(chain, tx):
+    """Ключ кэша: сеть, адрес контракта и 4-байтовый селектор функции."""
+    data = tx.get('data') or tx.get('input') or '0x'
+    if isinstance(data, (bytes, bytearray)):
+        data = '0x' + bytes(data).hex()
+    return chain, str(tx.get('to') or '').lower(), data[:10].lower()
+
+
+class GasCache:
+    def __init__(self, margin=GAS_MARGIN, ttl=GAS_CACHE_TTL, window=GAS_SAMPLE_WINDOW):
+        """
+        Кэш лимитов газа по (сеть, контракт, селектор), заполняемый gasUsed успешных
+        квитанций. Лимит — максимум последних наблюдений с запасом margin; живая оценка
+        eth_estimateGas нужна, только пока по ключу нет свежих наблюдений.
+
+        :param margin: Множитель запаса к наблюдаемому газу
+        :param ttl: Время жизни наблюдения, секунды
+        :param window: Количество хранимых наблюдений на ключ
+        """
+        self.margin = margin
+        self.ttl = ttl
+        self.window = window
+        self._samples = {}  # ключ -> deque[(время, газ)]
+        self._lock = threading.Lock()
+
+    def record(self, chain, tx, gas):
+        with self._lock:
+            samples = self._samples.setdefault(gas_key(chain, tx), deque(maxlen=self.window))
+            samples.append((time.monotonic(), int(gas)))
+
+    def lookup(self, chain, tx):
+        """
+        :return: Лимит газа по свежим наблюдениям или None, если кэш холодный
+        """
+        now = time.monotonic()
+        with self._lock:
+            samples = self._samples.get(gas_key(chain, tx))
+            if not samples:
+                return None
+            while samples and now - samples[0][0] > self.ttl:
+                samples.popleft()
+            if not samples:
+                return None
+            return int(max(gas for _, gas in samples) * self.margin)
+
+    def estimate(self, chain, web3, tx):
+        """
+        Лимит газа для транзакции: из кэша или, если кэш холодный, через eth_estimateGas.
+
+        :raises Exception: Ошибка eth_estimateGas при холодном кэше
+        """
+        gas = self.lookup(chain, tx)
+        if gas is not None:
+            return gas
+        estimate_tx = {key: value for key, value in tx.items() if key != 'gas'}
+        estimated = web3.eth.estimate_gas(estimate_tx)
+        self.record(chain, tx, estimated)
+        return int(estimated * self.margin)
+
+    def watch(self, chain, tx, tx_hash):
+        """
+        Добавляет gasUsed квитанции отправленной транзакции в кэш, когда она смайнится.
+        Квитанцию ожидает общий ReceiptTracker сети, отдельных запросов не делается.
+        """
+        from receipt_tracker import get_receipt_tracker
+
+        def on_receipt(future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            receipt = future.result()
+            if receipt['status'] == 1:
+                self.record(chain, tx, receipt['gasUsed'])
+
+        get_receipt_tracker(chain).track(tx_hash).add_done_callback(on_receipt)
+
+
+_cache = GasCache()
+
+
+def get_gas_cache():
+    """Возвращает общий для процесса GasCache."""
+    return _cache
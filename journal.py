@@ -0,0 +1,290 @@
+import os
+import sqlite3
+import threading
+import time
+
+from events import get_event_log
+from pipeline import Stage
+
+# Файл журнала по умолчанию
+JOURNAL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run_journal.sqlite3')
+# Сколько секунд при возобновлении ждать квитанции транзакций, отправленных до сбоя
+RESUME_RECEIPT_TIMEOUT = 180
+
+# Сеть каждого вида транзакции
+TX_CHAINS = {'fund': 'base', 'approve': 'fantom', 'swap': 'fantom'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS wallets (
+    address TEXT PRIMARY KEY,
+    wallet_index INTEGER,
+    network TEXT,
+    stage TEXT,
+    status TEXT NOT NULL,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    tx_hash TEXT PRIMARY KEY,
+    address TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    chain TEXT NOT NULL,
+    nonce INTEGER,
+    status TEXT NOT NULL,
+    sent_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_address ON transactions (address);
+CREATE INDEX IF NOT EXISTS transactions_status ON transactions (status);
+"""
+
+
+def _hex(tx_hash):
+    if isinstance(tx_hash, str):
+        return tx_hash.lower() if tx_hash.startswith('0x') else '0x' + tx_hash.lower()
+    return '0x' + bytes(tx_hash).hex()
+
+
+class RunJournal:
+    def __init__(self, path=JOURNAL_FILE):
+        """
+        Журнал запуска в SQLite: этап и статус каждого кошелька, хэши и nonce
+        отправленных транзакций. Каждая запись сразу фиксируется на диске, поэтому
+        после сбоя запуск продолжается с места остановки.
+
+        :param path: Путь к файлу базы (':memory:' — без сохранения)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def reset(self):
+        """Удаляет все записи журнала."""
+        with self._lock:
+            self._conn.execute('DELETE FROM transactions')
+            self._conn.execute('DELETE FROM wallets')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def set_stage(self, address, stage, index=None, network=None):
+        """Отмечает начало этапа кошелька."""
+        self._execute(
+            """INSERT INTO wallets (address, wallet_index, network, stage, status, updated_at)
+               VALUES (?, ?, ?, ?, 'pending', ?)
+               ON CONFLICT (address) DO UPDATE SET
+                   wallet_index = COALESCE(excluded.wallet_index, wallet_index),
+                   network = COALESCE(excluded.network, network),
+                   stage = excluded.stage, status = 'pending', error = NULL,
+                   updated_at = excluded.updated_at""",
+            (address, index, network, stage, time.time()),
+        )
+
+    def finish(self, address, status, error=None):
+        """
+        Записывает итоговый статус кошелька.
+
+        :param status: 'done', 'skipped' или 'error'
+        """
+        self._execute(
+            """INSERT INTO wallets (address, status, error, updated_at) VALUES (?, ?, ?, ?)
+               ON CONFLICT (address) DO UPDATE SET
+                   status = excluded.status, error = excluded.error, updated_at = excluded.updated_at""",
+            (address, status, error, time.time()),
+        )
+
+    def record_tx(self, address, stage, kind, chain, tx_hash, nonce):
+        """
+        Записывает отправленную транзакцию до ожидания ее квитанции.
+
+        :param kind: Вид транзакции: 'fund', 'approve' или 'swap'
+        """
+        now = time.time()
+        self._execute(
+            """INSERT OR REPLACE INTO transactions
+               (tx_hash, address, stage, kind, chain, nonce, status, sent_at, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, 'sent', ?, ?)""",
+            (_hex(tx_hash), address, stage, kind, chain, nonce, now, now),
+        )
+
+    def update_tx(self, tx_hash, status):
+        """:param status: 'success', 'failed' или 'dropped'"""
+        self._execute(
+            'UPDATE transactions SET status = ?, updated_at = ? WHERE tx_hash = ?',
+            (status, time.time(), _hex(tx_hash)),
+        )
+
+    def watch_tx(self, address, stage, kind, chain, tx_hash, nonce):
+        """
+        Записывает отправленную транзакцию и обновляет ее статус, когда трекер сети получит квитанцию.
+        Без квитанции (отслеживание снято по таймауту) запись остается 'sent' и проверяется при возобновлении.
+
+        :param kind: Вид транзакции: 'fund', 'approve' или 'swap'
+        """
+        from receipt_tracker import get_receipt_tracker
+
+        self.record_tx(address, stage, kind, chain, tx_hash, nonce)
+
+        def on_receipt(future):
+            if future.cancelled():
+                return
+            self.update_tx(tx_hash, 'success' if future.result()['status'] == 1 else 'failed')
+
+        get_receipt_tracker(chain).track(tx_hash).add_done_callback(on_receipt)
+
+    def wallet_statuses(self):
+        """:return: Словарь {адрес: статус}"""
+        return {row['address']: row['status'] for row in self._execute('SELECT address, status FROM wallets')}
+
+    def transactions(self, address=None, status=None):
+        """:return: Список транзакций (sqlite3.Row) в порядке отправки"""
+        sql = 'SELECT * FROM transactions WHERE 1 = 1'
+        params = []
+        if address is not None:
+            sql += ' AND address = ?'
+            params.append(address)
+        if status is not None:
+            sql += ' AND status = ?'
+            params.append(status)
+        return self._execute(sql + ' ORDER BY sent_at', params)
+
+    def reconcile(self, addresses, timeout=RESUME_RECEIPT_TIMEOUT):
+        """
+        Проверяет квитанции транзакций, отправленных до сбоя, вместо их повторной отправки.
+        Транзакции без квитанции, чей nonce уже занят другой транзакцией, помечаются 'dropped'.
+
+        :param addresses: Адреса кошельков, которые будут обрабатываться
+        :param timeout: Сколько секунд ждать квитанции транзакций из мемпула
+        """
+        from batch_provider import gather
+        from providers import get_web3
+        from receipt_tracker import get_receipt_tracker
+
+        addresses = set(addresses)
+        in_flight = [row for row in self.transactions(status='sent') if row['address'] in addresses]
+        if not in_flight:
+            return
+        get_event_log().info(f"🔁 Проверяем {len(in_flight)} транзакций, отправленных в прошлом запуске")
+
+        # Все квитанции ждутся одновременно по общим потокам блоков сетей
+        futures = [get_receipt_tracker(row['chain']).track(row['tx_hash']) for row in in_flight]
+        deadline = time.monotonic() + timeout
+        unresolved = []
+        for row, future in zip(in_flight, futures):
+            try:
+                receipt = future.result(timeout=max(0, deadline - time.monotonic()))
+            except TimeoutError:
+                get_receipt_tracker(row['chain']).untrack(row['tx_hash'], future)
+                unresolved.append(row)
+                continue
+            self.update_tx(row['tx_hash'], 'success' if receipt['status'] == 1 else 'failed')
+
+        if not unresolved:
+            return
+
+        def check(row):
+            web3 = get_web3(row['chain'])
+            mined_nonce = web3.eth.get_transaction_count(row['address'])
+            # Квитанция перечитывается после nonce: транзакция могла смайниться только что
+            try:
+                receipt = web3.eth.get_transaction_receipt(row['tx_hash'])
+            except Exception:
+                receipt = None
+            return mined_nonce, receipt
+
+        for row, (mined_nonce, receipt) in zip(unresolved, gather(*[lambda row=row: check(row) for row in unresolved])):
+            if receipt is not None:
+                self.update_tx(row['tx_hash'], 'success' if receipt['status'] == 1 else 'failed')
+            elif row['nonce'] is not None and mined_nonce > row['nonce']:
+                self.update_tx(row['tx_hash'], 'dropped')
+                get_event_log().warning("⚠️ Транзакция заменена другой с тем же nonce, этап будет выполнен заново",
+                                        chain=row['chain'], tx_hash=row['tx_hash'])
+            else:
+                get_event_log().warning("⚠️ Транзакция все еще в мемпуле", chain=row['chain'], tx_hash=row['tx_hash'])
+
+    def resume(self, contexts, timeout=RESUME_RECEIPT_TIMEOUT):
+        """
+        Отбрасывает завершенные кошельки и восстанавливает состояние незавершенных
+        по квитанциям их транзакций.
+
+        :param contexts: Контексты кошельков из файла
+        :param timeout: Сколько секунд ждать квитанции транзакций из мемпула
+        :return: Контексты, которые нужно обработать
+        """
+        log = get_event_log()
+        statuses = self.wallet_statuses()
+        done = [ctx for ctx in contexts if statuses.get(ctx['wallet'].address) == 'done']
+        if done:
+            log.info(f"ℹ️ Пропускаем {len(done)} кошельков, завершенных в прошлом запуске")
+        contexts = [ctx for ctx in contexts if statuses.get(ctx['wallet'].address) != 'done']
+
+        self.reconcile([ctx['wallet'].address for ctx in contexts], timeout)
+
+        remaining = []
+        for ctx in contexts:
+            wallet = ctx['wallet']
+            txs = {}
+            for row in self.transactions(wallet.address):
+                txs.setdefault(row['kind'], []).append(row)
+            pending = [row['tx_hash'] for rows in txs.values() for row in rows if row['status'] == 'sent']
+            if pending:
+                # Повторная отправка могла бы перевести средства дважды
+                log.error("❌ Транзакции еще не смайнены, пропускаем кошелек в этом запуске", wallet=wallet.index, tx_hashes=pending)
+                self.finish(wallet.address, 'error', f"in-flight: {', '.join(pending)}")
+                continue
+            swap = [row for row in txs.get('swap', []) if row['status'] == 'success']
+            if swap:
+                log.info("✅ Свап выполнен в прошлом запуске", wallet=wallet.index, tx_hash=swap[-1]['tx_hash'])
+                self.finish(wallet.address, 'done')
+                continue
+            fund = [row for row in txs.get('fund', []) if row['status'] == 'success']
+            if fund:
+                # FTM уже в пути: повторное пополнение не нужно
+                ctx['fund_tx'] = fund[-1]['tx_hash']
+            remaining.append(ctx)
+        return remaining
+
+
+def journal_stages(stages, journal):
+    """
+    Оборачивает этапы конвейера записью в журнал: начало этапа, отправленные
+    транзакции и их квитанции (через ctx['on_sent']) и итоговый статус кошелька.
+
+    :param stages: Список Stage
+    :param journal: RunJournal
+    :return: Новый список Stage
+    """
+    last_stage = stages[-1].name
+
+    def wrap(stage):
+        def run(ctx):
+            wallet = ctx['wallet']
+            address = wallet.address
+            journal.set_stage(address, stage.name, wallet.index, wallet.network)
+            ctx['on_sent'] = lambda kind, tx_hash, nonce: journal.watch_tx(
+                address, stage.name, kind, TX_CHAINS.get(kind, stage.chain), tx_hash, nonce,
+            )
+            try:
+                ok = stage.func(ctx)
+            except Exception as e:
+                journal.finish(address, 'error', f"{stage.name}: {str(e)}")
+                raise
+            if not ok:
+                status = ctx.get('status', 'pending')
+                journal.finish(address, 'skipped' if status == 'pending' else status, ctx.get('error'))
+            elif stage.name == last_stage:
+                journal.finish(address, 'done')
+            return ok
+        return Stage(stage.name, stage.chain, run)
+
+    return [wrap(stage) for stage in stages]
@@ -0,0 +1,190 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+
+from metrics import KIND_LIFI, KIND_WAIT, get_metrics, requests_hook
+
+from rate_limiter import OUTCOME_ERROR, OUTCOME_OK, OUTCOME_THROTTLED, get_rate_limiter, parse_retry_after
+
+LIFI_API_URL = 'https://li.quest/v1'
+
+# Параметры по умолчанию
+REQUEST_TIMEOUT = (5, 30)  # (подключение, чтение), секунды
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # секунды, удваивается с каждой попыткой
+BACKOFF_MAX = 30.0
+ESTIMATE_CACHE_TTL = 30  # секунды
+POOL_MAXSIZE = 16
+# Начальная и максимальная скорость запросов к API, запросов в секунду
+RATE_LIMIT = 2.0
+RATE_LIMIT_MAX = 10.0
+
+# Параметры, не влияющие на маршрут и оценку (только на адреса в calldata)
+ADDRESS_PARAMS = ('fromAddress', 'toAddress')
+
+
+class LifiError(Exception):
+    def __init__(self, message, status_code=None, text=''):
+        super().__init__(message)
+        self.status_code = status_code
+        self.text = text
+
+
+def _cache_key(params, exclude=()):
+    items = []
+    for key, value in sorted(params.items()):
+        if key in exclude:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = tuple(value)
+        items.append((key, value))
+    return tuple(items)
+
+
+class LifiClient:
+    def __init__(self, base_url=LIFI_API_URL, timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES,
+                 cache_ttl=ESTIMATE_CACHE_TTL, pool_maxsize=POOL_MAXSIZE):
+        """
+        Клиент API LI.FI: пул keep-alive соединений, таймауты, повторы при 429/5xx
+        с учетом Retry-After, короткий кэш оценок маршрутов и объединение одинаковых запросов.
+        Котировки целиком (с transactionRequest) не кэшируются: calldata перед подписью всегда свежая.
+
+        :param base_url: Базовый URL API
+        :param timeout: Таймаут запроса (подключение, чтение)
+        :param max_retries: Максимум повторов при 429, 5xx и сетевых ошибках
+        :param cache_ttl: Время жизни оценки маршрута в кэше, секунды
+        :param pool_maxsize: Размер пула соединений
+        """
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.cache_ttl = cache_ttl
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize))
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize))
+        self.session.hooks['response'].append(requests_hook(KIND_LIFI))
+        self._estimates = {}  # ключ без адресов -> (время получения, estimate)
+        self._in_flight = {}  # ключ -> Future
+        self._lock = threading.Lock()
+        self.limiter = get_rate_limiter(self.base_url, rate=RATE_LIMIT, max_rate=RATE_LIMIT_MAX, concurrency=4, max_concurrency=pool_maxsize)
+
+    def _get(self, path, params):
+        url = f"{self.base_url}/{path}"
+        for attempt in range(self.max_retries + 1):
+            delay = min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX)
+            self.limiter.acquire()
+            outcome = OUTCOME_ERROR
+            retry_after = None
+            started_at = time.monotonic()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                if response.status_code == 429:
+                    outcome = OUTCOME_THROTTLED
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                elif response.status_code < 500:
+                    outcome = OUTCOME_OK
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # Ответа нет, поэтому хук сессии не сработал: ошибка записывается здесь
+                get_metrics().observe(KIND_LIFI, urlparse(url).path, time.monotonic() - started_at, error=type(e).__name__)
+                if attempt == self.max_retries:
+                    raise LifiError(f"Ошибка соединения с LI.FI: {str(e)}")
+                self._backoff(delay)
+                continue
+            finally:
+                self.limiter.release(outcome, retry_after)
+
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code == 429:
+                # Паузу по Retry-After выдерживает ограничитель перед следующей попыткой
+                if attempt == self.max_retries:
+                    break
+                if retry_after is None:
+                    self._backoff(delay)
+                continue
+            if response.status_code >= 500:
+                if attempt == self.max_retries:
+                    break
+                self._backoff(delay)
+                continue
+            break
+        raise LifiError(f"Ошибка API LI.FI: {response.status_code}", response.status_code, response.text)
+
+    def _backoff(self, delay):
+        with get_metrics().timer(KIND_WAIT, 'lifi_backoff'):
+            time.sleep(delay)
+
+    def _fresh(self, cache, key):
+        entry = cache.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.cache_ttl:
+            return entry[1]
+        return None
+
+    def get_quote(self, params):
+        """
+        Запрашивает свежую котировку /quote. Одинаковые одновременные запросы объединяются в один,
+        оценка маршрута (estimate) из ответа сохраняется в кэш для get_estimate.
+
+        :param params: Параметры запроса /quote
+        :return: Ответ API (dict)
+        :raises LifiError: При ошибке API или сети
+        """
+        key = _cache_key(params)
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            quote = self._get('quote', params)
+        except Exception as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        now = time.monotonic()
+        with self._lock:
+            self._estimates[_cache_key(params, ADDRESS_PARAMS)] = (now, quote.get('estimate'))
+            del self._in_flight[key]
+        future.set_result(quote)
+        return quote
+
+    def get_estimate(self, params):
+        """
+        Возвращает оценку маршрута (estimate) для параметров без учета адресов,
+        используя оценку из котировки любого кошелька с тем же маршрутом и суммой.
+        """
+        with self._lock:
+            estimate = self._fresh(self._estimates, _cache_key(params, ADDRESS_PARAMS))
+        if estimate is not None:
+            return estimate
+        return self.get_quote(params).get('estimate')
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_lifi_client():
+    """Возвращает общий для процесса LifiClient."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LifiClient()
+        return _client
+
+
+def set_lifi_client(client):
+    """Заменяет общий LifiClient (например, клиентом с другим base_url)."""
+    global _client
+    with _client_lock:
+        _client = client
+    return client
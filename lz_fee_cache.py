@@ -0,0 +1,101 @@
+import threading
+import time
+
+from block_poller import get_block_poller
+from events import get_event_log
+
+# Время жизни котировки quoteLayerZeroFee, секунды
+LZ_FEE_TTL = 30
+# Котировка обновляется, если с момента запроса прошло больше блоков (по общему BlockPoller)
+LZ_FEE_MAX_BLOCKS = 30
+# Запас к котировке в value свапа; излишек Stargate возвращает на refundAddress
+LZ_FEE_MARGIN = 1.05
+
+
+class LayerZeroFeeCache:
+    def __init__(self, ttl=LZ_FEE_TTL, max_blocks=LZ_FEE_MAX_BLOCKS, margin=LZ_FEE_MARGIN):
+        """
+        Общая для всех кошельков котировка quoteLayerZeroFee по (сеть, роутер, dstChainId, lzTxParams):
+        комиссия не зависит от кошелька, поэтому одна котировка используется всеми свапами,
+        пока не устареет по времени или по числу блоков.
+
+        :param ttl: Время жизни котировки, секунды
+        :param max_blocks: Сколько блоков котировка считается свежей (если номер блока известен)
+        :param margin: Множитель запаса к котировке в value
+        """
+        if margin < 1:
+            raise ValueError("Запас к комиссии LayerZero не может быть меньше 1")
+        self.ttl = ttl
+        self.max_blocks = max_blocks
+        self.margin = margin
+        self._quotes = {}  # ключ -> (комиссия, время, блок)
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def with_margin(self, fee):
+        return int(fee * self.margin)
+
+    def _fresh(self, chain, quote):
+        _, fetched_at, block = quote
+        if time.monotonic() - fetched_at >= self.ttl:
+            return False
+        last_block = get_block_poller(chain).last_block
+        return block is None or last_block is None or last_block - block < self.max_blocks
+
+    def fee(self, chain, router, dst_chain_id, lz_tx_params, quote_fee):
+        """
+        Комиссия LayerZero с запасом для value свапа. При устаревшей котировке запрашивает
+        новую один раз: остальные кошельки ждут ее, а не делают свой eth_call.
+
+        :param chain: Сеть-источник
+        :param router: Адрес Stargate Router
+        :param dst_chain_id: LayerZero ID сети назначения
+        :param lz_tx_params: lzTxParams (кортеж)
+        :param quote_fee: Функция без аргументов, возвращающая котировку quoteLayerZeroFee, wei
+        :return: Комиссия с запасом margin, wei
+        """
+        key = (chain, router, dst_chain_id, tuple(lz_tx_params))
+        with self._lock:
+            quote = self._quotes.get(key)
+            if quote is not None and self._fresh(chain, quote):
+                return self.with_margin(quote[0])
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                quote = self._quotes.get(key)
+                if quote is not None and self._fresh(chain, quote):
+                    return self.with_margin(quote[0])
+            block = get_block_poller(chain).last_block
+            fee = quote_fee()
+            with self._lock:
+                self._quotes[key] = (fee, time.monotonic(), block)
+        get_event_log().debug("💸 Котировка LayerZero обновлена", chain=chain, dst_chain_id=dst_chain_id, fee=fee, block=block)
+        return self.with_margin(fee)
+
+    def invalidate(self, chain, router, dst_chain_id, lz_tx_params):
+        """Сбрасывает котировку: следующий свап запросит новую."""
+        with self._lock:
+            self._quotes.pop((chain, router, dst_chain_id, tuple(lz_tx_params)), None)
+
+
+_cache = LayerZeroFeeCache()
+_cache_lock = threading.Lock()
+
+
+def get_lz_fee_cache():
+    """Возвращает общий для процесса LayerZeroFeeCache."""
+    with _cache_lock:
+        return _cache
+
+
+def set_lz_fee_cache(ttl=LZ_FEE_TTL, max_blocks=LZ_FEE_MAX_BLOCKS, margin=LZ_FEE_MARGIN):
+    """
+    Задает параметры общего кэша котировок LayerZero (например, из аргументов командной строки).
+
+    :raises ValueError: Если запас меньше 1
+    """
+    global _cache
+    cache = LayerZeroFeeCache(ttl, max_blocks, margin)
+    with _cache_lock:
+        _cache = cache
+    return cache
@@ -1,13 +1,12 @@
-import pandas as pd
-from web3 import Web3
-from function_bridge_usdc_to_arb import swap_max_usdc_fantom_to_arbitrum
-from function_bridge_usdc_to_opt import swap_max_usdc_fantom_to_optimism
-from buy_ftm_by_eth import swap_eth_base_to_fantom  # Импорт для перевода ETH в FTM
+import argparse
+import sys
+from pipeline import DEFAULT_CHAIN_WORKERS, Stage, WalletPipeline
 
-# Устанавливаем соединение с сетью Fantom
-web3 = Web3(Web3.HTTPProvider('https://fantom-rpc.publicnode.com'))
-if not web3.is_connected():
-    raise Exception('❌ Не удалось подключиться к Fantom RPC')
+# Сколько approve волны до этапа свапа строится и отправляется одновременно
+APPROVE_AHEAD_WORKERS = 16
+
+# Тяжелые модули (pandas, web3, модули мостов) импортируются при первом использовании,
+# поэтому --help и --dry-run работают быстро и без сети
 
 # Адрес контракта lzUSDC
 lz_usdc_address = '0x28a92dde19D9989F39A49905d7C9C2FAc7799bDf'
@@ -25,105 +24,529 @@ lz_usdc_abi = [
     }
 ]
 
+# Общий клиент Fantom (создается при первом обращении)
+def fantom_web3():
+    from providers import get_web3
+    return get_web3('fantom')
+
+# Общий журнал событий (кошелек и этап берутся из контекста конвейера)
+def event_log():
+    from events import get_event_log
+    return get_event_log()
+
+# Аккаунт из общего кэша (ключ выводится один раз на кошелек)
+def get_account(private_key):
+    from accounts import get_account
+    return get_account(private_key)
+
 # Функция для проверки баланса lzUSDC
 def check_balance_lz_usdc(private_key):
-    account_address = web3.eth.account.from_key(private_key).address
+    web3 = fantom_web3()
+    account_address = get_account(private_key).address
     contract = web3.eth.contract(address=lz_usdc_address, abi=lz_usdc_abi)
     balance = contract.functions.balanceOf(account_address).call()
     return balance
 
 # Функция для проверки баланса FTM
 def check_balance_ftm(private_key):
-    account_address = web3.eth.account.from_key(private_key).address
+    web3 = fantom_web3()
+    account_address = get_account(private_key).address
     balance_wei = web3.eth.get_balance(account_address)
     balance_ftm = web3.from_wei(balance_wei, 'ether')  # Преобразуем wei в FTM
     return balance_ftm
 
-def process_wallets(excel_file='wallets.xlsx'):
-    # Чтение Excel-файла
+# Роутер Stargate, которому выдается allowance, для сети назначения
+def stargate_router(network):
+    from stargate import ROUTES
+    return ROUTES[network]['router']
+
+# Функция для предварительного сканирования балансов всех кошельков через Multicall3
+def prescan_balances(contexts):
+    """
+    Читает баланс lzUSDC, баланс FTM и allowance для Stargate всех кошельков
+    несколькими вызовами aggregate3 на одном блоке.
+
+    :param contexts: Контексты кошельков с полями 'address' и 'network'
+    """
+    from metrics import STAGE_SCAN, tagged
+    from multicall import aggregate3, allowance_call, balance_of_call, eth_balance_call
+
+    web3 = fantom_web3()
+    calls = []
+    for ctx in contexts:
+        calls.append(balance_of_call(lz_usdc_address, ctx['wallet'].address))
+        calls.append(eth_balance_call(ctx['wallet'].address))
+        calls.append(allowance_call(lz_usdc_address, ctx['wallet'].address, stargate_router(ctx['wallet'].network)))
+    with tagged(stage=STAGE_SCAN):
+        block_number = web3.eth.block_number
+        results = aggregate3(web3, calls, block_identifier=block_number)
+    for i, ctx in enumerate(contexts):
+        balance_lz_usdc, balance_ftm_wei, allowance = results[3 * i:3 * i + 3]
+        ctx['balance_lz_usdc'] = balance_lz_usdc
+        ctx['balance_ftm'] = web3.from_wei(balance_ftm_wei, 'ether') if balance_ftm_wei is not None else None
+        ctx['allowance'] = allowance
+    event_log().info(f"🔎 Предварительное сканирование {len(contexts)} кошельков выполнено", block=block_number)
+
+# Волна approve перед этапом свапа для кошельков из отчета об approve
+def approve_wallets(contexts, journal=None):
+    """
+    Отправляет approve всех кошельков, которым он нужен и у которых уже есть FTM на газ,
+    одной волной до этапа свапа и ждет квитанции. Свап этих кошельков идет без approve.
+    Кошельки, которым нужно пополнение FTM, получат approve на этапе свапа, как раньше.
+
+    :param contexts: Контексты из approval_report (с полями 'balance_lz_usdc', 'balance_ftm')
+    :param journal: RunJournal для записи approve (необязательно)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from approvals import get_approval_policy
+    from metrics import tagged
+    from receipt_tracker import get_receipt_tracker
+    from stargate import RECEIPT_TIMEOUT, get_stargate_router
+
+    log = event_log()
+    contexts = [ctx for ctx in contexts if ctx['balance_ftm'] is not None and ctx['balance_ftm'] >= 2]
+    if not contexts:
+        return
+
+    def send(ctx):
+        wallet = ctx['wallet']
+        on_sent = None
+        if journal:
+            journal.set_stage(wallet.address, 'bridge', wallet.index, wallet.network)
+            on_sent = lambda kind, tx_hash, nonce: journal.watch_tx(wallet.address, 'bridge', kind, 'fantom', tx_hash, nonce)
+        with tagged(wallet=wallet.index):
+            return get_stargate_router(wallet.network).approve(get_account(wallet.private_key), ctx['balance_lz_usdc'], on_sent)
+
+    # Отдельный пул: approve внутри сам использует gather, общий пул gather нельзя занимать целиком
+    with ThreadPoolExecutor(max_workers=APPROVE_AHEAD_WORKERS, thread_name_prefix='approve-ahead') as executor:
+        tx_hashes = list(executor.map(send, contexts))
+    tracker = get_receipt_tracker('fantom')
+    sent = [(ctx, tx_hash, tracker.track(tx_hash)) for ctx, tx_hash in zip(contexts, tx_hashes) if tx_hash]
+    log.info(f"🔐 Отправлено {len(sent)} approve из {len(contexts)} до этапа свапа")
+
+    policy = get_approval_policy()
+    approved = 0
+    for ctx, tx_hash, future in sent:
+        wallet = ctx['wallet']
+        try:
+            receipt = future.result(timeout=RECEIPT_TIMEOUT)
+        except TimeoutError:
+            tracker.untrack(tx_hash, future)
+            log.error("❌ Нет квитанции approve, свап выполнит approve заново", wallet=wallet.index, chain='fantom', tx_hash=tx_hash)
+            continue
+        if receipt['status'] == 1:
+            ctx['allowance'] = policy.amount(ctx['balance_lz_usdc'])
+            approved += 1
+        else:
+            log.error("❌ Approve провалился, свап выполнит approve заново", wallet=wallet.index, chain='fantom', tx_hash=tx_hash)
+    log.info(f"✅ Approve выполнен для {approved} кошельков")
+
+def stage_check(ctx):
+    """Этап 1 (Fantom): проверка балансов lzUSDC и FTM."""
+    wallet = ctx['wallet']
+    private_key = wallet.private_key
+    log = event_log()
+    log.info("▶️ Обработка кошелька", address=wallet.address, network=wallet.network, amount_eth=wallet.amount_eth)
+
+    # Проверка баланса lzUSDC (из предварительного сканирования, если оно было)
+    balance_lz_usdc = ctx.get('balance_lz_usdc')
+    if balance_lz_usdc is None:
+        balance_lz_usdc = ctx['balance_lz_usdc'] = check_balance_lz_usdc(private_key)
+    if balance_lz_usdc == 0:
+        log.error("❌ На кошельке нет lzUSDC (баланс 0), пропускаем его", chain='fantom', address=wallet.address)
+        return False
+
+    # Проверка баланса FTM
+    balance_ftm = ctx.get('balance_ftm')
+    if balance_ftm is None:
+        balance_ftm = ctx['balance_ftm'] = check_balance_ftm(private_key)
+    log.info("💰 Балансы", chain='fantom', balance_usdc=balance_lz_usdc / 10**6, balance_ftm=balance_ftm)
+    return True
+
+
+def stage_fund(ctx):
+    """Этап 2 (Base): перевод ETH с Base на Fantom (получение FTM), если баланс FTM < 2."""
+    balance_ftm = ctx['balance_ftm']
+    log = event_log()
+    if ctx.get('fund_tx'):
+        # Пополнение выполнено в прошлом запуске (по журналу), FTM уже в пути
+        log.info("ℹ️ Перевод ETH с Base на Fantom уже выполнен, пропускаем", chain='base', tx_hash=ctx['fund_tx'])
+        return True
+    if balance_ftm >= 2:
+        log.debug("ℹ️ Баланс FTM достаточен, пропускаем перевод ETH", balance_ftm=balance_ftm)
+        return True
+
+    log.info("ℹ️ Баланс FTM меньше 2, выполняем перевод ETH с Base на Fantom", balance_ftm=balance_ftm)
+    from buy_ftm_by_eth import swap_eth_base_to_fantom  # Импорт для перевода ETH в FTM
     try:
-        df = pd.read_excel(excel_file)
-        print(f" Успешно загружен файл {excel_file}")
+        buy_ftm_tx = swap_eth_base_to_fantom(ctx['wallet'].private_key, ctx['wallet'].amount_eth, bridges=ctx.get('bridges'), policy=ctx.get('bridge_policy', 'fastest'), on_sent=ctx.get('on_sent'))
     except Exception as e:
-        print(f" Ошибка при чтении файла {excel_file}: {str(e)}")
-        return
+        log.error("❌ Ошибка при переводе ETH с Base на Fantom", chain='base', error=str(e))
+        ctx['status'] = 'error'
+        return False
+    if not buy_ftm_tx:
+        log.error("❌ Ошибка при переводе ETH с Base на Fantom", chain='base')
+        ctx['status'] = 'error'
+        return False
+    ctx['fund_tx'] = buy_ftm_tx
+    log.info("✅ Перевод ETH с Base на Fantom выполнен", chain='base', tx_hash=buy_ftm_tx)
+    return True
+
+
+def stage_bridge(ctx):
+    """Этап 3 (Fantom): свап в выбранную сеть (Arbitrum или Optimism)."""
+    network = ctx['wallet'].network
+    log = event_log()
+    try:
+        from stargate import get_stargate_router
+        swap_tx = get_stargate_router(network).swap_max(ctx['wallet'].private_key, balance=ctx.get('balance_lz_usdc'), allowance=ctx.get('allowance'), on_sent=ctx.get('on_sent'))
+    except Exception as e:
+        log.error("❌ Ошибка при свапе", chain='fantom', network=network, error=str(e))
+        ctx['status'] = 'error'
+        return False
+    if not swap_tx:
+        log.error("❌ Ошибка при свапе", chain='fantom', network=network)
+        ctx['status'] = 'error'
+        return False
+    ctx['swap_tx'] = swap_tx
+    log.info("✅ Свап выполнен", chain='fantom', network=network, tx_hash=swap_tx)
+    return True
+
+
+WALLET_STAGES = [
+    Stage('check', 'fantom', stage_check),
+    Stage('fund', 'base', stage_fund),
+    Stage('bridge', 'fantom', stage_bridge),
+]
+
+
+def load_wallets(excel_file='wallets.xlsx'):
+    """
+    Читает и проверяет кошельки из файла (xlsx, csv или parquet) без обращения к сети.
+    Все ошибочные строки выводятся сразу, до начала обработки.
+
+    :param excel_file: Путь к файлу с кошельками
+    :return: Список контекстов кошельков или None, если файл не удалось прочитать
+    """
+    from accounts import derive_accounts
+    from wallet_loader import WalletFileError, load_wallet_records
+
+    log = event_log()
+    errors = []
+    try:
+        # Контексты строятся прямо из ленивого чтения файла, без промежуточного списка записей
+        contexts = [{'wallet': wallet} for wallet in load_wallet_records(excel_file, errors)]
+        log.info("📂 Файл с кошельками загружен", path=excel_file)
+    except WalletFileError as e:
+        log.error(f"❌ {str(e)}", path=excel_file)
+        return None
+    except Exception as e:
+        log.error("❌ Ошибка при чтении файла", path=excel_file, error=str(e))
+        return None
+
+    # Адреса всех кошельков вычисляются один раз (для больших файлов — в пуле процессов);
+    # строки с ключами, из которых не удалось вывести адрес, пропускаются
+    _, derive_errors = derive_accounts([ctx['wallet'].private_key for ctx in contexts])
+    if derive_errors:
+        invalid = {position for position, _ in derive_errors}
+        errors = sorted(errors + [(contexts[position]['wallet'].index, f"неверный приватный ключ: {error}") for position, error in derive_errors])
+        contexts = [ctx for position, ctx in enumerate(contexts) if position not in invalid]
+
+    for index, error in errors:
+        log.error("❌ Ошибка в строке файла", wallet=index, error=error)
+    if errors:
+        log.warning(f"⚠️ Пропущено {len(errors)} строк с ошибками из {len(contexts) + len(errors)}")
+    return contexts
 
-    # Проверка структуры файла
-    required_columns = ['PrivateKey', 'Amount', 'Arb', 'Optimism']
-    if not all(col in df.columns for col in required_columns):
-        print(f"❌ В файле {excel_file} отсутствуют необходимые столбцы: {required_columns}")
+
+def process_wallets(excel_file='wallets.xlsx', workers=None, prescan=True, bridges=None, bridge_policy='fastest',
+                    journal_file=None, reset_journal=False, approval_report_file=None, preflight=False, plan_file=None,
+                    approve_ahead=True):
+    """
+    Обрабатывает все кошельки из файла конвейером check -> fund -> bridge.
+
+    :param excel_file: Путь к файлу с кошельками (xlsx, csv или parquet)
+    :param workers: Количество воркеров по сетям, например {'fantom': 16, 'base': 8}
+    :param prescan: Предварительно читать балансы и allowance всех кошельков через Multicall3
+    :param bridges: Мосты для пополнения FTM; если заданы, котировки запрашиваются параллельно
+    :param bridge_policy: Политика выбора моста: 'fastest', 'cheapest' или 'best_amount'
+    :param journal_file: Файл журнала запуска (SQLite); если задан, завершенные кошельки пропускаются,
+                         а транзакции, отправленные до сбоя, проверяются по квитанциям
+    :param reset_journal: Начать журнал заново
+    :param approval_report_file: CSV-файл для отчета о кошельках, которым нужен approve
+    :param preflight: Перед отправкой симулировать все кошельки на форке anvil и обрабатывать только прошедшие
+    :param plan_file: CSV-файл для плана симуляции
+    :param approve_ahead: Отправить нужные approve одной волной до этапа свапа (требует prescan)
+    :return: Список результатов по кошелькам в порядке строк файла
+    """
+    contexts = load_wallets(excel_file)
+    if contexts is None:
         return
+    for ctx in contexts:
+        ctx['bridges'] = bridges
+        ctx['bridge_policy'] = bridge_policy
 
-    # Обработка каждого кошелька
-    for index, row in df.iterrows():
-        private_key = str(row['PrivateKey']).strip().replace("0x", "")  # Убираем префикс 0x
-        amount_eth = float(row['Amount'])  # Сумма в ETH
-        arb = int(row['Arb'])
-        optimism = int(row['Optimism'])
-
-        print(f"\n=== Обработка кошелька {index + 1} ===")
-        print(f"Приватный ключ: {private_key[:6]}...{private_key[-6:]}")
-        print(f"Сумма ETH: {amount_eth}")
-        print(f"Arb: {arb}, Optimism: {optimism}")
-
-        # Проверка валидности приватного ключа
-        if not (len(private_key) == 64 and all(c in '0123456789abcdef' for c in private_key)):
-            print(f"❌ Неверный формат приватного ключа: должен быть 64-символьной шестнадцатеричной строкой")
-            continue
+    # Журнал запуска: продолжение с места остановки
+    stages = WALLET_STAGES
+    journal = None
+    if journal_file:
+        from journal import RunJournal, journal_stages
+        journal = RunJournal(journal_file)
+        if reset_journal:
+            journal.reset()
+        contexts = journal.resume(contexts)
+        stages = journal_stages(WALLET_STAGES, journal)
 
-        # Проверка баланса lzUSDC
-        balance_lz_usdc = check_balance_lz_usdc(private_key)
-        if balance_lz_usdc == 0:
-            print(f"❌ На кошельке {private_key[:6]}...{private_key[-6:]} нет lzUSDC (баланс 0), пропускаем его.")
-            continue
-        print(f"💰 Баланс lzUSDC: {balance_lz_usdc / 10**6:.2f} USDC")
+    # Вызовы каждого этапа помечаются в метриках индексом кошелька и этапом
+    from metrics import STAGE_FUND, STAGE_SCAN, STAGE_SWAP, tag_stages
+    stages = tag_stages(stages, {'check': STAGE_SCAN, 'fund': STAGE_FUND, 'bridge': STAGE_SWAP})
 
-        # Проверка баланса FTM
-        balance_ftm = check_balance_ftm(private_key)
-        print(f"💰 Баланс FTM: {balance_ftm:.6f} FTM")
+    # Предварительное сканирование: кошельки без lzUSDC отбрасываются до начала обработки
+    pending_approvals = []
+    if prescan and contexts:
+        prescan_balances(contexts)
+        empty = [ctx for ctx in contexts if ctx['balance_lz_usdc'] == 0]
+        if empty:
+            event_log().info(f"ℹ️ Пропускаем {len(empty)} кошельков без lzUSDC", wallets=[ctx['wallet'].index + 1 for ctx in empty])
+        contexts = [ctx for ctx in contexts if ctx['balance_lz_usdc'] != 0]
 
-        # Определение сети
-        if arb == 1 and optimism == 0:
-            network = 'arb'
-        elif arb == 0 and optimism == 1:
-            network = 'opt'
-        else:
-            print(f"❌ Неверный выбор сети: Arb={arb}, Optimism={optimism}. Должно быть только одно значение 1")
-            continue
+        # Кошельки, которым нужен approve (по allowance из сканирования и политике approve)
+        from approvals import approval_report
+        pending_approvals = approval_report(contexts, approval_report_file)
 
-        # Шаг 1: Перевод ETH с Base на Fantom (получение FTM), если баланс FTM < 2
-        if balance_ftm < 2:
-            print(f"ℹ️ Баланс FTM меньше 2 ({balance_ftm:.6f} FTM), выполняем перевод ETH с Base на Fantom...")
-            try:
-                buy_ftm_tx = swap_eth_base_to_fantom(private_key, amount_eth)
-                if buy_ftm_tx:
-                    print(f"✅ Перевод ETH с Base на Fantom выполнен: {buy_ftm_tx.hex()}")
-                else:
-                    print(f"❌ Ошибка при переводе ETH с Base на Fantom")
-                    continue
-            except Exception as e:
-                print(f"❌ Ошибка при переводе ETH с Base на Fantom: {str(e)}")
-                continue
-        else:
-            print(f"ℹ️ Баланс FTM достаточен ({balance_ftm:.6f} FTM >= 2 FTM), пропускаем перевод ETH")
+    # Симуляция на форке: кошельки с ошибками отбрасываются, фактический газ попадает в кэш газа
+    if preflight and contexts:
+        plan = simulate_contexts(contexts, plan_file)
+        if plan is None:
+            return None
+        passed = {row['address'] for row in plan if row['status'] == 'pass'}
+        failed = [ctx for ctx in contexts if ctx['wallet'].address not in passed]
+        if failed:
+            event_log().info(f"ℹ️ Пропускаем {len(failed)} кошельков, не прошедших симуляцию", wallets=[ctx['wallet'].index + 1 for ctx in failed])
+        contexts = [ctx for ctx in contexts if ctx['wallet'].address in passed]
 
-        # Шаг 2: Свап в выбранную сеть (Arbitrum или Optimism)
-        try:
-            if network == 'arb':
-                swap_tx = swap_max_usdc_fantom_to_arbitrum(private_key)
-            elif network == 'opt':
-                swap_tx = swap_max_usdc_fantom_to_optimism(private_key)
-
-            if swap_tx:
-                print(f"✅ Свап в {network} выполнен: {swap_tx.hex()}")
-            else:
-                print(f"❌ Ошибка при свапе в {network}")
-                continue
-        except Exception as e:
-            print(f"❌ Ошибка при свапе в {network}: {str(e)}")
-            continue
+    # Волна approve до этапа свапа (только для прошедших симуляцию, если она была)
+    if approve_ahead and pending_approvals:
+        addresses = {ctx['wallet'].address for ctx in contexts}
+        approve_wallets([ctx for ctx in pending_approvals if ctx['wallet'].address in addresses], journal)
+
+    # Обработка кошельков конвейером
+    results = WalletPipeline(stages, workers=workers).run(contexts)
 
+    # Итог выводится после всех событий кошельков
+    event_log().flush()
     print("\n=== Обработка всех кошельков завершена ===")
+    for ctx in results:
+        swap_tx = ctx.get('swap_tx')
+        details = swap_tx.hex() if swap_tx else ctx.get('error', '')
+        print(f"Кошелек {ctx['wallet'].index + 1}: {ctx['status']} {details}")
+    return results
+
+def simulate_contexts(contexts, plan_file=None):
+    """
+    Симулирует кошельки на локальных форках anvil и выводит план.
+
+    :param contexts: Контексты кошельков после prescan_balances
+    :param plan_file: CSV-файл для плана (необязательно)
+    :return: План симуляции или None, если форк не удалось запустить
+    """
+    from simulate import SimulationError, print_plan, run_simulation, write_plan
+
+    try:
+        plan = run_simulation(contexts)
+    except SimulationError as e:
+        event_log().error(f"❌ {str(e)}")
+        return None
+    print_plan(plan)
+    if plan_file:
+        write_plan(plan, plan_file)
+    return plan
+
+def simulate_wallets(excel_file, plan_file=None, bridges=None, bridge_policy='fastest'):
+    """
+    Режим симуляции: повторяет пополнение, approve и swap всех кошельков на форках
+    Fantom и Base без отправки в сеть и возвращает план с фактическим газом.
+
+    :param excel_file: Путь к файлу с кошельками
+    :param plan_file: CSV-файл для плана симуляции
+    :param bridges: Мосты для пополнения FTM
+    :param bridge_policy: Политика выбора моста
+    :return: План симуляции или None
+    """
+    contexts = load_wallets(excel_file)
+    if contexts is None:
+        return None
+    for ctx in contexts:
+        ctx['bridges'] = bridges
+        ctx['bridge_policy'] = bridge_policy
+    prescan_balances(contexts)
+    contexts = [ctx for ctx in contexts if ctx['balance_lz_usdc'] != 0]
+    return simulate_contexts(contexts, plan_file)
+
+def presign_wallets(excel_file, signed_file, processes=None, approval_report_file=None):
+    """
+    Режим предварительной подписи: строит approve и swap всех кошельков по заранее
+    прочитанным nonce, комиссиям и газу, подписывает их в пуле процессов и сохраняет
+    в файл. Рассылка выполняется отдельно (--broadcast).
+
+    :param excel_file: Путь к файлу с кошельками
+    :param signed_file: Файл для подписанных транзакций (JSONL)
+    :param processes: Количество процессов для подписи
+    :param approval_report_file: CSV-файл для отчета о кошельках, которым нужен approve
+    :return: Список записей с подписанными транзакциями или None
+    """
+    from approvals import approval_report
+    from presign import build_transactions, sign_transactions, write_signed_file
+
+    contexts = load_wallets(excel_file)
+    if contexts is None:
+        return None
+    prescan_balances(contexts)
+    approval_report(contexts, approval_report_file)
+    entries = build_transactions(contexts)
+    sign_transactions(entries, processes)
+    write_signed_file(entries, signed_file)
+    return entries
+
+def parse_workers(values):
+    workers = {}
+    for value in values or []:
+        chain, _, count = value.partition('=')
+        if chain not in DEFAULT_CHAIN_WORKERS or not count.isdigit() or int(count) < 1:
+            raise argparse.ArgumentTypeError(f"Неверное значение --workers: {value}")
+        workers[chain] = int(count)
+    return workers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m main',
+        description='Перевод lzUSDC с Fantom в Arbitrum/Optimism через Stargate для кошельков из файла (xlsx, csv или parquet).',
+    )
+    parser.add_argument('excel_file', nargs='?', default='wallets.xlsx', help='Файл с кошельками: xlsx, csv или parquet (по умолчанию wallets.xlsx)')
+    parser.add_argument('--workers', nargs='*', metavar='CHAIN=N',
+                        help=f"Воркеры по сетям, например fantom=16 base=8 (сети: {', '.join(DEFAULT_CHAIN_WORKERS)})")
+    parser.add_argument('--no-prescan', action='store_true', help='Не выполнять предварительное сканирование через Multicall3')
+    parser.add_argument('--bridges', help='Мосты для пополнения FTM через запятую (например squid,symbiosis,relay); котировки запрашиваются параллельно')
+    parser.add_argument('--bridge-policy', choices=['fastest', 'cheapest', 'best_amount'], default='fastest',
+                        help='Политика выбора моста при --bridges (по умолчанию fastest)')
+    parser.add_argument('--journal', default='run_journal.sqlite3',
+                        help='Файл журнала запуска для продолжения после сбоя (по умолчанию run_journal.sqlite3)')
+    parser.add_argument('--no-journal', action='store_true', help='Не вести журнал запуска')
+    parser.add_argument('--reset-journal', action='store_true', help='Начать журнал заново, обработав все кошельки')
+    parser.add_argument('--approval', choices=['exact', 'max', 'cap'], default='exact',
+                        help='Сумма approve: exact — ровно сумма перевода, max — без ограничения, cap — не меньше --approval-cap')
+    parser.add_argument('--approval-cap', type=float, metavar='USDC', help='Лимит разрешения в USDC для --approval cap')
+    parser.add_argument('--approval-report', metavar='FILE', help='Сохранить в CSV список кошельков, которым нужен approve')
+    parser.add_argument('--no-approve-ahead', action='store_true',
+                        help='Не отправлять approve волной до этапа свапа, а выполнять его вместе со свапом каждого кошелька')
+    parser.add_argument('--lz-fee-ttl', type=float, metavar='SECONDS',
+                        help='Сколько секунд все кошельки используют одну котировку quoteLayerZeroFee (по умолчанию 30)')
+    parser.add_argument('--lz-fee-margin', type=float, metavar='PERCENT',
+                        help='Запас к комиссии LayerZero в value свапа, проценты (по умолчанию 5); излишек возвращается')
+    parser.add_argument('--rpc-pool-size', type=int, metavar='N',
+                        help='Максимум одновременных соединений с узлом и чтений одной сети (по умолчанию 32)')
+    parser.add_argument('--rpc-timeout', type=float, metavar='SECONDS',
+                        help='Таймаут запроса к узлу, после которого чтение уходит на резервный узел (по умолчанию 30)')
+    parser.add_argument('--presign', metavar='FILE',
+                        help='Построить и подписать approve/swap всех кошельков без отправки, сохранить в FILE')
+    parser.add_argument('--presign-processes', type=int, metavar='N',
+                        help='Количество процессов для подписи при --presign (по умолчанию число ядер; 1 — без пула процессов)')
+    parser.add_argument('--broadcast', metavar='FILE', help='Разослать подписанные транзакции из FILE (после --presign)')
+    parser.add_argument('--simulate', action='store_true',
+                        help='Симулировать пополнение, approve и swap всех кошельков на локальном форке anvil и вывести план')
+    parser.add_argument('--preflight', action='store_true',
+                        help='Перед отправкой симулировать кошельки на форке и обрабатывать только прошедшие')
+    parser.add_argument('--simulation-plan', metavar='FILE', help='Сохранить план симуляции в CSV')
+    parser.add_argument('--log-level', choices=['debug', 'info', 'warning', 'error'], default='info',
+                        help='Минимальный уровень событий в консоли (debug выводит котировки и квитанции)')
+    parser.add_argument('--log-file', metavar='FILE', help='Записывать все события (включая debug) в FILE в формате JSON Lines')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='Отдавать метрики вызовов RPC и LI.FI в формате Prometheus на http://127.0.0.1:PORT/metrics')
+    parser.add_argument('--metrics-json', metavar='FILE', help='Сохранить сводку метрик запуска в JSON')
+    parser.add_argument('--dry-run', action='store_true', help='Только проверить файл с кошельками, без обращения к сети')
+    args = parser.parse_args(argv)
+
+    try:
+        workers = parse_workers(args.workers)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    if args.dry_run:
+        contexts = load_wallets(args.excel_file)
+        event_log().flush()
+        if contexts is None:
+            return 1
+        print(f"✅ Файл {args.excel_file} проверен: {len(contexts)} кошельков готово к обработке")
+        return 0
+
+    from approvals import set_approval_policy
+    try:
+        set_approval_policy(args.approval, int(args.approval_cap * 10**6) if args.approval_cap else None)
+    except ValueError as e:
+        parser.error(str(e))
+
+    from lz_fee_cache import LZ_FEE_MARGIN, LZ_FEE_TTL, set_lz_fee_cache
+    try:
+        set_lz_fee_cache(ttl=LZ_FEE_TTL if args.lz_fee_ttl is None else args.lz_fee_ttl,
+                         margin=LZ_FEE_MARGIN if args.lz_fee_margin is None else 1 + args.lz_fee_margin / 100)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Пул соединений задается до создания первого клиента Web3
+    from providers import configure_pool
+    if args.rpc_pool_size is not None and args.rpc_pool_size < 1:
+        parser.error("Размер пула соединений должен быть положительным")
+    if args.rpc_timeout is not None and args.rpc_timeout <= 0:
+        parser.error("Таймаут запроса к узлу должен быть положительным")
+    if args.presign_processes is not None and args.presign_processes < 1:
+        parser.error("Количество процессов для подписи должно быть положительным")
+    configure_pool(pool_maxsize=args.rpc_pool_size, timeout=args.rpc_timeout)
+
+    bridges = [bridge.strip() for bridge in args.bridges.split(',') if bridge.strip()] if args.bridges else None
+
+    from events import configure_events
+    configure_events(args.log_level, args.log_file)
+
+    from metrics import get_metrics, start_metrics_server
+    if args.metrics_port is not None:
+        start_metrics_server(args.metrics_port)
+    try:
+        return run_mode(args, workers, bridges)
+    finally:
+        if args.metrics_json:
+            get_metrics().write_summary(args.metrics_json)
+
+
+def run_mode(args, workers, bridges):
+    """Выполняет выбранный режим командной строки и возвращает код выхода."""
+    if args.simulate:
+        plan = simulate_wallets(args.excel_file, args.simulation_plan, bridges=bridges, bridge_policy=args.bridge_policy)
+        return 0 if plan is not None and all(row['status'] == 'pass' for row in plan) else 1
+
+    if args.presign:
+        entries = presign_wallets(args.excel_file, args.presign, processes=args.presign_processes,
+                                  approval_report_file=args.approval_report)
+        return 0 if entries is not None else 1
+
+    if args.broadcast:
+        from presign import broadcast
+        journal = None
+        if not args.no_journal:
+            from journal import RunJournal
+            journal = RunJournal(args.journal)
+        entries = broadcast(args.broadcast, journal=journal)
+        return 0 if all(entry.get('status') == 'success' for entry in entries) else 1
+
+    results = process_wallets(args.excel_file, workers=workers, prescan=not args.no_prescan,
+                              bridges=bridges, bridge_policy=args.bridge_policy,
+                              journal_file=None if args.no_journal else args.journal, reset_journal=args.reset_journal,
+                              approval_report_file=args.approval_report,
+                              preflight=args.preflight, plan_file=args.simulation_plan,
+                              approve_ahead=not args.no_approve_ahead)
+    return 0 if results is not None else 1
+
 
 if __name__ == "__main__":
-    process_wallets('wallets.xlsx')
+    sys.exit(main())
@@ -0,0 +1,382 @@
+import contextvars
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from eth_utils import function_abi_to_4byte_selector
+from eth_utils.toolz import curry
+from web3.middleware.base import Web3MiddlewareBuilder
+
+from contracts import load_abi
+from multicall import AGGREGATE3_SELECTOR
+from pipeline import Stage
+
+# Верхние границы корзин гистограммы задержек, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Этапы кошелька, которыми помечаются записи
+STAGE_SCAN = 'scan'
+STAGE_FUND = 'fund'
+STAGE_APPROVE = 'approve'
+STAGE_SWAP = 'swap'
+STAGE_SWEEP = 'sweep'
+
+# Виды записей и имя метки, в которой хранится название вызова
+KIND_RPC = 'rpc'  # методы JSON-RPC (через middleware web3)
+KIND_HTTP = 'http'  # HTTP-запросы к RPC-узлам (по узлам)
+KIND_LIFI = 'lifi'  # запросы к API LI.FI
+KIND_WAIT = 'wait'  # ожидания: квитанции, балансы, ограничители, паузы
+NAME_LABELS = {KIND_RPC: 'method', KIND_HTTP: 'endpoint', KIND_LIFI: 'path', KIND_WAIT: 'event'}
+
+# Методы, для которых в названии указывается вызываемая функция контракта (eth_call:quoteLayerZeroFee)
+CONTRACT_METHODS = ('eth_call', 'eth_estimateGas')
+SELECTOR_ABIS = ('bridge_abi.json', 'erc20_abi.json')
+
+_wallet = contextvars.ContextVar('metrics_wallet', default=None)
+_stage = contextvars.ContextVar('metrics_stage', default=None)
+
+
+@contextmanager
+def tagged(wallet=None, stage=None):
+    """
+    Помечает все записи в блоке (и в вызовах gather из него) индексом кошелька и этапом.
+
+    :param wallet: Индекс кошелька (None — не менять)
+    :param stage: Этап: 'scan', 'fund', 'approve', 'swap' или 'sweep' (None — не менять)
+    """
+    tokens = []
+    if wallet is not None:
+        tokens.append((_wallet, _wallet.set(wallet)))
+    if stage is not None:
+        tokens.append((_stage, _stage.set(stage)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def current_tags():
+    """
+    :return: (индекс кошелька, этап) текущего контекста; None, если не заданы
+    """
+    return _wallet.get(), _stage.get()
+
+
+def staged(stage):
+    """Декоратор: все записи внутри функции помечаются этапом stage."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with tagged(stage=stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _Series:
+    __slots__ = ('count', 'sum', 'buckets', 'errors')
+
+    def __init__(self, size):
+        self.count = 0
+        self.sum = 0.0
+        self.buckets = [0] * size  # последняя корзина — +Inf
+        self.errors = {}
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        Счетчики, гистограммы задержек и классы ошибок вызовов по (вид, название, сеть, этап),
+        а также итоги по кошелькам.
+
+        :param buckets: Верхние границы корзин гистограммы, секунды
+        """
+        self.buckets = tuple(buckets)
+        self.started_at = time.time()
+        self._series = {}
+        self._wallets = {}
+        self._lock = threading.Lock()
+
+    def observe(self, kind, name, seconds, chain=None, error=None):
+        """
+        Записывает один вызов. Кошелек и этап берутся из текущего контекста (tagged).
+
+        :param kind: 'rpc', 'http', 'lifi' или 'wait'
+        :param name: Метод, узел, путь API или событие
+        :param seconds: Длительность вызова
+        :param chain: Сеть
+        :param error: Класс ошибки или None
+        """
+        wallet = _wallet.get()
+        stage = _stage.get() or ''
+        key = (kind, name, chain or '', stage)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(len(self.buckets) + 1)
+            series.count += 1
+            series.sum += seconds
+            series.buckets[bisect_left(self.buckets, seconds)] += 1
+            if error:
+                series.errors[error] = series.errors.get(error, 0) + 1
+            if wallet is not None:
+                totals = self._wallets.setdefault(wallet, {}).setdefault(stage, {}).setdefault(kind, [0, 0.0, 0])
+                totals[0] += 1
+                totals[1] += seconds
+                totals[2] += bool(error)
+
+    @contextmanager
+    def timer(self, kind, name, chain=None):
+        """Измеряет блок; исключение записывается как класс ошибки и пробрасывается дальше."""
+        started_at = time.monotonic()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.observe(kind, name, time.monotonic() - started_at, chain, error)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self._wallets.clear()
+            self.started_at = time.time()
+
+    def _quantile(self, series, q):
+        # Оценка по гистограмме: верхняя граница корзины, в которую попадает квантиль
+        rank = q * series.count
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), series.buckets):
+            total += count
+            if total >= rank:
+                return bound
+        return float('inf')
+
+    def summary(self):
+        """
+        :return: Словарь для JSON: вызовы по видам, сетям, этапам и итоги по кошелькам
+        """
+        with self._lock:
+            series = [
+                {
+                    'kind': kind, 'name': name, 'chain': chain or None, 'stage': stage or None,
+                    'count': s.count, 'seconds': round(s.sum, 6), 'avg': round(s.sum / s.count, 6),
+                    'p50': self._quantile(s, 0.5), 'p95': self._quantile(s, 0.95), 'errors': dict(s.errors),
+                }
+                for (kind, name, chain, stage), s in self._series.items()
+            ]
+            wallets = {
+                index: {
+                    stage or 'other': {kind: {'count': c, 'seconds': round(t, 6), 'errors': e} for kind, (c, t, e) in kinds.items()}
+                    for stage, kinds in stages.items()
+                }
+                for index, stages in sorted(self._wallets.items())
+            }
+        series.sort(key=lambda item: item['seconds'], reverse=True)
+        return {
+            'started_at': self.started_at,
+            'duration': time.time() - self.started_at,
+            'series': [{**item, 'p50': _finite(item['p50']), 'p95': _finite(item['p95'])} for item in series],
+            'wallets': wallets,
+        }
+
+    def write_summary(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+        # events импортирует metrics, поэтому журнал событий импортируется при вызове
+        from events import get_event_log
+        get_event_log().info("📊 Сводка метрик сохранена", path=path)
+
+    def render_prometheus(self):
+        """Метрики в текстовом формате Prometheus."""
+        with self._lock:
+            items = sorted((key, s.count, s.sum, list(s.buckets), dict(s.errors)) for key, s in self._series.items())
+        lines = []
+        for kind in NAME_LABELS:
+            kind_items = [item for item in items if item[0][0] == kind]
+            if not kind_items:
+                continue
+            metric = f"lz_{kind}_duration_seconds"
+            lines.append(f"# HELP {metric} Длительность вызовов ({kind})")
+            lines.append(f"# TYPE {metric} histogram")
+            errors = []
+            for (_, name, chain, stage), count, total, buckets, error_counts in kind_items:
+                labels = _labels({NAME_LABELS[kind]: name, 'chain': chain, 'stage': stage})
+                cumulative = 0
+                for bound, bucket in zip(self.buckets, buckets):
+                    cumulative += bucket
+                    lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f"{metric}_sum{{{labels}}} {total}")
+                lines.append(f"{metric}_count{{{labels}}} {count}")
+                errors.extend((labels, error, value) for error, value in error_counts.items())
+            if errors:
+                metric = f"lz_{kind}_errors_total"
+                lines.append(f"# HELP {metric} Ошибки вызовов ({kind}) по классам")
+                lines.append(f"# TYPE {metric} counter")
+                for labels, error, value in errors:
+                    lines.append(f'{metric}{{{labels},error="{_escape(error)}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _finite(value):
+    return None if value == float('inf') else value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    # Индекс кошелька в метки Prometheus не попадает: тысячи кошельков дали бы тысячи рядов
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics():
+    """Возвращает общий для процесса MetricsRegistry."""
+    return _registry
+
+
+_contract_functions = None
+_contract_functions_lock = threading.Lock()
+
+
+def contract_function_name(data):
+    """
+    Название функции контракта по calldata (по ABI проекта и Multicall3) или 4-байтовый селектор.
+    """
+    global _contract_functions
+    if _contract_functions is None:
+        with _contract_functions_lock:
+            if _contract_functions is None:
+                names = {AGGREGATE3_SELECTOR: 'aggregate3'}
+                for filename in SELECTOR_ABIS:
+                    for item in load_abi(filename):
+                        if item.get('type') == 'function':
+                            names[function_abi_to_4byte_selector(item)] = item['name']
+                _contract_functions = names
+    if isinstance(data, str):
+        data = bytes.fromhex(data[2:10] if data.startswith('0x') else data[:8])
+    selector = bytes(data[:4])
+    return _contract_functions.get(selector) or '0x' + selector.hex()
+
+
+def _rpc_name(method, params):
+    if method in CONTRACT_METHODS and params and isinstance(params[0], dict):
+        data = params[0].get('data') or params[0].get('input')
+        if data:
+            try:
+                return f"{method}:{contract_function_name(data)}"
+            except ValueError:
+                pass
+    return method
+
+
+class MetricsMiddleware(Web3MiddlewareBuilder):
+    chain = None
+
+    @staticmethod
+    @curry
+    def build(chain, w3):
+        middleware = MetricsMiddleware(w3)
+        middleware.chain = chain
+        return middleware
+
+    def wrap_make_request(self, make_request):
+        def middleware(method, params):
+            started_at = time.monotonic()
+            error = None
+            try:
+                response = make_request(method, params)
+            except Exception as e:
+                error = type(e).__name__
+                raise
+            else:
+                if isinstance(response, dict) and response.get('error'):
+                    rpc_error = response['error']
+                    error = f"rpc_{rpc_error.get('code')}" if isinstance(rpc_error, dict) else 'rpc_error'
+                return response
+            finally:
+                get_metrics().observe(KIND_RPC, _rpc_name(method, params), time.monotonic() - started_at, self.chain, error)
+        return middleware
+
+
+def requests_hook(kind, chain=None):
+    """
+    Хук requests (session.hooks['response']): записывает каждый HTTP-ответ.
+    Для 'http' название — узел (host), для остальных видов — путь запроса.
+    """
+    def hook(response, *args, **kwargs):
+        url = urlparse(response.url)
+        name = url.netloc if kind == KIND_HTTP else url.path
+        error = f"http_{response.status_code}" if response.status_code >= 400 else None
+        get_metrics().observe(kind, name, response.elapsed.total_seconds(), chain, error)
+    return hook
+
+
+def start_metrics_server(port, host='127.0.0.1', registry=None):
+    """
+    Запускает HTTP-сервер метрик в фоне: /metrics — формат Prometheus, /summary — JSON.
+
+    :return: ThreadingHTTPServer
+    """
+    registry = registry or get_metrics()
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == '/metrics':
+                body = registry.render_prometheus().encode()
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            elif path == '/summary':
+                body = json.dumps(registry.summary()).encode()
+                content_type = 'application/json'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    from events import get_event_log
+    get_event_log().info(f"📊 Метрики Prometheus: http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def tag_stages(stages, names=None):
+    """
+    Оборачивает этапы конвейера: записи каждого этапа помечаются индексом кошелька
+    и названием этапа (names переименовывает этапы, например {'check': 'scan'}).
+
+    :param stages: Список Stage
+    :param names: Словарь {этап конвейера: этап метрик}
+    :return: Новый список Stage
+    """
+    names = names or {}
+
+    def wrap(stage):
+        def run(ctx):
+            with tagged(wallet=ctx['wallet'].index, stage=names.get(stage.name, stage.name)):
+                return stage.func(ctx)
+        return Stage(stage.name, stage.chain, run)
+
+    return [wrap(stage) for stage in stages]
@@ -0,0 +1,53 @@
+from eth_abi import decode, encode
+from web3 import Web3
+
+# Multicall3 развернут по одному адресу во всех EVM-сетях (включая Fantom)
+MULTICALL3_ADDRESS = Web3.to_checksum_address('0xcA11bde05977b3631167028862bE2a173976CA11')
+
+# Селекторы функций
+AGGREGATE3_SELECTOR = bytes.fromhex('82ad56cb')  # aggregate3((address,bool,bytes)[])
+GET_ETH_BALANCE_SELECTOR = bytes.fromhex('4d2301cc')  # getEthBalance(address)
+BALANCE_OF_SELECTOR = bytes.fromhex('70a08231')  # balanceOf(address)
+ALLOWANCE_SELECTOR = bytes.fromhex('dd62ed3e')  # allowance(address,address)
+
+# Количество вызовов в одном aggregate3 по умолчанию
+DEFAULT_CHUNK_SIZE = 600
+
+
+def balance_of_call(token, owner):
+    return (Web3.to_checksum_address(token), BALANCE_OF_SELECTOR + encode(['address'], [owner]))
+
+
+def allowance_call(token, owner, spender):
+    return (Web3.to_checksum_address(token), ALLOWANCE_SELECTOR + encode(['address', 'address'], [owner, spender]))
+
+
+def eth_balance_call(owner):
+    return (MULTICALL3_ADDRESS, GET_ETH_BALANCE_SELECTOR + encode(['address'], [owner]))
+
+
+def aggregate3(web3, calls, block_identifier='latest', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Выполняет набор view-вызовов через Multicall3.aggregate3 пачками по chunk_size.
+
+    :param web3: Экземпляр Web3 нужной сети
+    :param calls: Список кортежей (target, calldata)
+    :param block_identifier: Блок, на котором выполняются все пачки
+    :param chunk_size: Максимум вызовов в одном eth_call
+    :return: Список uint256-результатов (None для неуспешных вызовов) в порядке calls
+    """
+    results = []
+    for start in range(0, len(calls), chunk_size):
+        chunk = calls[start:start + chunk_size]
+        data = AGGREGATE3_SELECTOR + encode(
+            ['(address,bool,bytes)[]'],
+            [[(target, True, calldata) for target, calldata in chunk]]
+        )
+        raw = web3.eth.call({'to': MULTICALL3_ADDRESS, 'data': data}, block_identifier=block_identifier)
+        (decoded,) = decode(['(bool,bytes)[]'], raw)
+        for success, return_data in decoded:
+            if success and len(return_data) >= 32:
+                results.append(int.from_bytes(return_data[:32], 'big'))
+            else:
+                results.append(None)
+    return results
@@ -0,0 +1,91 @@
+import threading
+
+
+class NonceManager:
+    def __init__(self, web3, address):
+        """
+        Локальная выдача nonce для одного адреса. Позволяет подписать и отправить
+        несколько транзакций подряд, не дожидаясь майнинга предыдущих.
+
+        :param web3: Экземпляр Web3 сети
+        :param address: Адрес отправителя (checksum)
+        """
+        self.web3 = web3
+        self.address = address
+        self._lock = threading.Lock()
+        self._next = None  # следующий nonce, который будет выдан
+        self._in_flight = {}  # nonce -> хэш отправленной, но еще не подтвержденной транзакции
+
+    def _sync_locked(self):
+        pending = self.web3.eth.get_transaction_count(self.address, 'pending')
+        mined = self.web3.eth.get_transaction_count(self.address, 'latest')
+        # Подтвержденные транзакции больше не отслеживаем
+        for nonce in [n for n in self._in_flight if n < mined]:
+            del self._in_flight[nonce]
+        if self._next is None or self._next < pending:
+            self._next = pending
+
+    def reserve(self, count=1):
+        """
+        Выдает count последовательных nonce.
+
+        :return: Первый nonce из выданных
+        """
+        with self._lock:
+            if self._next is None:
+                self._sync_locked()
+            nonce = self._next
+            self._next += count
+            return nonce
+
+    def mark_sent(self, nonce, tx_hash):
+        with self._lock:
+            self._in_flight[nonce] = tx_hash
+
+    def release(self, nonce):
+        """
+        Возвращает nonce, транзакция с которым не была отправлена.
+        Если после него уже выданы другие nonce, образуется разрыв и состояние
+        пересчитывается по данным узла при следующей выдаче.
+        """
+        with self._lock:
+            self._in_flight.pop(nonce, None)
+            if self._next == nonce + 1:
+                self._next = nonce
+            else:
+                self._next = None
+
+    def recover(self):
+        """
+        Восстанавливается после отклоненной или выброшенной из мемпула транзакции:
+        забывает все неподтвержденные nonce и продолжает с nonce узла.
+
+        :return: Список хэшей транзакций, которые больше не ожидаются
+        """
+        with self._lock:
+            self._next = None
+            self._sync_locked()
+            # Выброшенные транзакции: nonce выше подтвержденного, но узел их не знает
+            dropped = [tx_hash for nonce, tx_hash in self._in_flight.items() if nonce >= self._next]
+            self._in_flight = {n: h for n, h in self._in_flight.items() if n < self._next}
+            return dropped
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_nonce_manager(chain, web3, address):
+    """
+    Возвращает общий NonceManager для адреса в сети.
+
+    :param chain: Название сети
+    :param web3: Экземпляр Web3 сети
+    :param address: Адрес отправителя (checksum)
+    """
+    key = (chain, address)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = _managers[key] = NonceManager(web3, address)
+        return manager
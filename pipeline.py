@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# Количество воркеров по умолчанию для сетей, в которых выполняются этапы конвейера
+# (Arbitrum и Optimism — только сети назначения свапа, этапов в них нет)
+DEFAULT_CHAIN_WORKERS = {
+    'fantom': 8,
+    'base': 4,
+}
+
+
+class Stage:
+    def __init__(self, name, chain, func):
+        """
+        :param name: Название этапа (например, 'check', 'fund', 'bridge')
+        :param chain: Сеть, в пуле воркеров которой выполняется этап
+        :param func: Функция func(ctx) -> bool; False останавливает обработку кошелька
+        """
+        self.name = name
+        self.chain = chain
+        self.func = func
+
+
+class WalletPipeline:
+    def __init__(self, stages, workers=None, max_in_flight=None):
+        """
+        Конвейер: кошельки независимо проходят этапы, каждый этап выполняется
+        в пуле воркеров своей сети, поэтому медленные ожидания одного кошелька
+        не блокируют остальные.
+
+        :param stages: Список Stage в порядке выполнения
+        :param workers: Словарь {сеть: количество воркеров}, дополняет DEFAULT_CHAIN_WORKERS
+        :param max_in_flight: Максимум кошельков в обработке одновременно (по умолчанию сумма воркеров)
+        """
+        self.stages = stages
+        self.workers = dict(DEFAULT_CHAIN_WORKERS)
+        if workers:
+            self.workers.update({chain: int(count) for chain, count in workers.items()})
+        for stage in stages:
+            if self.workers.get(stage.chain, 0) < 1:
+                raise ValueError(f"Не задано количество воркеров для сети {stage.chain}")
+        chains_in_use = {stage.chain for stage in stages}
+        self.max_in_flight = max_in_flight or sum(self.workers[chain] for chain in chains_in_use)
+
+    def _run_wallet(self, executors, ctx):
+        ctx.setdefault('status', 'pending')
+        for stage in self.stages:
+            ctx['stage'] = stage.name
+            try:
+                ok = executors[stage.chain].submit(stage.func, ctx).result()
+            except Exception as e:
+                ctx['status'] = 'error'
+                ctx['error'] = f"{stage.name}: {str(e)}"
+                return ctx
+            if not ok:
+                if ctx['status'] == 'pending':
+                    ctx['status'] = 'skipped'
+                return ctx
+        ctx['status'] = 'done'
+        return ctx
+
+    def run(self, contexts):
+        """
+        Прогоняет все кошельки через этапы.
+
+        :param contexts: Итерируемый набор словарей-контекстов кошельков
+        :return: Список контекстов в исходном порядке
+        """
+        chains_in_use = {stage.chain for stage in self.stages}
+        executors = {
+            chain: ThreadPoolExecutor(max_workers=self.workers[chain], thread_name_prefix=chain)
+            for chain in chains_in_use
+        }
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix='wallet') as drivers:
+                futures = [drivers.submit(self._run_wallet, executors, ctx) for ctx in contexts]
+                return [future.result() for future in futures]
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
@@ -0,0 +1,243 @@
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import zip_longest
+
+from eth_account import Account
+
+from batch_provider import gather
+from fee_oracle import get_fee_oracle, max_fee_per_gas
+from approvals import get_approval_policy
+from events import get_event_log
+from gas_cache import gas_key, get_gas_cache
+from providers import get_web3, send_raw_transaction
+from stargate import SWAP_GAS_FALLBACK, get_stargate_router
+
+# С какого количества транзакций подпись распределяется по процессам
+PARALLEL_THRESHOLD = 64
+# Сколько транзакций передается процессу за раз
+SIGN_CHUNK_SIZE = 128
+# Лимит газа approve, если нет ни наблюдений в кэше газа, ни оценки узла
+APPROVE_GAS_FALLBACK = 100000
+# Сколько секунд ждать квитанции после рассылки
+BROADCAST_RECEIPT_TIMEOUT = 300
+
+
+def build_transactions(contexts):
+    """
+    Строит неподписанные approve и swap для всех кошельков по данным предварительного
+    сканирования, nonce, цене газа и комиссии LayerZero, прочитанным заранее.
+    Лимиты газа берутся из общего кэша газа (наблюдения прошлых транзакций и симуляции
+    на форке), при холодном кэше — из eth_estimateGas; константы — последний запасной вариант.
+
+    :param contexts: Контексты кошельков после prescan_balances
+    :return: Список записей {'wallet', 'kind', 'tx', 'amount'} в порядке nonce каждого кошелька
+    """
+    fantom_w3 = get_web3('fantom')
+    contexts = [ctx for ctx in contexts if ctx.get('balance_lz_usdc')]
+    if not contexts:
+        return []
+
+    routers = {network: get_stargate_router(network) for network in {ctx['wallet'].network for ctx in contexts}}
+    networks = list(routers)
+    fee_params, *fees = gather(
+        lambda: get_fee_oracle('fantom').fee_params(),
+        *[lambda network=network: routers[network].fee() for network in networks],
+    )
+    gas_price = max_fee_per_gas(fee_params)
+    fees = dict(zip(networks, fees))
+    nonces = gather(*[
+        lambda ctx=ctx: fantom_w3.eth.get_transaction_count(ctx['wallet'].address, 'pending')
+        for ctx in contexts
+    ])
+    get_event_log().info("⛽️ Цена газа и комиссии LayerZero", chain='fantom', gas_price=gas_price, lz_fees=fees)
+
+    gas_cache = get_gas_cache()
+    log = get_event_log()
+
+    failed_keys = set()
+
+    def estimate(tx, fallback):
+        # После первой оценки ключ (контракт, селектор) в кэше, следующие кошельки RPC не делают;
+        # после ошибки оценки ключ до конца сборки использует запасной лимит
+        key = gas_key('fantom', tx)
+        if key in failed_keys:
+            return fallback
+        try:
+            return gas_cache.estimate('fantom', fantom_w3, tx)
+        except Exception as e:
+            failed_keys.add(key)
+            log.warning("⚠️ Ошибка при оценке газа, используем запасной лимит", chain='fantom', to=tx['to'], gas=fallback, error=str(e))
+            return fallback
+
+    # Первый проход: транзакции и газ approve; свапы кошельков без approve оцениваются сразу
+    # и прогревают кэш для остальных
+    approval_policy = get_approval_policy()
+    planned = []
+    for ctx, nonce in zip(contexts, nonces):
+        wallet = ctx['wallet']
+        router = routers[wallet.network]
+        amount = ctx['balance_lz_usdc']
+
+        wallet_entries = []
+        if approval_policy.needs_approval(ctx.get('allowance'), amount):
+            approve_txn = router.approve_tx(wallet.address, approval_policy.amount(amount), nonce, fee_params)
+            approve_txn['gas'] = estimate(approve_txn, APPROVE_GAS_FALLBACK)
+            wallet_entries.append({'wallet': wallet, 'kind': 'approve', 'tx': approve_txn, 'amount': amount})
+            nonce += 1
+
+        swap_txn = router.swap_tx(wallet.address, amount, nonce, fees[wallet.network], fee_params)
+        if not wallet_entries:
+            swap_txn['gas'] = estimate(swap_txn, SWAP_GAS_FALLBACK)
+        wallet_entries.append({'wallet': wallet, 'kind': 'swap', 'tx': swap_txn, 'amount': amount})
+        planned.append((ctx, wallet_entries))
+
+    # Второй проход: до майнинга approve свап оценить нельзя, лимит берется из кэша
+    entries = []
+    for ctx, wallet_entries in planned:
+        wallet = ctx['wallet']
+        swap_txn = wallet_entries[-1]['tx']
+        if 'gas' not in swap_txn:
+            swap_txn['gas'] = gas_cache.lookup('fantom', swap_txn) or SWAP_GAS_FALLBACK
+
+        required_ftm = fees[wallet.network] + gas_price * sum(entry['tx']['gas'] for entry in wallet_entries)
+        balance_ftm_wei = fantom_w3.to_wei(ctx['balance_ftm'] or 0, 'ether')
+        if balance_ftm_wei < required_ftm:
+            log.error("❌ Недостаточно FTM, пропускаем", wallet=wallet.index, chain='fantom',
+                      required_ftm=required_ftm / 10**18, balance_ftm=balance_ftm_wei / 10**18)
+            continue
+        entries.extend(wallet_entries)
+    return entries
+
+
+def _sign_chunk(items):
+    # Выполняется в дочернем процессе
+    signed = []
+    for private_key, tx in items:
+        signed_tx = Account.sign_transaction(tx, private_key)
+        signed.append((signed_tx.raw_transaction.hex(), signed_tx.hash.hex()))
+    return signed
+
+
+def sign_transactions(entries, processes=None):
+    """
+    Подписывает все транзакции; для больших списков подпись распределяется по пулу процессов.
+
+    :param entries: Записи из build_transactions
+    :param processes: Количество процессов (по умолчанию число ядер)
+    :return: Те же записи с полями 'raw' и 'tx_hash'
+    """
+    items = [(entry['wallet'].private_key, entry['tx']) for entry in entries]
+    if len(items) >= PARALLEL_THRESHOLD and processes != 1:
+        chunks = [items[i:i + SIGN_CHUNK_SIZE] for i in range(0, len(items), SIGN_CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            signed = [result for results in executor.map(_sign_chunk, chunks) for result in results]
+    else:
+        signed = _sign_chunk(items)
+    for entry, (raw, tx_hash) in zip(entries, signed):
+        entry['raw'] = raw if raw.startswith('0x') else '0x' + raw
+        entry['tx_hash'] = tx_hash if tx_hash.startswith('0x') else '0x' + tx_hash
+    return entries
+
+
+def write_signed_file(entries, path):
+    """
+    Сохраняет подписанные транзакции в JSONL-файл для проверки перед рассылкой.
+    Приватные ключи в файл не пишутся.
+    """
+    with open(path, 'w') as f:
+        for entry in entries:
+            wallet = entry['wallet']
+            tx = entry['tx']
+            f.write(json.dumps({
+                'index': wallet.index,
+                'address': wallet.address,
+                'network': wallet.network,
+                'kind': entry['kind'],
+                'chain': 'fantom',
+                'nonce': tx['nonce'],
+                'to': tx['to'],
+                'value': tx.get('value', 0),
+                'gas': tx['gas'],
+                'gasPrice': max_fee_per_gas(tx),
+                'amount': entry['amount'],
+                'tx_hash': entry['tx_hash'],
+                'raw': entry['raw'],
+            }) + '\n')
+    get_event_log().info(f"📝 {len(entries)} подписанных транзакций сохранено", path=path)
+
+
+def read_signed_file(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def broadcast(path, journal=None, timeout=BROADCAST_RECEIPT_TIMEOUT):
+    """
+    Рассылает подписанные транзакции из файла пачками и передает хэши в отслеживание квитанций.
+    Сначала отправляются транзакции с меньшим nonce каждого кошелька (approve), затем следующие (swap).
+
+    :param path: JSONL-файл из write_signed_file
+    :param journal: RunJournal для записи отправленных транзакций и итогов (необязательно)
+    :param timeout: Сколько секунд ждать квитанции
+    :return: Записи файла с полями 'status' и 'error'
+    """
+    from receipt_tracker import get_receipt_tracker
+
+    entries = read_signed_file(path)
+    web3 = get_web3('fantom')
+    by_address = {}
+    for entry in entries:
+        by_address.setdefault(entry['address'], []).append(entry)
+    chains = [sorted(group, key=lambda entry: entry['nonce']) for group in by_address.values()]
+
+    failed_addresses = set()
+
+    def send(entry):
+        # Повторная рассылка того же файла: транзакция уже в мемпуле или смайнена, это не ошибка
+        try:
+            send_raw_transaction(web3, entry['raw'])
+        except Exception as e:
+            return str(e)
+        return None
+
+    started_at = time.monotonic()
+    for wave in zip_longest(*chains):
+        wave = [entry for entry in wave if entry is not None and entry['address'] not in failed_addresses]
+        for entry, error in zip(wave, gather(*[lambda entry=entry: send(entry) for entry in wave])):
+            if error:
+                entry['status'] = 'error'
+                entry['error'] = error
+                failed_addresses.add(entry['address'])
+                get_event_log().error("❌ Ошибка при отправке", wallet=entry['index'], chain=entry['chain'], kind=entry['kind'], error=error)
+                continue
+            entry['status'] = 'sent'
+            if journal:
+                journal.set_stage(entry['address'], 'bridge', entry['index'], entry['network'])
+                journal.record_tx(entry['address'], 'bridge', entry['kind'], entry['chain'], entry['tx_hash'], entry['nonce'])
+    sent = [entry for entry in entries if entry.get('status') == 'sent']
+    get_event_log().info(f"🚀 Отправлено {len(sent)} из {len(entries)} транзакций", seconds=round(time.monotonic() - started_at, 2))
+
+    tracker = get_receipt_tracker('fantom')
+    futures = [tracker.track(entry['tx_hash']) for entry in sent]
+    deadline = time.monotonic() + timeout
+    for entry, future in zip(sent, futures):
+        try:
+            receipt = future.result(timeout=max(0, deadline - time.monotonic()))
+        except TimeoutError:
+            tracker.untrack(entry['tx_hash'], future)
+            entry['error'] = f"нет квитанции за {timeout} секунд"
+            continue
+        entry['status'] = 'success' if receipt['status'] == 1 else 'failed'
+        if journal:
+            journal.update_tx(entry['tx_hash'], entry['status'])
+            if entry['kind'] == 'swap':
+                journal.finish(entry['address'], 'done' if entry['status'] == 'success' else 'error')
+
+    log = get_event_log()
+    for entry in entries:
+        emit = log.info if entry.get('status') == 'success' else log.error
+        emit(f"Итог {entry['kind']}", wallet=entry['index'], chain=entry['chain'], status=entry.get('status'),
+              tx_hash=entry['tx_hash'], error=entry.get('error'))
+    log.flush()
+    return entries
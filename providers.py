@@ -0,0 +1,143 @@
+import threading
+
+import requests
+from hexbytes import HexBytes
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+
+from batch_provider import BatchingHTTPProvider
+from metrics import KIND_HTTP, MetricsMiddleware, requests_hook
+from rpc_pool import EndpointPool
+
+# RPC по умолчанию для каждой сети
+RPC_URLS = {
+    'fantom': 'https://fantom-rpc.publicnode.com',
+    'base': 'https://mainnet.base.org',
+    'arbitrum': 'https://arb1.arbitrum.io/rpc',
+    'optimism': 'https://mainnet.optimism.io',
+}
+
+# Пулы узлов для каждой сети: первый — узел из RPC_URLS, остальные — резервные
+RPC_ENDPOINTS = {
+    'fantom': [RPC_URLS['fantom'], 'https://rpcapi.fantom.network', 'https://rpc.ftm.tools'],
+    'base': [RPC_URLS['base'], 'https://base-rpc.publicnode.com', 'https://base.llamarpc.com'],
+    'arbitrum': [RPC_URLS['arbitrum'], 'https://arbitrum-one-rpc.publicnode.com', 'https://arbitrum.llamarpc.com'],
+    'optimism': [RPC_URLS['optimism'], 'https://optimism-rpc.publicnode.com', 'https://optimism.llamarpc.com'],
+}
+
+# Размеры пула keep-alive соединений для одной сети
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 32
+REQUEST_TIMEOUT = 30  # секунды
+
+_registry = {}
+_pools = {}
+_lock = threading.Lock()
+
+
+def configure_pool(pool_connections=None, pool_maxsize=None, timeout=None):
+    """
+    Задает размеры пула соединений. Влияет только на клиентов, созданных после вызова.
+
+    :param pool_connections: Количество пулов соединений на один хост
+    :param pool_maxsize: Максимум одновременных соединений в пуле
+    :param timeout: Таймаут HTTP-запроса в секундах
+    """
+    global POOL_CONNECTIONS, POOL_MAXSIZE, REQUEST_TIMEOUT
+    if pool_connections is not None:
+        POOL_CONNECTIONS = pool_connections
+    if pool_maxsize is not None:
+        POOL_MAXSIZE = pool_maxsize
+    if timeout is not None:
+        REQUEST_TIMEOUT = timeout
+
+
+def _make_session(chain=None):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    # Задержка и статус каждого HTTP-запроса к узлу попадают в метрики
+    session.hooks['response'].append(requests_hook(KIND_HTTP, chain))
+    return session
+
+
+def configure_endpoints(chain, urls):
+    """
+    Задает узлы сети. Влияет только на клиентов, созданных после вызова.
+
+    :param chain: Название сети
+    :param urls: Список URL RPC в порядке предпочтения
+    """
+    RPC_ENDPOINTS[chain] = list(urls)
+    RPC_URLS[chain] = urls[0]
+
+
+def get_endpoint_pool(chain):
+    """Возвращает пул узлов сети (создается вместе с ее Web3-клиентом) или None."""
+    return _pools.get(chain)
+
+
+def get_web3(chain, rpc_url=None):
+    """
+    Возвращает общий для всего процесса Web3-клиент сети с пулом keep-alive соединений.
+    Клиент сети по умолчанию работает через пул узлов RPC_ENDPOINTS[chain] с выбором
+    самого быстрого узла, дублированием медленных чтений и переключением при сбоях.
+
+    :param chain: Название сети ('fantom', 'base', 'arbitrum', 'optimism')
+    :param rpc_url: URL RPC, если нужен отличный от RPC_URLS[chain] (без пула узлов)
+    :return: Экземпляр Web3
+    """
+    if rpc_url is None or rpc_url in RPC_ENDPOINTS.get(chain, ()):
+        if chain not in RPC_URLS:
+            raise ValueError(f"Неизвестная сеть: {chain}")
+        rpc_url = RPC_URLS[chain]
+    key = (chain, rpc_url)
+    web3 = _registry.get(key)
+    if web3 is not None:
+        return web3
+    with _lock:
+        web3 = _registry.get(key)
+        if web3 is None:
+            pool = None
+            urls = RPC_ENDPOINTS.get(chain) or []
+            if rpc_url == RPC_URLS.get(chain) and len(urls) > 1:
+                # Основное и дублирующее чтение занимают по потоку: вдвое больше соединений одного узла
+                pool = _pools[chain] = EndpointPool(chain, urls, lambda: _make_session(chain), timeout=REQUEST_TIMEOUT,
+                                                    max_workers=2 * POOL_MAXSIZE)
+            provider = BatchingHTTPProvider(
+                rpc_url,
+                session=_make_session(chain),
+                request_kwargs={'timeout': REQUEST_TIMEOUT},
+                pool=pool,
+            )
+            web3 = Web3(provider)
+            web3.middleware_onion.add(MetricsMiddleware.build(chain), 'metrics')
+            _registry[key] = web3
+    return web3
+
+
+def send_raw_transaction(web3, raw_transaction):
+    """
+    Отправляет подписанную транзакцию. Если узел ответил ошибкой (в том числе "already known"
+    или "nonce too low") или не ответил, но транзакция с тем же хэшем уже известна сети,
+    отправка считается успешной: запрос дошел, потерян только ответ.
+
+    :param web3: Экземпляр Web3 сети
+    :param raw_transaction: Подписанная транзакция
+    :return: Хэш транзакции
+    :raises Exception: Ошибка отправки, если транзакции с этим хэшем нет в сети
+    """
+    raw_transaction = HexBytes(raw_transaction)
+    tx_hash = HexBytes(Web3.keccak(raw_transaction))
+    try:
+        return web3.eth.send_raw_transaction(raw_transaction)
+    except Exception as e:
+        if 'already known' in str(e).lower():
+            return tx_hash
+        try:
+            web3.eth.get_transaction(tx_hash)
+        except Exception:
+            # TransactionNotFound или сбой проверки: транзакция не отправлена
+            raise e
+        return tx_hash
@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from events import get_event_log
+from lifi_client import LifiError, get_lifi_client
+
+# Мосты, между которыми выбирается маршрут по умолчанию
+DEFAULT_BRIDGES = ['squid', 'symbiosis', 'relay']
+
+# Политики выбора котировки
+POLICY_FASTEST = 'fastest'  # минимальное ожидаемое время доставки
+POLICY_CHEAPEST = 'cheapest'  # минимальная стоимость в USD (разница сумм + газ)
+POLICY_BEST_AMOUNT = 'best_amount'  # максимальный toAmountMin
+POLICIES = (POLICY_FASTEST, POLICY_CHEAPEST, POLICY_BEST_AMOUNT)
+
+# Файл с накопленной статистикой доставки по мостам
+BRIDGE_STATS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bridge_stats.json')
+EWMA_ALPHA = 0.3  # вес нового наблюдения в скользящем среднем
+DELIVERY_TIMEOUT = 1800  # сколько секунд ждать доставки для статистики
+
+_race_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='quote-race')
+
+
+class BridgeStats:
+    def __init__(self, path=BRIDGE_STATS_FILE):
+        """
+        Статистика фактической задержки доставки по мостам: скользящее среднее,
+        количество наблюдений и отклонение от оценки LI.FI. Хранится в JSON-файле
+        между запусками.
+
+        :param path: Путь к файлу статистики (None — только в памяти)
+        """
+        self.path = path
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._delivery_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='delivery')
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._stats = json.load(f)
+            except (OSError, ValueError) as e:
+                get_event_log().warning("⚠️ Не удалось прочитать статистику мостов", path=path, error=str(e))
+
+    def record(self, bridge, observed, estimated=None):
+        """
+        :param bridge: Название моста
+        :param observed: Фактическое время доставки, секунды
+        :param estimated: Оценка LI.FI (executionDuration), секунды
+        """
+        with self._lock:
+            entry = self._stats.setdefault(bridge, {'count': 0, 'latency': observed, 'ratio': 1.0})
+            entry['count'] += 1
+            entry['latency'] = (1 - EWMA_ALPHA) * entry['latency'] + EWMA_ALPHA * observed
+            if estimated:
+                entry['ratio'] = (1 - EWMA_ALPHA) * entry['ratio'] + EWMA_ALPHA * (observed / estimated)
+            snapshot = json.dumps(self._stats, indent=2)
+        if self.path:
+            try:
+                with open(self.path, 'w') as f:
+                    f.write(snapshot)
+            except OSError as e:
+                get_event_log().warning("⚠️ Не удалось сохранить статистику мостов", path=self.path, error=str(e))
+
+    def expected_duration(self, bridge, estimated):
+        """Ожидаемое время доставки с поправкой на наблюдавшееся отклонение от оценки."""
+        with self._lock:
+            entry = self._stats.get(bridge)
+        if entry is None:
+            return estimated
+        if estimated is None:
+            return entry['latency']
+        return estimated * entry['ratio']
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self._stats))
+
+    def track_delivery(self, bridge, wallet_address, threshold, estimated=None, started_at=None, timeout=DELIVERY_TIMEOUT):
+        """
+        В фоне ждет поступления средств на Fantom и записывает фактическую задержку.
+
+        :param bridge: Название моста
+        :param wallet_address: Адрес получателя на Fantom
+        :param threshold: Баланс FTM (wei), означающий доставку
+        :param estimated: Оценка LI.FI, секунды
+        :param started_at: time.monotonic() момента отправки
+        """
+        from balance_watcher import get_balance_watcher
+
+        started_at = started_at or time.monotonic()
+
+        def wait():
+            balance = get_balance_watcher('fantom').wait_for_balance(wallet_address, threshold, timeout=timeout)
+            if balance is not None:
+                self.record(bridge, time.monotonic() - started_at, estimated)
+
+        return self._delivery_executor.submit(wait)
+
+
+def _cost_usd(estimate):
+    try:
+        gas = sum(float(cost.get('amountUSD', 0)) for cost in estimate.get('gasCosts', []))
+        return float(estimate['fromAmountUSD']) - float(estimate['toAmountUSD']) + gas
+    except (KeyError, TypeError, ValueError):
+        return float('inf')
+
+
+def rank_key(policy, bridge, quote, stats):
+    estimate = quote['estimate']
+    if policy == POLICY_FASTEST:
+        return stats.expected_duration(bridge, estimate.get('executionDuration')) or float('inf')
+    if policy == POLICY_CHEAPEST:
+        return _cost_usd(estimate)
+    if policy == POLICY_BEST_AMOUNT:
+        return -int(estimate['toAmountMin'])
+    raise ValueError(f"Неизвестная политика выбора моста: {policy}")
+
+
+def race_quotes(params, bridges=None, policy=POLICY_FASTEST, stats=None):
+    """
+    Параллельно запрашивает котировки для нескольких мостов и выбирает лучшую по политике.
+
+    :param params: Параметры /quote без allowBridges
+    :param bridges: Список мостов (по умолчанию DEFAULT_BRIDGES)
+    :param policy: 'fastest', 'cheapest' или 'best_amount'
+    :param stats: BridgeStats для учета фактической задержки (по умолчанию общий)
+    :return: Кортеж (мост, котировка)
+    :raises LifiError: Если ни один мост не вернул котировку
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Неизвестная политика выбора моста: {policy}")
+    bridges = bridges or DEFAULT_BRIDGES
+    stats = stats or get_bridge_stats()
+    client = get_lifi_client()
+    futures = {
+        bridge: _race_executor.submit(client.get_quote, dict(params, allowBridges=[bridge]))
+        for bridge in bridges
+    }
+    quotes = []
+    errors = []
+    for bridge, future in futures.items():
+        try:
+            quotes.append((bridge, future.result()))
+        except LifiError as e:
+            errors.append(f"{bridge}: {e.status_code or str(e)}")
+    if not quotes:
+        raise LifiError(f"Нет котировок ни для одного моста ({', '.join(errors)})")
+    return min(quotes, key=lambda item: rank_key(policy, item[0], item[1], stats))
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def get_bridge_stats():
+    """Возвращает общую для процесса статистику мостов."""
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = BridgeStats()
+        return _stats
+
+
+def set_bridge_stats(stats):
+    """Заменяет общую статистику мостов (например, статистикой без файла)."""
+    global _stats
+    with _stats_lock:
+        _stats = stats
+    return stats
@@ -0,0 +1,139 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from metrics import KIND_WAIT, get_metrics
+
+# Параметры AIMD: рост скорости на единицу в секунду при успехах, уменьшение вдвое при 429
+ADDITIVE_INCREASE = 1.0
+MULTIPLICATIVE_DECREASE = 0.5
+
+# Лимиты по умолчанию для RPC-узлов
+DEFAULT_RATE = 20.0  # запросов в секунду
+MIN_RATE = 0.5
+MAX_RATE = 200.0
+DEFAULT_CONCURRENCY = 16  # одновременных запросов
+MAX_CONCURRENCY = 64
+
+OUTCOME_OK = 'ok'
+OUTCOME_THROTTLED = 'throttled'
+OUTCOME_ERROR = 'error'
+
+
+def parse_retry_after(value):
+    """
+    :param value: Заголовок Retry-After (секунды или HTTP-дата)
+    :return: Секунды ожидания или None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, name, rate=DEFAULT_RATE, min_rate=MIN_RATE, max_rate=MAX_RATE,
+                 concurrency=DEFAULT_CONCURRENCY, max_concurrency=MAX_CONCURRENCY):
+        """
+        Ограничитель запросов к одному узлу: token bucket по скорости и лимит одновременных
+        запросов. Оба лимита подстраиваются по AIMD: медленно растут, пока запросы проходят,
+        и уменьшаются вдвое на каждый 429; Retry-After приостанавливает узел целиком.
+
+        :param name: Имя узла (для отладки)
+        :param rate: Начальная скорость, запросов в секунду
+        :param min_rate: Минимальная скорость
+        :param max_rate: Максимальная скорость
+        :param concurrency: Начальный лимит одновременных запросов
+        :param max_concurrency: Максимальный лимит одновременных запросов
+        """
+        self.name = name
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.concurrency = float(concurrency)
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.throttled = 0
+        self.blocked_until = 0.0
+        self._tokens = max(1.0, rate)
+        self._updated_at = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        self._tokens = min(max(1.0, self.rate), self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self):
+        """Ждет разрешения на запрос. После запроса обязательно вызвать release()."""
+        started_at = time.monotonic()
+        waited = False
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    self._cond.wait(self.blocked_until - now)
+                elif self.in_flight >= int(self.concurrency):
+                    self._cond.wait()
+                elif self._tokens < 1:
+                    self._cond.wait((1 - self._tokens) / self.rate)
+                else:
+                    self._tokens -= 1
+                    self.in_flight += 1
+                    break
+                waited = True
+        # В метрики попадают только реальные ожидания, а не каждый запрос
+        if waited:
+            get_metrics().observe(KIND_WAIT, 'rate_limit', time.monotonic() - started_at)
+
+    def release(self, outcome=OUTCOME_OK, retry_after=None):
+        """
+        :param outcome: 'ok', 'throttled' (429) или 'error' (лимиты не меняются)
+        :param retry_after: Секунды из Retry-After
+        """
+        with self._cond:
+            self.in_flight -= 1
+            if outcome == OUTCOME_THROTTLED:
+                self.throttled += 1
+                self.rate = max(self.min_rate, self.rate * MULTIPLICATIVE_DECREASE)
+                self.concurrency = max(1.0, self.concurrency * MULTIPLICATIVE_DECREASE)
+                self._tokens = min(self._tokens, 0.0)
+                if retry_after:
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            elif outcome == OUTCOME_OK:
+                # Аддитивный рост: примерно +ADDITIVE_INCREASE в секунду при полной загрузке
+                self.rate = min(self.max_rate, self.rate + ADDITIVE_INCREASE / self.rate)
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                'name': self.name,
+                'rate': self.rate,
+                'concurrency': int(self.concurrency),
+                'in_flight': self.in_flight,
+                'throttled': self.throttled,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name, **kwargs):
+    """
+    Возвращает общий ограничитель узла (создается с параметрами kwargs при первом обращении).
+
+    :param name: URL или имя узла
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = AdaptiveRateLimiter(name, **kwargs)
+        return limiter
@@ -0,0 +1,191 @@
+import threading
+import time
+from concurrent.futures import Future
+
+from hexbytes import HexBytes
+
+from batch_provider import gather
+from block_poller import get_block_poller
+from events import get_event_log
+from metrics import KIND_WAIT, get_metrics
+from providers import get_web3
+
+# JSON-RPC код ошибки "метод не найден"
+METHOD_NOT_FOUND = -32601
+# Сколько секунд отслеживать транзакцию по умолчанию: выброшенные или замененные транзакции,
+# за которыми следят только наблюдатели (кэш газа, кэш комиссии), не держат поток блоков вечно
+TRACK_TIMEOUT = 600
+
+
+def _method_unsupported(error):
+    # Только отсутствие метода на узле отключает eth_getBlockReceipts; BlockNotFound
+    # (узел отстал от номера блока) и сетевые ошибки — временные
+    response = getattr(error, 'rpc_response', None)
+    code = (response.get('error') or {}).get('code') if isinstance(response, dict) else None
+    message = str(error).lower()
+    return code == METHOD_NOT_FOUND or ('method' in message and any(
+        text in message for text in ('not found', 'not supported', 'does not exist', 'not available')))
+
+
+class ReceiptTracker:
+    def __init__(self, chain):
+        """
+        Отслеживает квитанции любого количества транзакций сети по одному потоку блоков.
+        Новые блоки читаются через eth_getBlockReceipts (если узел его поддерживает),
+        иначе квитанции ожидающих транзакций запрашиваются одним JSON-RPC batch.
+
+        :param chain: Название сети
+        """
+        self.chain = chain
+        self.web3 = get_web3(chain)
+        self.poller = get_block_poller(chain)
+        self.use_block_receipts = True
+        self._pending = {}  # хэш -> Future
+        self._unchecked = set()  # хэши, которые еще ни разу не проверялись напрямую
+        self._deadlines = {}  # хэш -> time.monotonic(), после которого отслеживание снимается
+        self._last_block = None
+        self._lock = threading.Lock()
+
+    def track(self, tx_hash, timeout=TRACK_TIMEOUT):
+        """
+        Добавляет транзакцию в отслеживание.
+
+        :param tx_hash: Хэш транзакции
+        :param timeout: Сколько секунд отслеживать; без квитанции за это время Future отменяется.
+            При повторном вызове срок продлевается, но не сокращается
+        :return: Future, который завершится квитанцией транзакции
+        """
+        tx_hash = HexBytes(tx_hash)
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            future = self._pending.get(tx_hash)
+            if future is None:
+                future = self._pending[tx_hash] = Future()
+                self._unchecked.add(tx_hash)
+            self._deadlines[tx_hash] = max(deadline, self._deadlines.get(tx_hash, deadline))
+        self.poller.subscribe(self._on_block)
+        return future
+
+    def wait(self, tx_hash, timeout=120):
+        """
+        Ждет квитанцию транзакции.
+
+        :param tx_hash: Хэш транзакции
+        :param timeout: Таймаут в секундах
+        :return: Квитанция транзакции
+        :raises TimeoutError: Если квитанция не получена за timeout секунд
+        """
+        future = self.track(tx_hash, timeout)
+        try:
+            with get_metrics().timer(KIND_WAIT, 'receipt', self.chain):
+                return future.result(timeout=timeout)
+        except TimeoutError:
+            self.untrack(tx_hash, future)
+            raise TimeoutError(f"Транзакция {HexBytes(tx_hash).hex()} не смайнена за {timeout} секунд")
+
+    def untrack(self, tx_hash, future=None):
+        """
+        Прекращает отслеживание транзакции.
+
+        :param future: Снять отслеживание, только если оно соответствует этому Future
+        """
+        tx_hash = HexBytes(tx_hash)
+        with self._lock:
+            if tx_hash in self._pending and (future is None or self._pending[tx_hash] is future):
+                self._forget(tx_hash)
+
+    def _forget(self, tx_hash):
+        # Вызывается под self._lock
+        self._unchecked.discard(tx_hash)
+        self._deadlines.pop(tx_hash, None)
+        future = self._pending.pop(tx_hash, None)
+        if not self._pending:
+            # Без ожидающих транзакций перестаем следить за блоками
+            self.poller.unsubscribe(self._on_block)
+            self._last_block = None
+        return future
+
+    def _resolve(self, receipts):
+        resolved = []
+        with self._lock:
+            for receipt in receipts:
+                tx_hash = HexBytes(receipt['transactionHash'])
+                if tx_hash in self._pending:
+                    resolved.append((self._forget(tx_hash), receipt))
+        # Обработчики Future (кэш газа, кэш комиссии) выполняются без блокировки трекера
+        for future, receipt in resolved:
+            future.set_result(receipt)
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [self._forget(tx_hash) for tx_hash, deadline in list(self._deadlines.items()) if deadline <= now]
+        for future in expired:
+            future.cancel()
+
+    def _fetch_receipts(self, tx_hashes):
+        def fetch(tx_hash):
+            try:
+                return self.web3.eth.get_transaction_receipt(tx_hash)
+            except Exception:
+                return None
+        return [receipt for receipt in gather(*[lambda h=h: fetch(h) for h in tx_hashes]) if receipt]
+
+    def _on_block(self, block_number):
+        self._expire()
+        with self._lock:
+            unchecked = list(self._unchecked)
+            self._unchecked.clear()
+            pending = list(self._pending)
+        if not pending:
+            return
+
+        # Транзакции, добавленные после обработки предыдущего блока, проверяются напрямую один раз
+        if unchecked:
+            self._resolve(self._fetch_receipts(unchecked))
+
+        if self.use_block_receipts:
+            with self._lock:
+                first_block = block_number if self._last_block is None else self._last_block + 1
+            for number in range(first_block, block_number + 1):
+                try:
+                    receipts = self.web3.eth.get_block_receipts(number)
+                except Exception as e:
+                    if not _method_unsupported(e):
+                        # Узел еще не знает блок или сетевая ошибка: блок (и следующие)
+                        # будут прочитаны повторно на следующем блоке
+                        get_event_log().warning("⚠️ Ошибка при чтении квитанций блока", chain=self.chain, block=number, error=str(e))
+                        return
+                    get_event_log().info("ℹ️ eth_getBlockReceipts недоступен, используем batch eth_getTransactionReceipt", chain=self.chain, error=str(e))
+                    self.use_block_receipts = False
+                    break
+                self._resolve(receipts)
+                with self._lock:
+                    # Без ожидающих транзакций _resolve уже сбросил позицию
+                    if self._pending:
+                        self._last_block = number
+            else:
+                return
+
+        with self._lock:
+            pending = [h for h in self._pending if h not in unchecked]
+        if pending:
+            self._resolve(self._fetch_receipts(pending))
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def get_receipt_tracker(chain):
+    """Возвращает общий ReceiptTracker сети."""
+    with _trackers_lock:
+        tracker = _trackers.get(chain)
+        if tracker is None:
+            tracker = _trackers[chain] = ReceiptTracker(chain)
+        return tracker
+
+
+def wait_for_receipt(chain, tx_hash, timeout=120):
+    """Ждет квитанцию транзакции через общий ReceiptTracker сети."""
+    return get_receipt_tracker(chain).wait(tx_hash, timeout)
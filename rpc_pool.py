@@ -0,0 +1,229 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from rate_limiter import OUTCOME_ERROR, OUTCOME_OK, OUTCOME_THROTTLED, get_rate_limiter, parse_retry_after
+
+# Вес нового наблюдения в скользящих средних задержки и доли ошибок
+EWMA_ALPHA = 0.2
+# Сколько последних задержек хранится для p95
+LATENCY_WINDOW = 100
+# Минимум наблюдений для расчета p95; до этого используется HEDGE_DEFAULT_DELAY
+HEDGE_MIN_SAMPLES = 20
+HEDGE_DEFAULT_DELAY = 1.0  # секунды
+HEDGE_MIN_DELAY = 0.05  # секунды
+# Пауза для узла после ошибок: 2^n секунд, не больше COOLDOWN_MAX
+COOLDOWN_MAX = 60.0
+# Штраф к задержке за долю ошибок при ранжировании
+ERROR_PENALTY = 4.0
+# Сколько раз повторять запрос, если все узлы ответили 429
+THROTTLE_RETRIES = 3
+# Потоков пула для чтений с дублированием по умолчанию
+HEDGE_MAX_WORKERS = 32
+
+
+class RpcEndpointError(Exception):
+    def __init__(self, url, message, throttled=False, delivered=True):
+        """
+        :param throttled: Узел ответил 429
+        :param delivered: Запрос мог дойти до узла (таймаут ответа, обрыв, 5xx); такие записи не повторяются
+        """
+        super().__init__(f"{url}: {message}")
+        self.url = url
+        self.throttled = throttled
+        self.delivered = delivered
+
+
+def _not_sent(error):
+    # Соединение не установлено: тело запроса узел точно не получил
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+class Endpoint:
+    def __init__(self, url, session):
+        """
+        :param url: URL RPC
+        :param session: requests.Session с пулом соединений
+        """
+        self.url = url
+        self.session = session
+        self.limiter = get_rate_limiter(url)
+        self.latency = None  # EWMA задержки, секунды
+        self.error_rate = 0.0  # EWMA доли ошибок
+        self.failures = 0  # ошибок подряд
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record_success(self, latency):
+        with self._lock:
+            self.requests += 1
+            self.latency = latency if self.latency is None else (1 - EWMA_ALPHA) * self.latency + EWMA_ALPHA * latency
+            self.error_rate *= 1 - EWMA_ALPHA
+            self.failures = 0
+            self.cooldown_until = 0.0
+            self._latencies.append(latency)
+
+    def record_stall(self, elapsed):
+        # Запрос еще не завершен, но уже дольше elapsed: узел не должен оставаться первым
+        with self._lock:
+            self.latency = elapsed if self.latency is None else max(self.latency, (1 - EWMA_ALPHA) * self.latency + EWMA_ALPHA * elapsed)
+
+    def record_failure(self):
+        with self._lock:
+            self.requests += 1
+            self.errors += 1
+            self.error_rate = (1 - EWMA_ALPHA) * self.error_rate + EWMA_ALPHA
+            self.failures += 1
+            self.cooldown_until = time.monotonic() + min(2 ** self.failures, COOLDOWN_MAX)
+
+    def score(self):
+        # Узел без измерений получает приоритет, чтобы его задержка была измерена
+        return (self.latency or 0.0) * (1 + ERROR_PENALTY * self.error_rate)
+
+    def p95(self):
+        with self._lock:
+            if len(self._latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[int(len(latencies) * 0.95) - 1]
+
+    def healthy(self, now=None):
+        return (now or time.monotonic()) >= self.cooldown_until
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'url': self.url,
+                'latency': self.latency,
+                'error_rate': self.error_rate,
+                'requests': self.requests,
+                'errors': self.errors,
+                'healthy': self.healthy(),
+            }
+
+
+class EndpointPool:
+    def __init__(self, chain, urls, session_factory, timeout=30, hedge=True, max_workers=HEDGE_MAX_WORKERS):
+        """
+        Пул RPC-узлов сети: чтения идут на самый быстрый исправный узел (по EWMA задержки
+        и доле ошибок), зависшие дольше p95 чтения дублируются на второй узел, а при 5xx,
+        429 и таймаутах запрос переходит на следующий узел.
+
+        :param chain: Название сети
+        :param urls: Список URL RPC
+        :param session_factory: Функция, создающая requests.Session для узла
+        :param timeout: Таймаут HTTP-запроса, секунды
+        :param hedge: Дублировать медленные чтения на второй узел
+        :param max_workers: Потоков для чтений с дублированием: ограничивает одновременные чтения этой сети
+        """
+        if not urls:
+            raise ValueError(f"Не задано ни одного RPC для сети {chain}")
+        self.chain = chain
+        self.timeout = timeout
+        self.hedge = hedge
+        self.endpoints = [Endpoint(url, session_factory()) for url in urls]
+        # Свой пул потоков у каждой сети: чтения одной сети не занимают потоки другой
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"rpc-hedge-{chain}")
+
+    def ranked(self):
+        """Узлы в порядке выбора: сначала исправные по возрастанию оценки, затем на паузе."""
+        now = time.monotonic()
+        healthy = sorted((e for e in self.endpoints if e.healthy(now)), key=lambda e: e.score())
+        cooling = sorted((e for e in self.endpoints if not e.healthy(now)), key=lambda e: e.cooldown_until)
+        return healthy + cooling
+
+    def _send(self, endpoint, request_data):
+        endpoint.limiter.acquire()
+        outcome = OUTCOME_ERROR
+        retry_after = None
+        try:
+            started_at = time.monotonic()
+            try:
+                response = endpoint.session.post(
+                    endpoint.url, data=request_data,
+                    headers={'Content-Type': 'application/json'}, timeout=self.timeout,
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                endpoint.record_failure()
+                raise RpcEndpointError(endpoint.url, str(e), delivered=not _not_sent(e))
+            if response.status_code == 429:
+                outcome = OUTCOME_THROTTLED
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                endpoint.record_failure()
+                raise RpcEndpointError(endpoint.url, "HTTP 429", throttled=True, delivered=False)
+            if response.status_code >= 500:
+                endpoint.record_failure()
+                raise RpcEndpointError(endpoint.url, f"HTTP {response.status_code}")
+            response.raise_for_status()
+            outcome = OUTCOME_OK
+            endpoint.record_success(time.monotonic() - started_at)
+            return response.content
+        finally:
+            endpoint.limiter.release(outcome, retry_after)
+
+    def _failover(self, request_data, endpoints, read_only=True):
+        for attempt in range(THROTTLE_RETRIES + 1):
+            errors = []
+            for endpoint in endpoints:
+                try:
+                    return self._send(endpoint, request_data)
+                except RpcEndpointError as e:
+                    # Запись, которая могла дойти до узла, не повторяется на другом:
+                    # первый узел уже мог принять транзакцию
+                    if not read_only and e.delivered:
+                        raise
+                    errors.append(e)
+            # Если все узлы ответили 429, повторяем: ограничители дождутся Retry-After
+            if not all(e.throttled for e in errors):
+                break
+        raise errors[-1]
+
+    def _hedge_delay(self, endpoint):
+        p95 = endpoint.p95()
+        return HEDGE_DEFAULT_DELAY if p95 is None else max(p95, HEDGE_MIN_DELAY)
+
+    def post(self, request_data, read_only=True):
+        """
+        Отправляет JSON-RPC запрос (или batch) в пул.
+
+        :param request_data: Тело запроса (bytes)
+        :param read_only: Запрос только на чтение; только такие запросы дублируются. Запись переходит
+            на следующий узел, только если не дошла до предыдущего (соединение не установлено, 429)
+        :return: Тело ответа (bytes)
+        :raises RpcEndpointError: Если ни один узел не ответил
+        """
+        endpoints = self.ranked()
+        if not read_only or not self.hedge or len(endpoints) < 2:
+            return self._failover(request_data, endpoints, read_only)
+
+        primary = self._executor.submit(self._failover, request_data, endpoints)
+        delay = self._hedge_delay(endpoints[0])
+        try:
+            return primary.result(timeout=delay)
+        except TimeoutError:
+            endpoints[0].record_stall(delay)
+
+        # Первый узел не уложился в p95: тот же запрос уходит на следующий узел
+        secondary = self._executor.submit(self._failover, request_data, endpoints[1:] + endpoints[:1])
+        pending = {primary, secondary}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def stats(self):
+        return [endpoint.snapshot() for endpoint in self.endpoints]
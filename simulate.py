@@ -0,0 +1,261 @@
+import csv
+import shutil
+import socket
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from web3 import Web3
+
+from approvals import get_approval_policy
+from events import get_event_log
+from fee_oracle import get_fee_oracle
+from gas_cache import get_gas_cache
+from lz_fee_cache import get_lz_fee_cache
+from providers import RPC_URLS
+
+# Исполняемый файл anvil (Foundry)
+ANVIL_BINARY = 'anvil'
+# Сколько секунд ждать запуска форка (первые запросы идут в сеть за состоянием)
+ANVIL_START_TIMEOUT = 60
+# Таймаут запроса к форку: каждое новое чтение состояния проксируется в сеть
+FORK_REQUEST_TIMEOUT = 120
+# Сколько кошельков симулируется одновременно
+SIMULATION_WORKERS = 16
+# Пополнение FTM нужно при балансе меньше этого значения (как в stage_fund)
+FUND_BELOW_FTM = 2
+# Запас к фактическому газу при расчете необходимого FTM (как в кэше газа)
+GAS_MARGIN = 1.2
+
+STATUS_PASS = 'pass'
+STATUS_FAIL = 'fail'
+
+PLAN_COLUMNS = ['index', 'address', 'network', 'status', 'fund_gas', 'approve_gas', 'swap_gas',
+                'lz_fee', 'required_ftm', 'balance_ftm', 'error']
+
+
+class SimulationError(Exception):
+    pass
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class AnvilFork:
+    def __init__(self, chain, fork_url=None, port=None, block_number=None):
+        """
+        Локальный форк сети на anvil. Все транзакции отправляются от адресов кошельков
+        без подписи (--auto-impersonate), в сеть ничего не уходит.
+
+        :param chain: Название сети ('fantom', 'base', ...)
+        :param fork_url: RPC для форка (по умолчанию RPC_URLS[chain])
+        :param port: Порт anvil (по умолчанию свободный)
+        :param block_number: Блок форка (по умолчанию последний)
+        """
+        self.chain = chain
+        self.fork_url = fork_url or RPC_URLS[chain]
+        self.port = port or _free_port()
+        self.block_number = block_number
+        self.process = None
+        self.web3 = None
+
+    def start(self):
+        binary = shutil.which(ANVIL_BINARY)
+        if binary is None:
+            raise SimulationError(f"Не найден {ANVIL_BINARY}: установите Foundry (https://getfoundry.sh)")
+        command = [binary, '--fork-url', self.fork_url, '--port', str(self.port), '--auto-impersonate', '--silent']
+        if self.block_number is not None:
+            command += ['--fork-block-number', str(self.block_number)]
+        self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        self.web3 = Web3(Web3.HTTPProvider(f"http://127.0.0.1:{self.port}", request_kwargs={'timeout': FORK_REQUEST_TIMEOUT}))
+
+        deadline = time.monotonic() + ANVIL_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                error = self.process.stderr.read().decode(errors='replace').strip()
+                raise SimulationError(f"anvil ({self.chain}) завершился с кодом {self.process.returncode}: {error}")
+            try:
+                if self.web3.is_connected():
+                    get_event_log().info("🧪 Форк запущен", chain=self.chain, port=self.port, block=self.web3.eth.block_number)
+                    return self
+            except Exception:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        raise SimulationError(f"anvil ({self.chain}) не запустился за {ANVIL_START_TIMEOUT} секунд")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+    def set_balance(self, address, wei):
+        self.web3.provider.make_request('anvil_setBalance', [address, hex(wei)])
+
+    def send(self, tx):
+        """
+        Отправляет транзакцию от имени tx['from'] и ждет квитанцию (anvil майнит сразу).
+        Газ оценивается на форке перед отправкой, поэтому revert приходит с причиной.
+
+        :return: Квитанция
+        """
+        tx_hash = self.web3.eth.send_transaction(tx)
+        return self.web3.eth.wait_for_transaction_receipt(tx_hash, timeout=FORK_REQUEST_TIMEOUT)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def _fund_quote(ctx, address):
+    from buy_ftm_by_eth import build_quote_params
+    from lifi_client import get_lifi_client
+    from quote_race import race_quotes
+
+    params = build_quote_params(address, int(ctx['wallet'].amount_eth * 10**18))
+    if ctx.get('bridges'):
+        _, quote = race_quotes(params, ctx['bridges'], ctx.get('bridge_policy', 'fastest'))
+        return quote
+    return get_lifi_client().get_quote(params)
+
+
+def _step(plan, chain, kind, tx, receipt):
+    if receipt['status'] != 1:
+        raise SimulationError(f"{kind}: транзакция отменена (gasUsed {receipt['gasUsed']})")
+    plan[f"{kind}_gas"] = receipt['gasUsed']
+    # Фактический газ форка прогревает кэш для живого запуска
+    get_gas_cache().record(chain, tx, receipt['gasUsed'])
+
+
+def simulate_wallet(ctx, fantom_fork, base_fork=None, gas_price=None):
+    """
+    Повторяет на форках всю последовательность кошелька: пополнение FTM с Base (если нужно),
+    approve и swap с комиссией quoteLayerZeroFee.
+
+    :param ctx: Контекст кошелька после prescan_balances
+    :param fantom_fork: AnvilFork сети Fantom
+    :param base_fork: AnvilFork сети Base (нужен, если кошельку требуется пополнение)
+    :param gas_price: Цена газа Fantom для расчета необходимого FTM (wei)
+    :return: Строка плана (словарь с колонками PLAN_COLUMNS)
+    """
+    from stargate import SWAP_GAS_FALLBACK, get_stargate_router
+
+    wallet = ctx['wallet']
+    address = wallet.address
+    plan = dict.fromkeys(PLAN_COLUMNS)
+    plan.update(index=wallet.index, address=address, network=wallet.network, status=STATUS_FAIL)
+    web3 = fantom_fork.web3
+    try:
+        balance_ftm = web3.eth.get_balance(address)
+
+        # Пополнение: транзакция LI.FI на форке Base, поступление FTM — minAmount на форке Fantom
+        if balance_ftm < FUND_BELOW_FTM * 10**18 and not ctx.get('fund_tx'):
+            if base_fork is None:
+                raise SimulationError("нужно пополнение FTM, но форк Base не запущен")
+            quote = _fund_quote(ctx, address)
+            request = quote['transactionRequest']
+            value = request['value']
+            fund_tx = {
+                'from': address,
+                'to': Web3.to_checksum_address(request['to']),
+                'data': request['data'],
+                'value': int(value, 16) if value.startswith('0x') else int(value),
+            }
+            _step(plan, 'base', 'fund', fund_tx, base_fork.send(fund_tx))
+            balance_ftm += int(quote['estimate']['toAmountMin'])
+            fantom_fork.set_balance(address, balance_ftm)
+        plan['balance_ftm'] = balance_ftm / 10**18
+
+        router = get_stargate_router(wallet.network)
+        amount = router.balance_of(address, web3)
+        if amount == 0:
+            raise SimulationError("нет lzUSDC")
+
+        # Nonce и газ заполняются на форке при отправке
+        policy = get_approval_policy()
+        allowance = router.allowance(address, web3)
+        plan['approve_gas'] = 0
+        if policy.needs_approval(allowance, amount):
+            approve_tx = {'from': address, 'to': router.token, 'data': router.approve_data(policy.amount(amount))}
+            _step(plan, 'fantom', 'approve', approve_tx, fantom_fork.send(approve_tx))
+
+        # Котировка форка с тем же запасом, что и в живом запуске
+        fee = get_lz_fee_cache().with_margin(router.quote_fee(web3))
+        plan['lz_fee'] = fee / 10**18
+        swap_tx = {'from': address, 'to': router.router, 'data': router.swap_data(address, amount), 'value': fee}
+        _step(plan, 'fantom', 'swap', swap_tx, fantom_fork.send(swap_tx))
+
+        gas_price = gas_price or web3.eth.gas_price
+        required = fee + int(gas_price * (plan['approve_gas'] + plan['swap_gas']) * GAS_MARGIN)
+        plan['required_ftm'] = required / 10**18
+        if required > balance_ftm:
+            raise SimulationError(f"недостаточно FTM: нужно {required / 10**18:.6f}, есть {balance_ftm / 10**18:.6f}")
+        if plan['swap_gas'] * GAS_MARGIN > SWAP_GAS_FALLBACK:
+            get_event_log().warning("⚠️ Газ свапа близок к запасному лимиту", wallet=wallet.index, chain='fantom',
+                                    gas=plan['swap_gas'], fallback=SWAP_GAS_FALLBACK)
+        plan['status'] = STATUS_PASS
+    except Exception as e:
+        plan['error'] = str(e)
+    return plan
+
+
+def run_simulation(contexts, workers=SIMULATION_WORKERS, fork_block=None):
+    """
+    Запускает форки Fantom (и Base, если кому-то нужно пополнение) и параллельно
+    симулирует все кошельки. Газ успешных шагов записывается в общий кэш газа.
+
+    :param contexts: Контексты кошельков после prescan_balances
+    :param workers: Сколько кошельков симулируется одновременно
+    :param fork_block: Блок форка Fantom (по умолчанию последний)
+    :return: План: список строк в порядке контекстов
+    :raises SimulationError: Если anvil недоступен
+    """
+    if not contexts:
+        return []
+    needs_funding = any(
+        not ctx.get('fund_tx') and ctx.get('balance_ftm') is not None and ctx['balance_ftm'] < FUND_BELOW_FTM
+        for ctx in contexts
+    )
+    gas_price = get_fee_oracle('fantom').gas_price()
+    started_at = time.monotonic()
+    with AnvilFork('fantom', block_number=fork_block) as fantom_fork:
+        base_fork = AnvilFork('base').start() if needs_funding else None
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='simulate') as executor:
+                plan = list(executor.map(lambda ctx: simulate_wallet(ctx, fantom_fork, base_fork, gas_price), contexts))
+        finally:
+            if base_fork is not None:
+                base_fork.stop()
+    passed = sum(row['status'] == STATUS_PASS for row in plan)
+    get_event_log().info(f"🧪 Симуляция {len(plan)} кошельков за {time.monotonic() - started_at:.2f} с",
+                         passed=passed, failed=len(plan) - passed)
+    return plan
+
+
+def print_plan(plan):
+    """Выводит план симуляции в журнал событий: одно событие на кошелек."""
+    log = get_event_log()
+    for row in plan:
+        if row['status'] == STATUS_PASS:
+            log.info("✅ Симуляция пройдена", wallet=row['index'], network=row['network'],
+                     fund_gas=row['fund_gas'] or None, approve_gas=row['approve_gas'] or None, swap_gas=row['swap_gas'] or None,
+                     required_ftm=round(row['required_ftm'], 6), balance_ftm=round(row['balance_ftm'], 6))
+        else:
+            log.error("❌ Симуляция не пройдена", wallet=row['index'], network=row['network'], error=row['error'])
+
+
+def write_plan(plan, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=PLAN_COLUMNS)
+        writer.writeheader()
+        writer.writerows(plan)
+    get_event_log().info("📝 План симуляции сохранен", path=path)
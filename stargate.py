@@ -0,0 +1,439 @@
+import threading
+
+from eth_abi import decode, encode
+from eth_utils import function_abi_to_4byte_selector
+from eth_utils.abi import collapse_if_tuple
+from web3 import Web3
+from web3.exceptions import ContractLogicError
+
+from accounts import get_account
+from approvals import get_approval_policy
+from balance_watcher import get_balance_watcher
+from batch_provider import gather
+from contracts import load_abi
+from events import get_event_log
+from fee_oracle import get_fee_oracle, max_fee_per_gas
+from gas_cache import get_gas_cache
+from lz_fee_cache import get_lz_fee_cache
+from metrics import STAGE_APPROVE, tagged
+from nonce_manager import get_nonce_manager
+from providers import get_web3, send_raw_transaction
+from receipt_tracker import get_receipt_tracker, wait_for_receipt
+
+# Chain ID сетей-источников: транзакции собираются без запроса eth_chainId
+CHAIN_IDS = {'fantom': 250}
+
+USDC_FANTOM_ADDRESS = Web3.to_checksum_address('0x28a92dde19D9989F39A49905d7C9C2FAc7799bDf')  # lzUSDC на Fantom
+FANTOM_LZ_CHAIN_ID = 112  # Stargate ID для Fantom
+
+# Маршруты Stargate. Новый маршрут (например, Fantom -> Base) — новая запись:
+# router — Stargate Router сети-источника, token — токен пула src_pool_id,
+# dst_lz_chain_id и dst_pool_id — идентификаторы LayerZero/Stargate сети и пула назначения
+ROUTES = {
+    'arb': {
+        'title': 'lzUSDC (Fantom) -> USDT (Arbitrum)',
+        'src_chain': 'fantom',
+        'dst_chain': 'arbitrum',
+        'router': Web3.to_checksum_address('0xAf5191B0De278C7286d6C7CC6ab6BB8A73bA2Cd6'),
+        'token': USDC_FANTOM_ADDRESS,
+        'dst_lz_chain_id': 110,
+        'src_pool_id': 21,
+        'dst_pool_id': 2,
+    },
+    'opt': {
+        'title': 'lzUSDC (Fantom) -> USDC.e (Optimism)',
+        'src_chain': 'fantom',
+        'dst_chain': 'optimism',
+        'router': Web3.to_checksum_address('0x45A01E4e04F14f7A4a6702c74187c5F6222033cd'),
+        'token': USDC_FANTOM_ADDRESS,
+        'dst_lz_chain_id': 111,
+        'src_pool_id': 1,
+        'dst_pool_id': 21,
+    },
+}
+
+SLIPPAGE = 30  # Допустимое проскальзывание, промилле (3%)
+SWAP_GAS_FALLBACK = 1000000  # Лимит газа свапа, если оценка невозможна
+FTM_ARRIVAL_TIMEOUT = 600  # Сколько секунд ждать зачисления нативного токена
+FTM_ARRIVAL_THRESHOLD = 1  # Минимальный баланс (wei), при котором продолжаем
+RECEIPT_TIMEOUT = 300  # Сколько секунд ждать квитанции approve и свапа
+
+# functionType свапа в quoteLayerZeroFee
+TYPE_SWAP_REMOTE = 1
+# Заглушка адреса получателя для quoteLayerZeroFee (поле bytes)
+QUOTE_TO_ADDRESS = bytes.fromhex('0000000000000000000000000000000000000001')
+# lzTxParams: (dstGasForCall, dstNativeAmount, dstNativeAddr)
+LZ_TX_PARAMS = (0, 0, bytes.fromhex('0000000000000000000000000000000000000001'))
+
+log = get_event_log()
+
+
+class ContractFunction:
+    def __init__(self, abi_item):
+        """
+        Селектор и типы аргументов функции контракта, вычисленные один раз по ABI.
+
+        :param abi_item: Описание функции из ABI
+        """
+        self.name = abi_item['name']
+        self.selector = function_abi_to_4byte_selector(abi_item)
+        self.input_types = [collapse_if_tuple(arg) for arg in abi_item['inputs']]
+        self.output_types = [collapse_if_tuple(arg) for arg in abi_item.get('outputs', [])]
+
+    def encode(self, *args):
+        """Calldata вызова (0x-строка) без обращения к сети."""
+        return '0x' + (self.selector + encode(self.input_types, args)).hex()
+
+    def decode(self, raw):
+        return decode(self.output_types, raw)
+
+
+def load_functions(abi_filename, names):
+    """
+    :param abi_filename: Имя файла ABI
+    :param names: Названия нужных функций
+    :return: Словарь {название: ContractFunction}
+    """
+    items = {item['name']: item for item in load_abi(abi_filename) if item.get('type') == 'function'}
+    return {name: ContractFunction(items[name]) for name in names}
+
+
+# Селекторы и кодировщики вычисляются при импорте модуля
+STARGATE_FUNCTIONS = load_functions('bridge_abi.json', ('swap', 'quoteLayerZeroFee'))
+ERC20_FUNCTIONS = load_functions('erc20_abi.json', ('approve', 'allowance', 'balanceOf'))
+
+
+def min_amount(amount, slippage=SLIPPAGE):
+    """Минимальная сумма в сети назначения с учетом проскальзывания (в промилле)."""
+    return amount - (amount * slippage) // 1000
+
+
+class StargateRouter:
+    def __init__(self, network, route=None, slippage=SLIPPAGE):
+        """
+        Свап через Stargate Router по маршруту из ROUTES. Calldata и транзакции собираются
+        локально из известных nonce, комиссии и газа, без build_transaction и лишних RPC.
+
+        :param network: Ключ маршрута в ROUTES ('arb', 'opt')
+        :param route: Параметры маршрута (по умолчанию ROUTES[network])
+        :param slippage: Допустимое проскальзывание, промилле
+        """
+        route = route or ROUTES[network]
+        self.network = network
+        self.title = route['title']
+        self.chain = route['src_chain']
+        self.chain_id = CHAIN_IDS[self.chain]
+        self.router = route['router']
+        self.token = route['token']
+        self.dst_lz_chain_id = route['dst_lz_chain_id']
+        self.src_pool_id = route['src_pool_id']
+        self.dst_pool_id = route['dst_pool_id']
+        self.slippage = slippage
+        self._quote_data = STARGATE_FUNCTIONS['quoteLayerZeroFee'].encode(
+            self.dst_lz_chain_id, TYPE_SWAP_REMOTE, QUOTE_TO_ADDRESS, b'', LZ_TX_PARAMS
+        )
+
+    @property
+    def web3(self):
+        return get_web3(self.chain)
+
+    # Calldata
+
+    def approve_data(self, amount):
+        return ERC20_FUNCTIONS['approve'].encode(self.router, amount)
+
+    def swap_data(self, address, amount):
+        """Calldata swap: получатель (поле bytes) и адрес возврата комиссии — сам кошелек."""
+        return STARGATE_FUNCTIONS['swap'].encode(
+            self.dst_lz_chain_id, self.src_pool_id, self.dst_pool_id, address, amount,
+            min_amount(amount, self.slippage), LZ_TX_PARAMS, Web3.to_bytes(hexstr=address), b''
+        )
+
+    # Транзакции
+
+    def approve_tx(self, address, amount, nonce, fees, gas=None):
+        """
+        Неподписанный approve токена маршрута для роутера.
+
+        :param address: Отправитель
+        :param amount: Сумма разрешения
+        :param nonce: Nonce транзакции
+        :param fees: Поля комиссии ({'gasPrice'} или {'maxFeePerGas', 'maxPriorityFeePerGas'})
+        :param gas: Лимит газа (если None, поле не заполняется)
+        """
+        return self._tx(address, self.token, self.approve_data(amount), 0, nonce, fees, gas)
+
+    def swap_tx(self, address, amount, nonce, fee, fees, gas=None):
+        """
+        Неподписанный swap всей суммы в сеть назначения.
+
+        :param fee: Комиссия LayerZero (value транзакции), wei
+        """
+        return self._tx(address, self.router, self.swap_data(address, amount), fee, nonce, fees, gas)
+
+    def _tx(self, address, to, data, value, nonce, fees, gas):
+        tx = {'from': address, 'to': to, 'data': data, 'value': value, 'nonce': nonce, 'chainId': self.chain_id}
+        tx.update(fees)
+        if gas is not None:
+            tx['gas'] = gas
+        return tx
+
+    # Чтение состояния
+
+    def _call(self, web3, to, data):
+        return (web3 or self.web3).eth.call({'to': to, 'data': data})
+
+    def quote_fee(self, web3=None):
+        """Котировка quoteLayerZeroFee за свап по маршруту (без кэша и запаса), wei."""
+        raw = self._call(web3, self.router, self._quote_data)
+        return STARGATE_FUNCTIONS['quoteLayerZeroFee'].decode(raw)[0]
+
+    def fee(self):
+        """Комиссия LayerZero для value свапа: общая котировка из кэша с запасом, wei."""
+        return get_lz_fee_cache().fee(self.chain, self.router, self.dst_lz_chain_id, LZ_TX_PARAMS, self.quote_fee)
+
+    def invalidate_fee(self):
+        get_lz_fee_cache().invalidate(self.chain, self.router, self.dst_lz_chain_id, LZ_TX_PARAMS)
+
+    def watch_fee(self, tx_hash):
+        """
+        Сбрасывает котировку LayerZero, если свап откатился. При прогретом кэше газа свап
+        отправляется без eth_estimateGas, и устаревшая комиссия видна только по квитанции.
+        Квитанцию ожидает общий ReceiptTracker сети, отдельных запросов не делается.
+        """
+        def on_receipt(future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            if future.result()['status'] != 1:
+                log.warning("⚠️ Свап откатился, котировка LayerZero будет запрошена заново", chain=self.chain, tx_hash=tx_hash)
+                self.invalidate_fee()
+
+        get_receipt_tracker(self.chain).track(tx_hash).add_done_callback(on_receipt)
+
+    def balance_of(self, address, web3=None):
+        raw = self._call(web3, self.token, ERC20_FUNCTIONS['balanceOf'].encode(address))
+        return ERC20_FUNCTIONS['balanceOf'].decode(raw)[0]
+
+    def allowance(self, address, web3=None):
+        raw = self._call(web3, self.token, ERC20_FUNCTIONS['allowance'].encode(address, self.router))
+        return ERC20_FUNCTIONS['allowance'].decode(raw)[0]
+
+    def check_transaction_status(self, tx_hash):
+        web3 = self.web3
+        try:
+            receipt = wait_for_receipt(self.chain, tx_hash, timeout=RECEIPT_TIMEOUT)
+            if receipt and receipt.get('status') == 1:
+                log.info("✅ Транзакция выполнена", chain=self.chain, tx_hash=tx_hash, gas_used=receipt['gasUsed'])
+                return True
+            log.error("❌ Транзакция провалилась", chain=self.chain, tx_hash=tx_hash)
+            if receipt:
+                log.debug("Квитанция", chain=self.chain, tx_hash=tx_hash, gas_used=receipt.get('gasUsed'), payload=dict(receipt))
+                tx = web3.eth.get_transaction(tx_hash)
+                try:
+                    web3.eth.call(tx, block_identifier=receipt.get('blockNumber'))
+                except ContractLogicError as e:
+                    log.error("❌ Причина ошибки", chain=self.chain, tx_hash=tx_hash, reason=str(e))
+            return False
+        except Exception as e:
+            log.error("❌ Ошибка при проверке транзакции", chain=self.chain, tx_hash=tx_hash, error=str(e))
+            return False
+
+    # Свап
+
+    def approve(self, account, amount, on_sent=None):
+        """
+        Отдельный approve роутеру по политике approve, без свапа и без ожидания квитанции
+        (волна approve перед этапом свапа).
+
+        :param account: Аккаунт кошелька
+        :param amount: Сумма будущего свапа
+        :param on_sent: Функция on_sent(kind, tx_hash, nonce)
+        :return: Хэш approve или None при ошибке
+        """
+        chain = self.chain
+        web3 = self.web3
+        address = Web3.to_checksum_address(account.address)
+        nonces = get_nonce_manager(chain, web3, address)
+        gas_cache = get_gas_cache()
+        with tagged(stage=STAGE_APPROVE):
+            nonce, fees = gather(
+                lambda: nonces.reserve(),
+                lambda: get_fee_oracle(chain).fee_params(),
+            )
+            approve_txn = self.approve_tx(address, get_approval_policy().amount(amount), nonce, fees)
+            try:
+                approve_txn['gas'] = gas_cache.estimate(chain, web3, approve_txn)
+                signed_approve_txn = web3.eth.account.sign_transaction(approve_txn, account.key)
+                approve_txn_hash = send_raw_transaction(web3, signed_approve_txn.raw_transaction)
+            except Exception as e:
+                log.error("❌ Ошибка при отправке approve", chain=chain, error=str(e))
+                nonces.release(nonce)
+                return None
+        nonces.mark_sent(nonce, approve_txn_hash)
+        gas_cache.watch(chain, approve_txn, approve_txn_hash)
+        if on_sent:
+            on_sent('approve', approve_txn_hash, nonce)
+        log.info("🚀 Approve отправлен", chain=chain, tx_hash=approve_txn_hash, nonce=nonce)
+        return approve_txn_hash
+
+    def swap(self, account, amount, allowance=None, on_sent=None):
+        """
+        Approve (если нужен) и swap: обе транзакции подписываются и отправляются подряд,
+        без ожидания майнинга approve.
+
+        :param account: Аккаунт кошелька
+        :param amount: Сумма свапа
+        :param allowance: Allowance из предварительного сканирования (если None, читается заново)
+        :param on_sent: Функция on_sent(kind, tx_hash, nonce)
+        :return: Хэш свапа или None при ошибке
+        """
+        chain = self.chain
+        web3 = self.web3
+        address = Web3.to_checksum_address(account.address)
+        nonces = get_nonce_manager(chain, web3, address)
+        gas_cache = get_gas_cache()
+
+        # Ожидание зачисления нативного токена через общий наблюдатель блоков
+        native_balance = get_balance_watcher(chain).wait_for_balance(address, FTM_ARRIVAL_THRESHOLD, timeout=FTM_ARRIVAL_TIMEOUT)
+        if native_balance is None:
+            log.error("❌ FTM не поступили, пополните кошелек", chain=chain, timeout=FTM_ARRIVAL_TIMEOUT)
+            return None
+        log.debug("💰 Баланс FTM", chain=chain, balance_ftm=native_balance / 10**18)
+
+        # Nonce и цена газа — после ожидания FTM, которое может длиться минуты
+        nonce, fees = gather(
+            lambda: nonces.reserve(),
+            lambda: get_fee_oracle(chain).fee_params(),
+        )
+        gas_price = max_fee_per_gas(fees)
+        approve_nonce = None
+
+        def release_nonces():
+            nonces.release(nonce)
+            if approve_nonce is not None:
+                nonces.release(approve_nonce)
+
+        fee = self.fee()
+        log.debug("💸 Комиссия Stargate", chain=chain, fee_ftm=fee / 10**18)
+
+        approve_gas = 0
+        with tagged(stage=STAGE_APPROVE):
+            if allowance is None:
+                allowance = self.allowance(address, web3)
+            log.debug("🔐 Текущее разрешение", chain=chain, allowance_usdc=allowance / 10**6)
+            approval_policy = get_approval_policy()
+            if approval_policy.needs_approval(allowance, amount):
+                approve_nonce = nonce
+                nonce = nonces.reserve()
+                approve_txn = self.approve_tx(address, approval_policy.amount(amount), approve_nonce, fees)
+                try:
+                    approve_gas = approve_txn['gas'] = gas_cache.estimate(chain, web3, approve_txn)
+                except Exception as e:
+                    log.error("❌ Ошибка при оценке газа для approve", chain=chain, error=str(e))
+                    release_nonces()
+                    return None
+
+        balance_before_swap = self.balance_of(address, web3)
+        if balance_before_swap < amount:
+            log.error("❌ Недостаточно lzUSDC для свапа", chain=chain, required_usdc=amount / 10**6, balance_usdc=balance_before_swap / 10**6)
+            release_nonces()
+            return None
+
+        swap_txn = self.swap_tx(address, amount, nonce, fee, fees)
+        if approve_nonce is None:
+            try:
+                swap_txn['gas'] = gas_cache.estimate(chain, web3, swap_txn)
+            except Exception as e:
+                # Возможная причина — устаревшая комиссия LayerZero; следующий свап запросит новую
+                log.error("❌ Ошибка при оценке газа на свап", chain=chain, error=str(e))
+                self.invalidate_fee()
+                release_nonces()
+                return None
+        else:
+            # До майнинга approve оценка газа свапа невозможна: лимит из кэша или запасной
+            swap_txn['gas'] = gas_cache.lookup(chain, swap_txn) or SWAP_GAS_FALLBACK
+        swap_gas = swap_txn['gas']
+        log.debug("⛽️ Газ на свап", chain=chain, gas=swap_gas)
+
+        required = fee + gas_price * (approve_gas + swap_gas)
+        if native_balance < required:
+            log.error("❌ Недостаточно FTM для выполнения транзакции", chain=chain, required_ftm=required / 10**18, balance_ftm=native_balance / 10**18)
+            release_nonces()
+            return None
+
+        if approve_nonce is not None:
+            with tagged(stage=STAGE_APPROVE):
+                signed_approve_txn = web3.eth.account.sign_transaction(approve_txn, account.key)
+                try:
+                    approve_txn_hash = send_raw_transaction(web3, signed_approve_txn.raw_transaction)
+                    nonces.mark_sent(approve_nonce, approve_txn_hash)
+                    gas_cache.watch(chain, approve_txn, approve_txn_hash)
+                    if on_sent:
+                        on_sent('approve', approve_txn_hash, approve_nonce)
+                    log.info("🚀 Approve отправлен", chain=chain, tx_hash=approve_txn_hash, nonce=approve_nonce)
+                except Exception as e:
+                    log.error("❌ Ошибка при отправке approve", chain=chain, error=str(e))
+                    release_nonces()
+                    return None
+
+        signed_swap_txn = web3.eth.account.sign_transaction(swap_txn, account.key)
+        try:
+            swap_txn_hash = send_raw_transaction(web3, signed_swap_txn.raw_transaction)
+            nonces.mark_sent(nonce, swap_txn_hash)
+            gas_cache.watch(chain, swap_txn, swap_txn_hash)
+            self.watch_fee(swap_txn_hash)
+            if on_sent:
+                on_sent('swap', swap_txn_hash, nonce)
+        except Exception as e:
+            log.error("❌ Ошибка при отправке свапа", chain=chain, error=str(e))
+            nonces.release(nonce)
+            return None
+        log.info("🚀 Свап отправлен", chain=chain, tx_hash=swap_txn_hash, nonce=nonce, amount_usdc=amount / 10**6, fee_ftm=fee / 10**18)
+
+        if approve_nonce is not None and not self.check_transaction_status(approve_txn_hash):
+            # Свап без разрешения будет отклонен; сбрасываем локальные nonce по данным узла
+            log.error("❌ Approve провалился", chain=chain, tx_hash=approve_txn_hash)
+            dropped = nonces.recover()
+            if dropped:
+                log.warning("⚠️ Транзакции выброшены из мемпула", chain=chain, tx_hashes=dropped)
+            return None
+        return swap_txn_hash
+
+    def swap_max(self, private_key, balance=None, allowance=None, on_sent=None):
+        """
+        Свап всего баланса токена маршрута с ожиданием квитанции.
+
+        :param private_key: Приватный ключ кошелька
+        :param balance: Баланс из предварительного сканирования (если None, читается заново)
+        :param allowance: Allowance для роутера из предварительного сканирования (если None, читается заново)
+        :param on_sent: Функция on_sent(kind, tx_hash, nonce), вызывается сразу после отправки approve и свапа
+        :return: Хэш свапа или None при ошибке
+        """
+        account = get_account(private_key)
+        log.info(f"▶️ Свап {self.title}", chain=self.chain, address=account.address)
+        if balance is None:
+            balance = self.balance_of(account.address)
+            log.info("💰 Баланс lzUSDC", chain=self.chain, balance_usdc=balance / 10**6)
+        if balance == 0:
+            log.error("❌ Баланс lzUSDC равен нулю, прекращаем выполнение", chain=self.chain)
+            return None
+
+        log.debug("📤 Отправка максимального количества", chain=self.chain, amount_usdc=balance / 10**6)
+        tx_hash = self.swap(account, balance, allowance, on_sent)
+        if tx_hash:
+            self.check_transaction_status(tx_hash)
+            return tx_hash
+        return None
+
+
+_routers = {}
+_routers_lock = threading.Lock()
+
+
+def get_stargate_router(network):
+    """Возвращает общий StargateRouter маршрута."""
+    with _routers_lock:
+        router = _routers.get(network)
+        if router is None:
+            router = _routers[network] = StargateRouter(network)
+        return router
@@ -0,0 +1,24 @@
+import pytest
+
+from benchmarks.stubs import start_stubs
+
+
+@pytest.fixture(scope='session')
+def stubs():
+    """
+    Заглушки JSON-RPC всех сетей и API LI.FI из бенчмарков, запущенные в процессе тестов.
+
+    :return: Кортеж (World, {сеть: [URL узлов]}, URL LI.FI)
+    """
+    return start_stubs({'latency': 0.005, 'jitter': 0.0, 'lifi_latency': 0.1})
+
+
+@pytest.fixture(scope='session')
+def stub_providers(stubs):
+    """Общие клиенты Web3 (providers.get_web3) всех сетей работают через заглушки."""
+    import providers
+
+    _, urls, _ = stubs
+    for chain, chain_urls in urls.items():
+        providers.configure_endpoints(chain, chain_urls)
+    return urls
@@ -0,0 +1,124 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from web3 import Web3
+from web3.exceptions import Web3RPCError
+
+from batch_provider import BatchingHTTPProvider, gather
+from benchmarks.stubs import LZ_USDC
+
+ADDRESSES = [Web3.to_checksum_address(f"0x{index:040x}") for index in range(1, 6)]
+# balanceOf без аргумента: заглушка отвечает объектом ошибки только на этот запрос
+BROKEN_CALL = {'to': LZ_USDC, 'data': '0x70a08231'}
+# Адрес, на чтение баланса которого узел отвечает с задержкой STALL
+STALLED_ADDRESS = ADDRESSES[0]
+STALL = 2.0
+
+
+def serve_stalling():
+    """
+    Узел, который отвечает на batch с чтением STALLED_ADDRESS через STALL секунд, на остальные — сразу.
+
+    :return: URL узла
+    """
+    class StallingHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            requests = body if isinstance(body, list) else [body]
+            if any(STALLED_ADDRESS.lower() in json.dumps(request['params']).lower() for request in requests):
+                time.sleep(STALL)
+            responses = [{'jsonrpc': '2.0', 'id': request['id'], 'result': '0x1'} for request in requests]
+            data = json.dumps(responses if isinstance(body, list) else responses[0]).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StallingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+@pytest.fixture
+def web3(stubs):
+    _, urls, _ = stubs
+    # Интервал накопления с запасом, чтобы все вызовы gather попали в один batch
+    web3 = Web3(BatchingHTTPProvider(urls['fantom'][0], flush_interval=0.1))
+    # eth_call сначала запрашивает eth_chainId; ответ кэшируется провайдером и не мешает подсчету
+    web3.eth.chain_id
+    return web3
+
+
+def test_gather_sends_reads_in_one_batch(stubs, web3):
+    world, _, _ = stubs
+    calls = world.chains['fantom'].calls
+    http_requests, balances = calls['http_requests'], calls['eth_getBalance']
+
+    results = gather(*[lambda address=address: web3.eth.get_balance(address) for address in ADDRESSES])
+
+    assert len(results) == len(ADDRESSES)
+    assert all(balance > 0 for balance in results)
+    assert calls['eth_getBalance'] - balances == len(ADDRESSES)
+    assert calls['http_requests'] - http_requests == 1
+
+
+def test_error_in_batch_fails_only_its_caller(stubs, web3):
+    world, _, _ = stubs
+    calls = world.chains['fantom'].calls
+    http_requests = calls['http_requests']
+
+    def broken():
+        with pytest.raises(Web3RPCError):
+            web3.eth.call(BROKEN_CALL)
+        return 'error'
+
+    results = gather(
+        lambda: web3.eth.get_balance(ADDRESSES[0]),
+        broken,
+        lambda: web3.eth.get_transaction_count(ADDRESSES[1]),
+    )
+
+    assert results[0] > 0
+    assert results[1] == 'error'
+    assert results[2] == 0
+    assert calls['http_requests'] - http_requests == 1
+
+
+def test_writes_are_not_batched(stubs, web3):
+    world, _, _ = stubs
+    calls = world.chains['fantom'].calls
+    http_requests = calls['http_requests']
+
+    def send():
+        with pytest.raises(Web3RPCError):
+            web3.eth.send_raw_transaction(b'\x00')
+
+    gather(send, send)
+
+    assert calls['http_requests'] - http_requests == 2
+
+
+def test_stalled_batch_does_not_block_next_batch():
+    provider = BatchingHTTPProvider(serve_stalling(), flush_interval=0.01)
+    executor = ThreadPoolExecutor(max_workers=1)
+    stalled = executor.submit(provider.make_request, 'eth_getBalance', [STALLED_ADDRESS, 'latest'])
+    time.sleep(0.2)
+
+    started_at = time.monotonic()
+    response = provider.make_request('eth_getBalance', [ADDRESSES[1], 'latest'])
+
+    assert response['result'] == '0x1'
+    assert time.monotonic() - started_at < STALL / 2
+    assert not stalled.done()
+    assert stalled.result(timeout=STALL * 2)['result'] == '0x1'
@@ -0,0 +1,97 @@
+from types import SimpleNamespace
+
+import pytest
+from eth_account import Account
+from eth_utils import keccak
+from hexbytes import HexBytes
+
+from journal import RunJournal
+from providers import get_web3
+from receipt_tracker import get_receipt_tracker
+
+ADDRESS = '0x' + 'b1' * 20
+TX_HASH = '0x' + '33' * 32
+FUND_TX_HASH = '0x' + '44' * 32
+
+
+@pytest.fixture
+def journal():
+    journal = RunJournal(':memory:')
+    yield journal
+    journal.close()
+
+
+def test_receipt_updates_sent_transaction(stub_providers, journal):
+    journal.watch_tx(ADDRESS, 'bridge', 'swap', 'fantom', TX_HASH, 7)
+    assert journal.transactions(ADDRESS)[0]['status'] == 'sent'
+
+    # Квитанция, полученная трекером сети, сразу отражается в журнале
+    get_receipt_tracker('fantom')._resolve([{'transactionHash': HexBytes(TX_HASH), 'status': 1}])
+
+    assert journal.transactions(ADDRESS)[0]['status'] == 'success'
+
+
+def wallet_context(seed, index):
+    account = Account.from_key(keccak(text=f"journal-{seed}"))
+    return {'wallet': SimpleNamespace(address=account.address, index=index), 'account': account}
+
+
+def send_transfer(account):
+    """Отправляет перевод самому себе в заглушку Fantom, как отправленный до сбоя свап."""
+    web3 = get_web3('fantom')
+    nonce = web3.eth.get_transaction_count(account.address, 'pending')
+    tx = {'to': account.address, 'value': 1, 'gas': 21000, 'gasPrice': web3.eth.gas_price, 'nonce': nonce, 'chainId': web3.eth.chain_id}
+    return web3.eth.send_raw_transaction(account.sign_transaction(tx).raw_transaction).hex(), nonce
+
+
+def set_mined_nonce(stubs, address, nonce):
+    world, _, _ = stubs
+    state = world.chains['fantom']
+    with state._lock:
+        state.nonces[address] = nonce
+
+
+def test_resume_finishes_wallet_whose_swap_was_mined(stub_providers, journal):
+    finished, crashed = wallet_context('finished', 0), wallet_context('crashed', 1)
+    journal.finish(finished['wallet'].address, 'done')
+    # Сбой после отправки свапа, но до его квитанции
+    journal.set_stage(crashed['wallet'].address, 'bridge', 1, 'arb')
+    tx_hash, nonce = send_transfer(crashed['account'])
+    journal.record_tx(crashed['wallet'].address, 'bridge', 'swap', 'fantom', tx_hash, nonce)
+
+    remaining = journal.resume([finished, crashed], timeout=10)
+
+    assert remaining == []
+    assert journal.transactions(crashed['wallet'].address)[0]['status'] == 'success'
+    assert journal.wallet_statuses()[crashed['wallet'].address] == 'done'
+
+
+def test_resume_reruns_bridge_after_dropped_swap(stubs, stub_providers, journal):
+    ctx = wallet_context('dropped', 2)
+    address = ctx['wallet'].address
+    journal.record_tx(address, 'fund', 'fund', 'base', FUND_TX_HASH, 0)
+    journal.update_tx(FUND_TX_HASH, 'success')
+    journal.set_stage(address, 'bridge', 2, 'arb')
+    journal.record_tx(address, 'bridge', 'swap', 'fantom', TX_HASH, 0)
+    # Nonce свапа занят другой транзакцией, а сам свап узлу неизвестен
+    set_mined_nonce(stubs, address, 1)
+
+    remaining = journal.resume([ctx], timeout=0.5)
+
+    assert remaining == [ctx]
+    assert ctx['fund_tx'] == FUND_TX_HASH
+    assert journal.transactions(address, status='dropped')[0]['tx_hash'] == TX_HASH
+
+
+def test_resume_skips_wallet_with_transaction_in_mempool(stub_providers, journal):
+    ctx = wallet_context('in-mempool', 3)
+    address = ctx['wallet'].address
+    journal.set_stage(address, 'bridge', 3, 'arb')
+    journal.record_tx(address, 'bridge', 'swap', 'fantom', TX_HASH, 0)
+
+    remaining = journal.resume([ctx], timeout=0.5)
+
+    # Повторная отправка могла бы перевести средства дважды
+    assert remaining == []
+    assert journal.transactions(address)[0]['status'] == 'sent'
+    assert journal.wallet_statuses()[address] == 'error'
@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from lifi_client import LifiClient
+
+QUOTE_PARAMS = {
+    'fromChain': 8453, 'toChain': 250, 'fromToken': '0x0000000000000000000000000000000000000000',
+    'toToken': '0x0000000000000000000000000000000000000000', 'fromAmount': '1000000000000000',
+    'fromAddress': '0x0000000000000000000000000000000000000001',
+}
+
+
+@pytest.fixture
+def client(stubs):
+    _, _, lifi_url = stubs
+    return LifiClient(base_url=lifi_url)
+
+
+def test_quote_is_fetched_fresh_before_signing(stubs, client):
+    world, _, _ = stubs
+    quotes = world.lifi_calls['quote']
+
+    first = client.get_quote(QUOTE_PARAMS)
+    second = client.get_quote(dict(QUOTE_PARAMS))
+
+    # calldata из кэша могла устареть: каждая подпись получает свой transactionRequest
+    assert first is not second
+    assert second['transactionRequest']['data']
+    assert world.lifi_calls['quote'] - quotes == 2
+
+
+def test_concurrent_quotes_are_coalesced(stubs, client):
+    world, _, _ = stubs
+    quotes = world.lifi_calls['quote']
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(client.get_quote(QUOTE_PARAMS))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 8
+    assert all(quote is results[0] for quote in results)
+    assert world.lifi_calls['quote'] - quotes == 1
+
+
+def test_estimate_is_shared_between_addresses(stubs, client):
+    world, _, _ = stubs
+    client.get_quote(QUOTE_PARAMS)
+    quotes = world.lifi_calls['quote']
+
+    estimate = client.get_estimate(dict(QUOTE_PARAMS, fromAddress='0x0000000000000000000000000000000000000002'))
+
+    assert estimate['toAmount']
+    assert world.lifi_calls['quote'] == quotes
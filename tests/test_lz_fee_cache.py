@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+from block_poller import get_block_poller
+from lz_fee_cache import LayerZeroFeeCache
+
+CHAIN = 'arbitrum'
+ROUTER = '0x' + 'c1' * 20
+DST_CHAIN_ID = 110
+LZ_TX_PARAMS = (0, 0, '0x0000000000000000000000000000000000000001')
+FEE = 1000
+
+
+class FeeQuoter:
+    """Котировка quoteLayerZeroFee с подсчетом вызовов."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return FEE
+
+
+def fee(cache, quoter):
+    return cache.fee(CHAIN, ROUTER, DST_CHAIN_ID, LZ_TX_PARAMS, quoter)
+
+
+@pytest.fixture
+def blocks(stub_providers):
+    """Поток блоков Arbitrum (блок каждые 0.25 с в заглушке) работает, пока идет тест."""
+    poller = get_block_poller(CHAIN)
+    listener = lambda block_number: None
+    poller.subscribe(listener)
+    deadline = time.monotonic() + 5
+    while poller.last_block is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    yield poller
+    poller.unsubscribe(listener)
+
+
+def wait_blocks(poller, count):
+    start = poller.last_block
+    deadline = time.monotonic() + 10
+    while poller.last_block - start < count and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def test_quote_is_shared_until_ttl(blocks):
+    cache = LayerZeroFeeCache(ttl=0.3, max_blocks=1000, margin=1.05)
+    quoter = FeeQuoter()
+
+    assert fee(cache, quoter) == int(FEE * 1.05)
+    assert fee(cache, quoter) == int(FEE * 1.05)
+    assert quoter.calls == 1
+
+    time.sleep(0.4)
+    fee(cache, quoter)
+
+    assert quoter.calls == 2
+
+
+def test_quote_expires_by_block_age(blocks):
+    cache = LayerZeroFeeCache(ttl=60, max_blocks=2)
+    quoter = FeeQuoter()
+    fee(cache, quoter)
+
+    wait_blocks(blocks, 2)
+    fee(cache, quoter)
+
+    assert quoter.calls == 2
+
+
+def test_concurrent_misses_are_coalesced(blocks):
+    cache = LayerZeroFeeCache()
+    quoter = FeeQuoter(delay=0.2)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(fee(cache, quoter))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [cache.with_margin(FEE)] * 8
+    assert quoter.calls == 1
+
+
+def test_invalidate_forces_new_quote(blocks):
+    cache = LayerZeroFeeCache()
+    quoter = FeeQuoter()
+    fee(cache, quoter)
+
+    # Свап провалился (например, из-за нехватки value): котировка сбрасывается
+    cache.invalidate(CHAIN, ROUTER, DST_CHAIN_ID, LZ_TX_PARAMS)
+    fee(cache, quoter)
+
+    assert quoter.calls == 2
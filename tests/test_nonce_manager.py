@@ -0,0 +1,70 @@
+import pytest
+from web3 import Web3
+
+from nonce_manager import NonceManager
+from providers import get_web3
+
+CHAIN = 'fantom'
+ADDRESS = Web3.to_checksum_address('0x' + 'a1' * 20)
+
+
+@pytest.fixture
+def node(stubs, stub_providers):
+    """Состояние заглушки Fantom: у ADDRESS смайнено 5 транзакций, в мемпуле ничего нет."""
+    world, _, _ = stubs
+    state = world.chains[CHAIN]
+
+    def set_nonces(mined, pending=None):
+        with state._lock:
+            state.nonces[ADDRESS] = mined
+            state.pending_nonces[ADDRESS] = mined if pending is None else pending
+
+    set_nonces(5)
+    return set_nonces
+
+
+@pytest.fixture
+def manager(node):
+    return NonceManager(get_web3(CHAIN), ADDRESS)
+
+
+def test_reserve_hands_out_consecutive_nonces(node, manager):
+    node(5, pending=7)
+
+    assert manager.reserve() == 7
+    assert manager.reserve(count=2) == 8
+    assert manager.reserve() == 10
+
+
+def test_release_of_last_nonce_reuses_it(manager):
+    first = manager.reserve()
+    second = manager.reserve()
+
+    manager.release(second)
+
+    assert manager.reserve() == second
+    assert second == first + 1
+
+
+def test_release_with_gap_resyncs_from_node(node, manager):
+    first = manager.reserve()
+    manager.reserve()
+
+    # Nonce из середины возвращен: следующий берется с узла, разрыва в очереди нет
+    manager.release(first)
+    node(5, pending=6)
+
+    assert manager.reserve() == 6
+
+
+def test_recover_returns_dropped_transactions(node, manager):
+    first = manager.reserve()
+    second = manager.reserve()
+    manager.mark_sent(first, '0x01')
+    manager.mark_sent(second, '0x02')
+
+    # Первая смайнена, вторую узел выбросил из мемпула
+    node(first + 1)
+
+    assert manager.recover() == ['0x02']
+    assert manager.reserve() == second
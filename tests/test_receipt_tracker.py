@@ -0,0 +1,54 @@
+import threading
+import time
+
+import pytest
+from hexbytes import HexBytes
+
+from receipt_tracker import ReceiptTracker
+
+TX_HASH = HexBytes('0x' + '11' * 32)
+OTHER_TX_HASH = HexBytes('0x' + '22' * 32)
+
+
+@pytest.fixture
+def tracker(stub_providers):
+    return ReceiptTracker('optimism')
+
+
+def test_callbacks_run_outside_tracker_lock(tracker):
+    future = tracker.track(TX_HASH)
+    # Обработчик снова обращается к трекеру, как кэш газа после квитанции
+    future.add_done_callback(lambda _: tracker.track(OTHER_TX_HASH))
+
+    resolver = threading.Thread(target=tracker._resolve, args=([{'transactionHash': TX_HASH, 'status': 1}],), daemon=True)
+    resolver.start()
+    resolver.join(timeout=2)
+
+    assert not resolver.is_alive()
+    assert future.result(timeout=0)['status'] == 1
+    assert HexBytes(OTHER_TX_HASH) in tracker._pending
+    tracker.untrack(OTHER_TX_HASH)
+
+
+def test_watch_only_entry_expires(tracker):
+    future = tracker.track(TX_HASH, timeout=0.2)
+    callbacks = []
+    future.add_done_callback(callbacks.append)
+
+    deadline = time.monotonic() + 5
+    while not future.done() and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert future.cancelled()
+    assert callbacks == [future]
+    assert TX_HASH not in tracker._pending
+    assert tracker._last_block is None
+
+
+def test_repeated_track_extends_deadline(tracker):
+    future = tracker.track(TX_HASH, timeout=0.2)
+    tracker.track(TX_HASH, timeout=60)
+    time.sleep(1.5)
+
+    assert not future.done()
+    tracker.untrack(TX_HASH)
@@ -0,0 +1,128 @@
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from rpc_pool import HEDGE_DEFAULT_DELAY, EndpointPool, RpcEndpointError
+
+READ = json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': 'eth_blockNumber', 'params': []}).encode()
+WRITE = json.dumps({'jsonrpc': '2.0', 'id': 2, 'method': 'eth_sendRawTransaction', 'params': ['0x00']}).encode()
+SLOW_RESULT = 'slow'
+
+
+def serve_slow(delay):
+    """
+    Узел, отвечающий через delay секунд.
+
+    :return: Кортеж (URL, список методов полученных запросов)
+    """
+    received = []
+
+    class SlowHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            received.append(request['method'])
+            time.sleep(delay)
+            body = json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': SLOW_RESULT}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}", received
+
+
+def dead_url():
+    # Порт свободен: соединение будет отклонено, запрос до узла не дойдет
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+@pytest.fixture
+def chain_calls(stubs):
+    world, _, _ = stubs
+    return world.chains['base'].calls
+
+
+@pytest.fixture
+def stub_url(stubs):
+    _, urls, _ = stubs
+    return urls['base'][0]
+
+
+def make_pool(urls, timeout=5, hedge=False):
+    return EndpointPool('base', urls, requests.Session, timeout=timeout, hedge=hedge)
+
+
+def test_read_fails_over_to_next_node(stub_url):
+    pool = make_pool([dead_url(), stub_url])
+
+    response = json.loads(pool.post(READ))
+
+    assert int(response['result'], 16) > 0
+    dead, alive = pool.stats()
+    assert dead['errors'] == 1 and not dead['healthy']
+    assert alive['errors'] == 0
+
+
+def test_unsent_write_fails_over_to_next_node(stub_url, chain_calls):
+    pool = make_pool([dead_url(), stub_url])
+    sent = chain_calls['eth_sendRawTransaction']
+
+    pool.post(WRITE, read_only=False)
+
+    assert chain_calls['eth_sendRawTransaction'] - sent == 1
+
+
+def test_timed_out_write_is_not_replayed(stub_url, chain_calls):
+    slow_url, received = serve_slow(1.0)
+    pool = make_pool([slow_url, stub_url], timeout=0.2)
+    sent = chain_calls['eth_sendRawTransaction']
+
+    with pytest.raises(RpcEndpointError) as error:
+        pool.post(WRITE, read_only=False)
+
+    assert error.value.delivered
+    assert received == ['eth_sendRawTransaction']
+    assert chain_calls['eth_sendRawTransaction'] == sent
+
+
+def test_slow_read_is_hedged(stub_url, chain_calls):
+    slow_url, received = serve_slow(HEDGE_DEFAULT_DELAY * 3)
+    pool = make_pool([slow_url, stub_url], hedge=True)
+    reads = chain_calls['eth_blockNumber']
+
+    started_at = time.monotonic()
+    response = json.loads(pool.post(READ))
+
+    assert response['result'] != SLOW_RESULT
+    assert time.monotonic() - started_at < HEDGE_DEFAULT_DELAY * 2
+    assert received == ['eth_blockNumber']
+    assert chain_calls['eth_blockNumber'] - reads == 1
+
+
+def test_slow_write_is_not_hedged(stub_url, chain_calls):
+    slow_url, received = serve_slow(HEDGE_DEFAULT_DELAY * 1.5)
+    pool = make_pool([slow_url, stub_url], hedge=True)
+    sent = chain_calls['eth_sendRawTransaction']
+
+    response = json.loads(pool.post(WRITE, read_only=False))
+
+    assert response['result'] == SLOW_RESULT
+    assert received == ['eth_sendRawTransaction']
+    assert chain_calls['eth_sendRawTransaction'] == sent
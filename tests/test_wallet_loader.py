@@ -0,0 +1,79 @@
+import csv
+
+import pytest
+
+from wallet_loader import SECP256K1_N, WalletFileError, iter_wallet_chunks, load_wallet_records
+
+HEADER = ('PrivateKey', 'Amount', 'Arb', 'Optimism', 'Destination')
+
+
+def key(number):
+    return f"{number:064x}"
+
+
+def write_wallets(path, rows, header=HEADER):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+def test_chunks_keep_row_numbers_across_blocks(tmp_path):
+    rows = [(key(number), '0.01', 1, 0, '') for number in range(1, 6)]
+    # Пустая строка не считается кошельком и не сдвигает номера
+    rows.insert(2, ('', '', '', '', ''))
+    path = write_wallets(tmp_path / 'wallets.csv', rows)
+
+    chunks = list(iter_wallet_chunks(path, chunk_size=2))
+
+    assert [len(records) for records, _ in chunks] == [2, 2, 1]
+    assert [wallet.index for records, _ in chunks for wallet in records] == [0, 1, 2, 3, 4]
+    assert all(not errors for _, errors in chunks)
+
+
+def test_row_errors_are_reported_with_row_numbers(tmp_path):
+    path = write_wallets(tmp_path / 'wallets.csv', [
+        ('0x' + key(1).upper(), '0.01', 1, 0, ' 0xabc '),
+        ('not-a-key', '0.01', 1, 0, ''),
+        (key(0), '0.01', 1, 0, ''),
+        (key(SECP256K1_N), '0.01', 0, 1, ''),
+        (key(2), '-1', 0, 1, ''),
+        (key(3), '0.01', 1, 1, ''),
+        (key(SECP256K1_N - 1), '0.02', 0, 1, ''),
+    ])
+    errors = []
+
+    records = list(load_wallet_records(path, errors))
+
+    assert [(wallet.index, wallet.private_key, wallet.network) for wallet in records] == [
+        (0, key(1), 'arb'), (6, key(SECP256K1_N - 1), 'opt'),
+    ]
+    assert records[0].destination == '0xabc'
+    assert [index for index, _ in errors] == [1, 2, 3, 4, 5]
+    assert 'формат' in errors[0][1]
+    assert all('диапазона secp256k1' in error for _, error in errors[1:3])
+    assert 'Amount' in errors[3][1]
+    assert errors[4][1].startswith("неверный выбор сети: Arb=1, Optimism=1")
+
+
+def test_records_are_read_lazily(tmp_path):
+    rows = [(key(number), '0.01', 1, 0, '') for number in range(1, 5)] + [('bad', '0.01', 1, 0, '')]
+    path = write_wallets(tmp_path / 'wallets.csv', rows)
+    errors = []
+
+    records = load_wallet_records(path, errors, chunk_size=2)
+    first = next(records)
+
+    # Ошибка из последнего блока появляется, только когда до него дошло чтение
+    assert first.index == 0
+    assert errors == []
+    assert len(list(records)) == 3
+    assert [index for index, _ in errors] == [4]
+
+
+def test_missing_columns_are_rejected(tmp_path):
+    path = write_wallets(tmp_path / 'wallets.csv', [(key(1), '0.01')], header=('PrivateKey', 'Amount'))
+
+    with pytest.raises(WalletFileError):
+        list(load_wallet_records(path))
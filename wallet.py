@@ -1,22 +1,37 @@
-from eth_account import Account
+from accounts import get_account
 
 class Wallet:
-    def __init__(self, private_key, amount, arb_flag, optimism_flag, destination_address):
+    __slots__ = ('index', 'private_key', 'amount_eth', 'arb', 'optimism', 'network', 'destination')
+
+    def __init__(self, index, private_key, amount_eth, arb, optimism, network, destination=None):
         """
-        :param private_key: Приватный ключ кошелька
-        :param amount: Количество токенов для перевода (в wei)
-        :param arb_flag: Флаг для Arbitrum (0 или 1)
-        :param optimism_flag: Флаг для Optimism (0 или 1)
-        :param destination_address: Адрес для отправки на Base
+        Кошелек из файла: единая запись, которая передается через все этапы обработки.
+        Аккаунт и адрес берутся из общего кэша accounts, поэтому ключ выводится один раз.
+
+        :param index: Номер строки в файле (с 0)
+        :param private_key: Приватный ключ без префикса 0x, в нижнем регистре
+        :param amount_eth: Сумма ETH для пополнения FTM
+        :param arb: Флаг для Arbitrum (0 или 1)
+        :param optimism: Флаг для Optimism (0 или 1)
+        :param network: Сеть назначения: 'arb' или 'opt'
+        :param destination: Адрес для вывода (если указан в файле)
         """
+        self.index = index
         self.private_key = private_key
-        self.amount = amount
-        self.arb_flag = arb_flag
-        self.optimism_flag = optimism_flag
-        self.destination_address = destination_address
-        self.account = Account.from_key(private_key)
-        self.wallet_address = self.account.address
+        self.amount_eth = amount_eth
+        self.arb = arb
+        self.optimism = optimism
+        self.network = network
+        self.destination = destination
+
+    @property
+    def account(self):
+        return get_account(self.private_key)
+
+    @property
+    def address(self):
+        return self.account.address
 
     def __str__(self):
-        return (f"Wallet: {self.wallet_address}, Amount: {self.amount / 10**6} USDC, "
-                f"Arb: {self.arb_flag}, Optimism: {self.optimism_flag}, Dest: {self.destination_address}")
\ No newline at end of file
+        return (f"Wallet: {self.address}, Amount: {self.amount_eth} ETH, "
+                f"Arb: {self.arb}, Optimism: {self.optimism}, Dest: {self.destination}")
@@ -0,0 +1,174 @@
+import csv
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from wallet import Wallet
+
+# Сколько строк читается и проверяется за один раз
+CHUNK_SIZE = 1024
+
+REQUIRED_COLUMNS = ('PrivateKey', 'Amount', 'Arb', 'Optimism')
+OPTIONAL_COLUMNS = ('Destination',)
+
+# Приватный ключ: 64 шестнадцатеричных символа, необязательный префикс 0x
+PRIVATE_KEY_PATTERN = r'(?:0x)?([0-9a-fA-F]{64})'
+# Порядок группы secp256k1: ключ должен быть в диапазоне 1..N-1
+SECP256K1_N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+# Ключи одной длины в нижнем регистре сравниваются как строки так же, как числа
+_KEY_MIN = '0' * 64
+_KEY_MAX = f"{SECP256K1_N:064x}"
+
+
+class WalletFileError(ValueError):
+    pass
+
+
+def _read_xlsx(path):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from csv.reader(f)
+
+
+def _read_parquet(path):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise WalletFileError("Для чтения Parquet установите pyarrow: pip install pyarrow")
+
+    parquet_file = pq.ParquetFile(path)
+    names = parquet_file.schema_arrow.names
+    yield tuple(names)
+    for batch in parquet_file.iter_batches(batch_size=CHUNK_SIZE):
+        columns = batch.to_pydict()
+        yield from zip(*(columns[name] for name in names))
+
+
+READERS = {
+    '.xlsx': _read_xlsx,
+    '.xlsm': _read_xlsx,
+    '.csv': _read_csv,
+    '.parquet': _read_parquet,
+    '.pq': _read_parquet,
+}
+
+
+def _is_empty(value):
+    return value is None or (isinstance(value, float) and math.isnan(value)) or (isinstance(value, str) and not value.strip())
+
+
+def _column(values):
+    return pd.Series(values, dtype=object)
+
+
+def _flags(values):
+    numbers = pd.to_numeric(_column(values), errors='coerce')
+    return numbers.where(numbers.isin((0, 1)))
+
+
+def validate_chunk(start, keys, amounts, arbs, optimisms, destinations):
+    """
+    Проверяет столбцы блока строк целиком (векторные операции pandas над столбцами).
+
+    :param start: Номер первой строки блока
+    :return: Кортеж (список Wallet, список (номер строки, ошибка))
+    """
+    keys = _column(keys)
+    texts = keys.where(keys.notna(), '').astype(str).str.strip()
+    key_ok = texts.str.fullmatch(PRIVATE_KEY_PATTERN)
+    hex_keys = texts.str.extract(f"^{PRIVATE_KEY_PATTERN}$", expand=False).str.lower()
+    range_ok = key_ok & (hex_keys > _KEY_MIN) & (hex_keys < _KEY_MAX)
+
+    amounts = pd.to_numeric(_column(amounts), errors='coerce')
+    amount_ok = np.isfinite(amounts.astype(float)) & (amounts >= 0)
+
+    arbs = _flags(arbs)
+    optimisms = _flags(optimisms)
+    networks = pd.Series(np.select([(arbs == 1) & (optimisms == 0), (arbs == 0) & (optimisms == 1)], ['arb', 'opt'], ''))
+    valid = range_ok & amount_ok & (networks != '')
+
+    errors = []
+    for offset in np.flatnonzero(~valid.to_numpy()):
+        if not key_ok[offset]:
+            error = "неверный формат приватного ключа: должен быть 64-символьной шестнадцатеричной строкой"
+        elif not range_ok[offset]:
+            error = "неверный приватный ключ: вне допустимого диапазона secp256k1"
+        elif not amount_ok[offset]:
+            error = "неверная сумма Amount: должно быть неотрицательное число"
+        else:
+            arb, optimism = (None if pd.isna(flag) else int(flag) for flag in (arbs[offset], optimisms[offset]))
+            error = f"неверный выбор сети: Arb={arb}, Optimism={optimism}. Должно быть только одно значение 1"
+        errors.append((start + int(offset), error))
+
+    rows = np.flatnonzero(valid.to_numpy())
+    columns = zip(rows, hex_keys[rows], amounts[rows], arbs[rows], optimisms[rows], networks[rows])
+    records = [
+        Wallet(start + int(offset), key, float(amount), int(arb), int(optimism), network,
+               None if _is_empty(destinations[offset]) else str(destinations[offset]).strip())
+        for offset, key, amount, arb, optimism, network in columns
+    ]
+    return records, errors
+
+
+def iter_wallet_chunks(path, chunk_size=CHUNK_SIZE):
+    """
+    Лениво читает файл с кошельками (xlsx, csv или parquet) блоками и проверяет каждый блок.
+
+    :param path: Путь к файлу
+    :param chunk_size: Количество строк в блоке
+    :return: Генератор кортежей (список Wallet, список (номер строки, ошибка))
+    :raises WalletFileError: Неподдерживаемый формат или нет нужных столбцов
+    """
+    reader = READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise WalletFileError(f"Неподдерживаемый формат файла {path}: поддерживаются {', '.join(READERS)}")
+
+    rows = reader(path)
+    header = [str(name).strip() if name is not None else '' for name in next(rows, ())]
+    missing = [name for name in REQUIRED_COLUMNS if name not in header]
+    if missing:
+        raise WalletFileError(f"В файле {path} отсутствуют необходимые столбцы: {missing}")
+    positions = [header.index(name) if name in header else None for name in REQUIRED_COLUMNS + OPTIONAL_COLUMNS]
+
+    def columns(chunk):
+        return [[row[p] if p is not None and p < len(row) else None for row in chunk] for p in positions]
+
+    start = 0
+    chunk = []
+    for row in rows:
+        # Полностью пустые строки (например, в конце листа) не считаются кошельками
+        if all(_is_empty(value) for value in row):
+            continue
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield validate_chunk(start, *columns(chunk))
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield validate_chunk(start, *columns(chunk))
+
+
+def load_wallet_records(path, errors=None, chunk_size=CHUNK_SIZE):
+    """
+    Лениво читает и проверяет файл с кошельками: следующий блок читается, когда
+    разобраны записи предыдущего.
+
+    :param errors: Список, в который по мере чтения добавляются (номер строки, ошибка)
+    :return: Генератор Wallet в порядке строк файла
+    :raises WalletFileError: Неподдерживаемый формат или нет нужных столбцов (при первом чтении)
+    """
+    for chunk_records, chunk_errors in iter_wallet_chunks(path, chunk_size):
+        if errors is not None:
+            errors.extend(chunk_errors)
+        yield from chunk_records